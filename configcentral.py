@@ -15,3 +15,8 @@ MYSQL_HOST = ""
 MYSQL_USER = ""
 MYSQL_PASSWORD = ""
 MYSQL_DATABASE = ""
+
+# Tracing (optional): JSONL trace file or OTLP collector,
+# e.g. http://localhost:4318/v1/traces
+TRACE_FILE = ""
+OTLP_ENDPOINT = ""
@@ -1,10 +1,17 @@
 import asyncio
 import json
 import requests
+import urllib3
 import configcentral
 from aiohttp import ClientSession
-from soliscloud_api import SoliscloudAPI
-from influxdb_client import InfluxDBClient, Point, WritePrecision
+from soliscloud_api import SoliscloudAPI, INVERTER_DETAIL_LIST
+from soliscloud_api.accounts import account_path
+from soliscloud_api.lineprotocol import compile_encoder
+from soliscloud_api.registry import DeviceRegistry
+from soliscloud_api.schema import INVERTER_DETAIL
+from soliscloud_api.snapshot import SnapshotDiff
+from soliscloud_api.spool import Spool
+from influxdb_client import InfluxDBClient, WritePrecision
 from influxdb_client.client.write_api import SYNCHRONOUS
 from datetime import datetime
 
@@ -38,128 +45,167 @@ def send_telegram_message(message):
     except Exception as e:
         print(f"🚨 Telegram Error: {e}")
 
-# Function to Insert Data into InfluxDB
-def insert_inverter_data(inverter_data):
+# Line protocol of a page of records, timestamp for records without dataTimestamp
+encode_inverters = compile_encoder(INVERTER_DETAIL)
+
+# Whether a write error may pass (InfluxDB unreachable, overloaded or failing), other errors such as
+# encode errors and 4xx responses (e.g. field type conflicts) fail again on every retry
+def is_transient(e):
+    status = getattr(e, "status", None)
+    if status is not None:
+        return status >= 500 or status == 429
+    return isinstance(e, (OSError, urllib3.exceptions.HTTPError))
+
+# Function to Keep Entries that can never be written, for inspection, out of the spool
+def dead_letter(path, entry, error):
+    with open(path, "a", encoding="utf-8") as file:
+        file.write(json.dumps({**entry, "error": str(error)}) + "\n")
+    print(f"☠️ Record of Inverter ID {entry['record'].get('id')} moved to {path}: {error}")
+
+# Function to Write Entries ({"time", "record"}) into InfluxDB. Entries rejected for good are written
+# one by one and moved to the dead-letter file, transient errors are raised
+def write_entries(entries, dead_letter_path):
     try:
-        point = Point("inverter_detail_list") \
-            .tag("inverter_id", inverter_data.get("id")) \
-            .tag("model", inverter_data.get("model")) \
-            .tag("stationName", inverter_data.get("stationName")) \
-            .tag("stationId", str(inverter_data.get("stationId"))) \
-            .tag("sn", str(inverter_data.get("sn"))) \
-            .tag("sno", str(inverter_data.get("sno"))) \
-            .tag("collectorsn", str(inverter_data.get("collectorsn"))) \
-            .tag("collectorId", str(inverter_data.get("collectorId"))) \
-            .tag("dataTimestampStr", str(inverter_data.get("dataTimestampStr"))) \
-            .tag("inverterMeterModel", int(inverter_data.get("inverterMeterModel"))) \
-            .field("pac", float(inverter_data.get("pac", 0))) \
-            .tag("timeStr", inverter_data.get("timeStr")) \
-            .field("pacPec", float(inverter_data.get("pacPec", 0))) \
-            .field("eToday", float(inverter_data.get("eToday", 0))) \
-            .field("eMonth", float(inverter_data.get("eMonth", 0))) \
-            .field("eYear", float(inverter_data.get("eYear", 0))) \
-            .field("eTotal", float(inverter_data.get("eTotal", 0))) \
-            .field("fullHour", float(inverter_data.get("fullHour", 0))) \
-            .field("timeZone", float(inverter_data.get("timeZone", 0))) \
-            .field("power", float(inverter_data.get("power", 0))) \
-            .field("dcBus", float(inverter_data.get("dcBus", 0))) \
-            .field("porwerPercent", float(inverter_data.get("porwerPercent", 0))) \
-            .field("apparentPower", float(inverter_data.get("apparentPower", 0))) \
-            .field("dcPac", float(inverter_data.get("dcPac", 0))) \
-            .field("tempName", inverter_data.get("tempName")) \
-            .field("state", inverter_data.get("state")) \
-            .field("acOutputType", int(inverter_data.get("acOutputType", 0))) \
-            .field("dcInputType", int(inverter_data.get("dcInputType", 0))) \
-            .field("currentState", inverter_data.get("currentState")) \
-            .field("allInCome", inverter_data.get("allInCome")) \
-            .field("updateShelfEndTimeStr", inverter_data.get("updateShelfEndTimeStr")) \
-            .field("shelfState", inverter_data.get("shelfSstate")) \
-            .field("alarmState", inverter_data.get("alarmState")) \
-            .field("stateExceptionFlag", inverter_data.get("stateExceptionFlag")) \
-            .field("gridPurchasedTodayEnergy", inverter_data.get("gridPurchasedTodayEnergy")) \
-            .field("pacPec", inverter_data.get("pacPec")) \
-            .field("gridSellTodayEnergy", inverter_data.get("gridSellTodayEnergy")) \
-            .field("uAc1", inverter_data.get("uAc1")) \
-            .field("uAc2", inverter_data.get("uAc2")) \
-            .field("uAc3", inverter_data.get("uAc3"))\
-            .field("iAc1", inverter_data.get("iAc1")) \
-            .field("iAc2", inverter_data.get("iAc2")) \
-            .field("iAc3", inverter_data.get("iAc3")) \
-            .field("uPv1", inverter_data.get("uPv1")) \
-            .field("iPv1", inverter_data.get("iPv1")) \
-            .field("insulationResistance", inverter_data.get("insulationResistance")) \
-            .field("iLeakLimt", inverter_data.get("iLeakLimt")) \
-            .field("inverterTemperature", inverter_data.get("inverterTemperature")) \
-            .field("powerFactor", inverter_data.get("powerFactor")) \
-            .field("fac", inverter_data.get("fac")) \
-            .time(datetime.utcnow(), WritePrecision.S)
-
-        # Write to InfluxDB
-        write_api.write(bucket=bucket, record=point)
-        print(f"✅ Data inserted for Inverter ID: {inverter_data.get('id')}")
+        data = b"".join(encode_inverters([entry["record"]], datetime.fromisoformat(entry["time"]))
+                        for entry in entries)
+        write_api.write(bucket=bucket, record=data, write_precision=WritePrecision.S)
+        return
     except Exception as e:
-        print(f"❌ Error inserting data: {e}")
-
-async def fetch_all_inverters(api_key, api_secret):
-    async with ClientSession() as websession:
+        if is_transient(e):
+            raise
+        if len(entries) == 1:
+            dead_letter(dead_letter_path, entries[0], e)
+            return
+    for entry in entries:
+        write_entries([entry], dead_letter_path)
+
+# Function to Insert a Page of Records into InfluxDB. Records that cannot be written while InfluxDB is
+# down are spooled to disk; while it is down the spool is replayed first, so records stay in order.
+# Returns whether InfluxDB is down
+async def insert_inverter_data(records, spool, dead_letter_path, sink_down=False):
+    timestamp = datetime.utcnow().isoformat()
+    entries = [{"time": timestamp, "record": inverter_data} for inverter_data in records]
+    if sink_down:
+        sink_down = await replay_spool(spool, dead_letter_path)
+    if not sink_down:
         try:
-            soliscloud = SoliscloudAPI('https://soliscloud.com:13333', websession)
-            page_no = 1
-            total_inverters = 0
-            max_retries = 10
-
-            while True:
-                retries = 0
-                success = False
-
-                while retries < max_retries:
-                    try:
-                        await asyncio.sleep(0.5)  # Limit requests to 2 per second
+            write_entries(entries, dead_letter_path)
+            print(f"✅ Data inserted for {len(records)} Inverters")
+            return False
+        except Exception as e:
+            print(f"❌ Error inserting data: {e}")
+    for entry in entries:
+        spool.append(entry)
+    print(f"💾 Data spooled for {len(records)} Inverters")
+    return True
+
+# Function to Write Spooled Data, left in the spool while InfluxDB is down.
+# Returns whether InfluxDB is down
+async def replay_spool(spool, dead_letter_path):
+    try:
+        replayed = await spool.replay(lambda entries: write_entries(entries, dead_letter_path))
+        print(f"♻️ Spooled Records Written: {replayed}")
+        return False
+    except Exception as e:
+        print(f"❌ Error replaying spool: {e}")
+        return True
 
-                        inverter_list = await soliscloud.inverter_detail_list(api_key, api_secret, page_no=page_no, page_size=100)
+async def fetch_all_inverters(api_key, api_secret, soliscloud=None):
+    if soliscloud is None:
+        async with ClientSession() as websession:
+            soliscloud = SoliscloudAPI('https://soliscloud.com:13333', websession)
+            return await fetch_all_inverters(api_key, api_secret, soliscloud)
 
-                        if not inverter_list:
-                            success = True
-                            break
+    # Last seen inverter state of this account, records without a newer dataTimestamp are not written
+    snapshots = SnapshotDiff(path=account_path("inverter_detail_snapshot.json", api_key))
 
-                        total_inverters += len(inverter_list)
+    # Records of this account that could not be written wait here until InfluxDB is back
+    spool = Spool(account_path("spool/inverter_detail_list", api_key))
+    # Records InfluxDB rejects for good, kept out of the spool so they cannot block it
+    dead_letter_path = account_path("spool/inverter_detail_list.dead.jsonl", api_key)
+    sink_down = False
 
-                        for record in inverter_list:
-                            print("✅ Record Fetched")
-                            #print(json.dumps(record, indent=2))
-                            insert_inverter_data(record)
+    # dataTimestamp per inverter, lets the daemon poll just after each inverter's next upload,
+    # with the sunrise/sunset of its station (stored by station_detail_list) to poll less at night
+    uploads = {}
+    registry = DeviceRegistry(account_path("device_registry.json", api_key))
 
-                        page_no += 1
-                        retries = 0  # Reset retries after success
-                        success = True
+    try:
+        if spool:
+            sink_down = await replay_spool(spool, dead_letter_path)
 
-                        if len(inverter_list) < 100:
-                            break
+        page_no = 1
+        total_inverters = 0
+        max_retries = 10
 
-                    except (asyncio.TimeoutError, SoliscloudAPI.SolisCloudError) as e:
-                        retries += 1
-                        print(f"⚠️ Retry {retries}/{max_retries} due to: {e}")
-                        send_telegram_message(f"⚠️ Retry {retries}/{max_retries} due to: {e} :: Inverter Detail List")
-                        await asyncio.sleep(5)  # Optional delay between retries
+        while True:
+            retries = 0
+            success = False
 
-                    except Exception as e:
-                        print(f"❌ Unexpected Error: {e}")
-                        send_telegram_message(f"❌ Unexpected Error: {e}")
-                        return
+            while retries < max_retries:
+                try:
+                    await asyncio.sleep(0.5)  # Limit requests to 2 per second
 
-                if not success:
-                    print("❌ Max retries reached. Stopping API requests.")
-                    send_telegram_message("❌ Max retries reached. Stopping API requests.")
-                    break
+                    inverter_list = await soliscloud.inverter_detail_list(api_key, api_secret, page_no=page_no, page_size=100)
 
-                if len(inverter_list) < 100:
-                    break
+                    if not inverter_list:
+                        success = True
+                        break
+
+                    total_inverters += len(inverter_list)
+                    for r in inverter_list:
+                        station = registry.get("station", r.get("stationId")) or {}
+                        uploads[r.get("id")] = {
+                            "dataTimestamp": r.get("dataTimestamp"),
+                            "sr": station.get("sr"),
+                            "ss": station.get("ss"),
+                            "timeZone": station.get("timeZone"),
+                        }
+
+                    records = snapshots.filter(inverter_list)
+                    print(f"✅ Records Fetched: {len(records)}")
+                    if records:
+                        sink_down = await insert_inverter_data(records, spool, dead_letter_path, sink_down)
+
+                    page_no += 1
+                    retries = 0  # Reset retries after success
+                    success = True
+
+                    if len(inverter_list) < 100:
+                        break
+
+                except (asyncio.TimeoutError, SoliscloudAPI.SolisCloudError) as e:
+                    retries += 1
+                    soliscloud.observe_retry(INVERTER_DETAIL_LIST)
+                    print(f"⚠️ Retry {retries}/{max_retries} due to: {e}")
+                    send_telegram_message(f"⚠️ Retry {retries}/{max_retries} due to: {e} :: Inverter Detail List")
+                    await asyncio.sleep(5)  # Optional delay between retries
+
+                except Exception as e:
+                    print(f"❌ Unexpected Error: {e}")
+                    send_telegram_message(f"❌ Unexpected Error: {e}")
+                    return
+
+            if not success:
+                print("❌ Max retries reached. Stopping API requests.")
+                send_telegram_message("❌ Max retries reached. Stopping API requests.")
+                break
+
+            if len(inverter_list) < 100:
+                break
+
+        snapshots.save()
+        print(f"\n🎯 Total Inverters Fetched: {total_inverters}")
+        print(f"⏭️ Unchanged Records Skipped: {snapshots.skipped}")
+        return uploads
 
-            print(f"\n🎯 Total Inverters Fetched: {total_inverters}")
+    except Exception as e:
+        print(f"🚨 General Error: {e}")
+        send_telegram_message(f"🚨 General Error: {e}")
 
-        except Exception as e:
-            print(f"🚨 General Error: {e}")
-            send_telegram_message(f"🚨 General Error: {e}")
+    finally:
+        # Spooled records are durable however the run ends
+        spool.sync()
 
 
 
@@ -3,10 +3,12 @@ import json
 import requests
 from aiohttp import ClientSession
 from soliscloud_api import SoliscloudAPI
-from influxdb_client import InfluxDBClient, Point, WritePrecision
+from soliscloud_api.schema import INVERTER_DAILY
+from influxdb_client import InfluxDBClient
 from influxdb_client.client.write_api import SYNCHRONOUS
 from datetime import datetime
-from soliscloud_api.helpers import Helpers
+from soliscloud_api.accounts import account_path
+from soliscloud_api.registry import DeviceRegistry
 import configcentral
 
 # Function to get today's date
@@ -68,14 +70,7 @@ async def insert_inverter_data(station_data_list):
     """Insert filtered data (only today's records) into InfluxDB."""
     try:
         for station_data in station_data_list:
-            point = Point("inverter_daily") \
-                .tag("inverter_id", station_data.get("inverter_id")) \
-                .tag("station_name", station_data.get("station_name")) \
-                .tag("dateStr", station_data.get("dateStr")) \
-                .field("energy", station_data.get("energy")) \
-                .field("money", station_data.get("money")) \
-                .field("moneyStr", station_data.get("moneyStr")) \
-                .field("energyStr", station_data.get("energyStr"))
+            point = INVERTER_DAILY.point(station_data)
 
             # Write to InfluxDB
             write_api.write(bucket=bucket, record=point)
@@ -84,7 +79,7 @@ async def insert_inverter_data(station_data_list):
     except Exception as e:
         print(f"❌ Error inserting data: {e}")
 
-async def fetch_all_station(api_key, api_secret):
+async def fetch_all_station(api_key, api_secret, soliscloud=None):
     """Fetch inverter data for the current month, then filter today's data."""
     current_month = get_current_month()
     today_date = get_today_date()
@@ -92,80 +87,82 @@ async def fetch_all_station(api_key, api_secret):
     max_retries = 10
     total_inverters = 0
 
-    async with ClientSession() as websession:
-        try:
+    if soliscloud is None:
+        async with ClientSession() as websession:
             soliscloud = SoliscloudAPI('https://soliscloud.com:13333', websession)
-            inverter_ids = await Helpers.get_inverter_ids(soliscloud, api_key, api_secret)
-
-            if not inverter_ids:
-                print("❌ No inverters found.")
-                return
-
-            for inverter_id in inverter_ids:
-                inverter_detail = await retry_operation(
-                    lambda: soliscloud.inverter_detail(api_key, api_secret, inverter_id=inverter_id),
-                    retries,
-                    max_retries,
-                    f"Inverter detail for {inverter_id}",
-                )
-
-                if inverter_detail is None:
-                    print(f"⚠️ No details found for Inverter ID: {inverter_id}. Skipping...")
-                    continue
-
-                #print(f"📡 API Response for Inverter ID {inverter_id}:")
-                #print(json.dumps(inverter_detail, indent=2))
-
-                station_name = inverter_detail.get("stationName")
-                print(f"\n📡 Fetching Inverter Data for ID: {inverter_id}, Name: {station_name}")
-
-                print(f"🔄 Fetching monthly data for {current_month}...")
-
-                inverter_month_data = await soliscloud.inverter_month(
-                    api_key, api_secret,
-                    currency="MYR",
-                    month=current_month,
-                    inverter_id=inverter_id
-                )
-
-                if not inverter_month_data:
-                    print(f"⚠️ No data returned for {current_month}. Skipping...")
-                    continue
-
-                # Filtering only today's data
-                todays_records = [
-                    {
-                        "inverter_id": inverter_id,
-                        "station_name": station_name,
-                        "dateStr": record.get("dateStr"),
-                        "money": float(record.get("money")),
-                        "moneyStr": record.get("moneyStr"),
-                        "energy": float(record.get("energy")),
-                        "energyStr": record.get("energyStr", "")
-                    }
-                    for record in inverter_month_data if record.get("dateStr") == today_date
-                ]
-
-                if not todays_records:
-                    print(f"⚠️ No data available for today ({today_date}). Skipping...")
-                    continue
-
-                print(f"✅ Found {len(todays_records)} records for today ({today_date}).")
-
-                # Insert today's data into InfluxDB
-                await retry_operation(
-                    lambda: insert_inverter_data(todays_records),
-                    retries,
-                    max_retries,
-                    f"Insert data for Inverter ID {inverter_id} and Date {today_date}"
-                )
-
-                total_inverters += 1
-                print(f"🎯 Total Inverters Processed: {total_inverters}")
-
-        except Exception as e:
-            print(f"🚨 General Error: {e}")
-            send_telegram_message(f"🚨 General Error: {e}")
+            return await fetch_all_station(api_key, api_secret, soliscloud)
+
+    try:
+        # Inverter and station metadata of this account, read from the list endpoints at most hourly
+        registry = DeviceRegistry(account_path("device_registry.json", api_key))
+        await registry.refresh(soliscloud, api_key, api_secret, kinds=("inverter", "station"))
+        registry.save()
+        inverter_ids = registry.ids("inverter")
+
+        if not inverter_ids:
+            print("❌ No inverters found.")
+            return
+
+        for inverter_id in inverter_ids:
+            inverter_detail = registry.get("inverter", inverter_id)
+
+            if inverter_detail is None:
+                print(f"⚠️ No details found for Inverter ID: {inverter_id}. Skipping...")
+                continue
+
+            #print(f"📡 API Response for Inverter ID {inverter_id}:")
+            #print(json.dumps(inverter_detail, indent=2))
+
+            station_name = inverter_detail.get("stationName")
+            print(f"\n📡 Fetching Inverter Data for ID: {inverter_id}, Name: {station_name}")
+
+            print(f"🔄 Fetching monthly data for {current_month}...")
+
+            inverter_month_data = await soliscloud.inverter_month(
+                api_key, api_secret,
+                currency="MYR",
+                month=current_month,
+                inverter_id=inverter_id
+            )
+
+            if not inverter_month_data:
+                print(f"⚠️ No data returned for {current_month}. Skipping...")
+                continue
+
+            # Filtering only today's data
+            todays_records = [
+                {
+                    "inverter_id": inverter_id,
+                    "station_name": station_name,
+                    "dateStr": record.get("dateStr"),
+                    "money": float(record.get("money")),
+                    "moneyStr": record.get("moneyStr"),
+                    "energy": float(record.get("energy")),
+                    "energyStr": record.get("energyStr", "")
+                }
+                for record in inverter_month_data if record.get("dateStr") == today_date
+            ]
+
+            if not todays_records:
+                print(f"⚠️ No data available for today ({today_date}). Skipping...")
+                continue
+
+            print(f"✅ Found {len(todays_records)} records for today ({today_date}).")
+
+            # Insert today's data into InfluxDB
+            await retry_operation(
+                lambda: insert_inverter_data(todays_records),
+                retries,
+                max_retries,
+                f"Insert data for Inverter ID {inverter_id} and Date {today_date}"
+            )
+
+            total_inverters += 1
+            print(f"🎯 Total Inverters Processed: {total_inverters}")
+
+    except Exception as e:
+        print(f"🚨 General Error: {e}")
+        send_telegram_message(f"🚨 General Error: {e}")
 
 async def main():
     """Main function to fetch API credentials and initiate data collection."""
@@ -2,21 +2,22 @@ import asyncio
 import json
 import requests
 import configcentral
-import mysql.connector
+from contextlib import nullcontext
 from aiohttp import ClientSession
-from soliscloud_api import SoliscloudAPI
-from datetime import datetime
-from soliscloud_api.helpers import Helpers
+from soliscloud_api import SoliscloudAPI, INVERTER_DETAIL_LIST, INVERTER_MONTH
+from soliscloud_api.daily import add_money, inverter_daily_totals, today
+from soliscloud_api.sinks import open_async_sink
+from soliscloud_api.sinks.fanout import FanOutError, FanOutSink
+from soliscloud_api.sinks.mysql_async import AsyncMysqlSink
+from soliscloud_api.tracing import Tracer, JsonFileExporter, OtlpHttpExporter
+
+# Inverters report in UTC+8, their day is not the server's day
+TIME_ZONE = 8
 
 # Function to get today's date
 def get_today_date():
-    """Returns today's date in YYYY-MM-DD format."""
-    return datetime.now().strftime("%Y-%m-%d")
-
-# Function to get the current month in YYYY-MM format
-def get_current_month():
-    """Returns the current month in YYYY-MM format."""
-    return datetime.now().strftime("%Y-%m")
+    """Returns today's date at the inverters (TIME_ZONE) in YYYY-MM-DD format."""
+    return today(TIME_ZONE)
 
 # Access the variables
 TOKEN = configcentral.TELEGRAM_TOKEN
@@ -28,22 +29,44 @@ MYSQL_USER = configcentral.MYSQL_USER
 MYSQL_PASSWORD = configcentral.MYSQL_PASSWORD
 MYSQL_DATABASE = configcentral.MYSQL_DATABASE
 
-# Connect to MySQL
-def get_mysql_connection():
-    return mysql.connector.connect(
+# Optional tracing
+tracer = None
+if configcentral.OTLP_ENDPOINT:
+    tracer = Tracer(OtlpHttpExporter(configcentral.OTLP_ENDPOINT))
+elif configcentral.TRACE_FILE:
+    tracer = Tracer(JsonFileExporter(configcentral.TRACE_FILE))
+
+def span(name, **attributes):
+    """Tracing span, no-op when tracing is not configured."""
+    return tracer.span(name, **attributes) if tracer else nullcontext()
+
+# MySQL and, when INFLUX_URL is set, InfluxDB get today's records from one fetch
+def open_sinks():
+    sinks = {"mysql": AsyncMysqlSink(
         host=MYSQL_HOST,
         user=MYSQL_USER,
         password=MYSQL_PASSWORD,
         database=MYSQL_DATABASE
-    )
-
-async def retry_operation(func, retries, max_retries, message):
-    """A helper function to retry operations."""
+    )}
+    if getattr(configcentral, "INFLUX_URL", None):
+        sinks["influx"] = open_async_sink(
+            "influx",
+            url=configcentral.INFLUX_URL,
+            token=configcentral.INFLUX_TOKEN,
+            org=configcentral.INFLUX_ORG,
+            bucket=configcentral.INFLUX_BUCKET
+        )
+    return FanOutSink(sinks)
+
+async def retry_operation(func, retries, max_retries, message, on_retry=None):
+    """A helper function to retry operations, on_retry is called before each retry."""
     while retries <= max_retries:
         try:
             return await func()
         except (asyncio.TimeoutError, SoliscloudAPI.SolisCloudError) as e:
             retries += 1
+            if on_retry is not None:
+                on_retry()
             print(f"⚠️ Retry {retries}/{max_retries} due to error: {e} - {message}")
             send_telegram_message(f"⚠️ Retry {retries}/{max_retries} due to error: {e} - {message}")
             await asyncio.sleep(5)  # Optional delay between retries
@@ -68,128 +91,90 @@ def send_telegram_message(message):
     except Exception as e:
         print(f"🚨 Telegram Error: {e}")
 
-async def insert_inverter_data(station_data_list):
-    """Insert filtered data (only today's records) into MySQL."""
+async def insert_inverter_data(sink, station_data_list):
+    """Write filtered data (only today's records) to all sinks, waiting until it is written."""
+    with span("sink", sink="fanout", records=len(station_data_list)):
+        await sink.write("inverter_daily", station_data_list)
+        await close_sinks(sink)
+
+async def close_sinks(sink):
+    """Wait for all queued records to be written."""
     try:
-        conn = get_mysql_connection()
-        cursor = conn.cursor()
-        insert_query = """
-        INSERT INTO inverter_daily (inverter_id, station_name, dateStr, energy, money, moneyStr, energyStr)
-        VALUES (%s, %s, %s, %s, %s, %s, %s)
-        """
-        for station_data in station_data_list:
-            cursor.execute(insert_query, (
-                station_data.get("inverter_id"),
-                station_data.get("station_name"),
-                station_data.get("dateStr"),
-                station_data.get("energy"),
-                station_data.get("money"),
-                station_data.get("moneyStr"),
-                station_data.get("energyStr")
-            ))
-        conn.commit()
-        cursor.close()
-        conn.close()
-        print("✅ Data inserted into MySQL")
+        await sink.close()
+        print("✅ Data inserted into all sinks")
         send_telegram_message(f"[MYSQL INVERTER DAILY : DONE]")
-    except Exception as e:
+    except FanOutError as e:
         print(f"❌ Error inserting data: {e}")
         send_telegram_message(f"[MYSQL INVERTER DAILY : FAILED {e}]")
 
-async def fetch_all_station(api_key, api_secret):
-    """Fetch inverter data for the current month, then filter today's data."""
-    current_month = get_current_month()
-    #today_date = get_today_date()
-    today_date = "2025-03-15"
+async def fetch_all_station(api_key, api_secret, soliscloud=None):
+    """Fetch today's energy of all inverters from the inverter_detail_list pages, and its money."""
+    if soliscloud is None:
+        trace_configs = [tracer.trace_config()] if tracer else None
+        async with ClientSession(trace_configs=trace_configs) as websession:
+            soliscloud = SoliscloudAPI('https://soliscloud.com:13333', websession, tracer=tracer)
+            return await fetch_all_station(api_key, api_secret, soliscloud)
+
+    try:
+        with span("job", job="inverter_month_mysql"):
+            await collect_today(api_key, api_secret, soliscloud)
+    finally:
+        # Exported after every run, the daemon calls this for every account without exiting
+        if tracer:
+            tracer.flush()
+
+async def collect_today(api_key, api_secret, soliscloud):
+    """Write today's rows of all inverters to the sinks."""
+    today_date = get_today_date()
     retries = 0
     max_retries = 10
-    total_inverters = 0
 
-    async with ClientSession() as websession:
-        try:
-            soliscloud = SoliscloudAPI('https://soliscloud.com:13333', websession)
-            
-            if not soliscloud:
-                print("❌ Failed to initialize SoliscloudAPI.")
-                return
-
-            inverter_ids = await retry_operation(
-                lambda: Helpers.get_inverter_ids(soliscloud, api_key, api_secret),
-                retries,
-                max_retries,
-                "Fetch Inverter IDs"
-            )
-
-            if not inverter_ids:
-                print("❌ No inverters found.")
-                return
-
-            for inverter_id in inverter_ids:
-                inverter_detail = await retry_operation(
-                    lambda: soliscloud.inverter_detail(api_key, api_secret, inverter_id=inverter_id),
-                    retries,
-                    max_retries,
-                    f"Inverter detail for {inverter_id}",
-                )
-
-                if inverter_detail is None:
-                    print(f"⚠️ No details found for Inverter ID: {inverter_id}. Skipping...")
-                    continue
-
-                station_name = inverter_detail.get("stationName")
-                print(f"\n📡 Fetching Inverter Data for ID: {inverter_id}, Name: {station_name}")
-
-                print(f"🔄 Fetching monthly data for {current_month}...")
-
-                inverter_month_data = await retry_operation(
-                    lambda: soliscloud.inverter_month(
-                        api_key, api_secret,
-                        currency="MYR",
-                        month=current_month,
-                        inverter_id=inverter_id
-                    ),
-                    retries,
-                    max_retries,
-                    f"Fetch inverter month data for {inverter_id}"
-                )
-
-                if not inverter_month_data:
-                    print(f"⚠️ No data returned for {current_month}. Skipping...")
-                    continue
-
-                # Filtering only today's data
-                todays_records = [
-                    {
-                        "inverter_id": inverter_id,
-                        "station_name": station_name,
-                        "dateStr": record.get("dateStr"),
-                        "money": float(record.get("money")),
-                        "moneyStr": record.get("moneyStr"),
-                        "energy": float(record.get("energy")),
-                        "energyStr": record.get("energyStr", "")
-                    }
-                    for record in inverter_month_data if record.get("dateStr") == today_date
-                ]
-
-                if not todays_records:
-                    print(f"⚠️ No data available for today ({today_date}). Skipping...")
-                    continue
-
-                print(f"✅ Found {len(todays_records)} records for today ({today_date}).")
-
-                await retry_operation(
-                    lambda: insert_inverter_data(todays_records),
-                    retries,
-                    max_retries,
-                    f"Insert data for Inverter ID {inverter_id} and Date {today_date}"
-                )
-
-                total_inverters += 1
-                print(f"🎯 Total Inverters Processed: {total_inverters}")
-
-        except Exception as e:
-            print(f"🚨 General Error: {e}")
-            send_telegram_message(f"🚨 General Error [MYSQL: INVERTER DAILY]: {e}")
+    sink = open_sinks()
+    closing = False
+    try:
+        
+        if not soliscloud:
+            print("❌ Failed to initialize SoliscloudAPI.")
+            return
+
+        print(f"🔄 Fetching today's energy ({today_date}) of all inverters...")
+
+        # eToday of 100 inverters per call instead of a detail and a month call per inverter
+        todays_records = await retry_operation(
+            lambda: inverter_daily_totals(soliscloud, api_key, api_secret, today_date, time_zone=TIME_ZONE),
+            retries,
+            max_retries,
+            "Fetch inverter daily totals",
+            on_retry=lambda: soliscloud.observe_retry(INVERTER_DETAIL_LIST)
+        )
+
+        if not todays_records:
+            print(f"⚠️ No data available for today ({today_date}). Skipping...")
+            return
+
+        print(f"✅ Found {len(todays_records)} records for today ({today_date}).")
+
+        # The detail pages carry no income, money/moneyStr still come from inverter_month
+        await retry_operation(
+            lambda: add_money(soliscloud, api_key, api_secret, todays_records, currency="MYR"),
+            retries,
+            max_retries,
+            "Fetch inverter month money",
+            on_retry=lambda: soliscloud.observe_retry(INVERTER_MONTH)
+        )
+
+        # Closes the sinks once the records are written
+        closing = True
+        await insert_inverter_data(sink, todays_records)
+        print(f"🎯 Total Inverters Processed: {len(todays_records)}")
+
+    except Exception as e:
+        print(f"🚨 General Error: {e}")
+        send_telegram_message(f"🚨 General Error [MYSQL: INVERTER DAILY]: {e}")
+
+    finally:
+        if not closing:
+            await close_sinks(sink)
 
 async def main():
     """Main function to fetch API credentials and initiate data collection."""
@@ -10,15 +10,20 @@ import hmac
 import base64
 import asyncio
 import re
+from contextlib import nullcontext
 from datetime import datetime
 from datetime import timezone
 from enum import Enum
 from http import HTTPStatus
 import json
-from typing import Any
-from throttler import throttle
+from time import monotonic
+from typing import Any, Sequence
+from throttler import Throttler
 from aiohttp import ClientError, ClientSession
 import async_timeout
+from soliscloud_api.projection import projection
+from soliscloud_api.streaming import CHUNK_SIZE, RecordStream
+from soliscloud_api.timeouts import TOTAL, Timeout, Timeouts
 
 # VERSION
 VERSION = '1.2.0'
@@ -27,6 +32,15 @@ RESOURCE_PREFIX = '/v1/api/'
 
 VERB = "POST"
 
+# SoliscloudAPI allows 2 calls per second, shared by all instances
+RATE_LIMIT = 2
+RATE_PERIOD = 1.0
+_THROTTLER = Throttler(rate_limit=RATE_LIMIT, period=RATE_PERIOD)
+
+# Default seconds to wait for the response headers or the next chunk of a
+# body, pass timeouts=Timeouts(...) for other or per-endpoint values
+TIMEOUT = TOTAL
+
 # Endpoints
 USER_STATION_LIST = RESOURCE_PREFIX + 'userStationList'
 STATION_DETAIL = RESOURCE_PREFIX + 'stationDetail'
@@ -134,9 +148,26 @@ server time, your time is {now}"
             return f'API returned an error: {self.message}, \
 error code: {self.code}, response: {self.response}'
 
-    def __init__(self, domain: str, session: ClientSession) -> None:
+    def __init__(
+        self, domain: str, session: ClientSession, transport=None, *,
+        metrics=None,
+        tracer=None,
+        throttler: Throttler = None,
+        timeouts: Timeouts = None
+    ) -> None:
         self._domain = domain.rstrip("/")
         self._session: ClientSession = session
+        # Optional soliscloud_api.transport.Transport, used for record/replay
+        self._transport = transport
+        # Optional soliscloud_api.metrics.ClientMetrics
+        self._metrics = metrics
+        # Optional soliscloud_api.tracing.Tracer
+        self._tracer = tracer
+        # Rate limiter, pass a separate Throttler per account to give each
+        # account its own rate budget
+        self._throttler = throttler or _THROTTLER
+        # Connect, read and total timeout per endpoint, optionally adaptive
+        self._timeouts = timeouts or Timeouts()
 
     class DateFormat(Enum):
         DAY = 0
@@ -153,6 +184,26 @@ error code: {self.code}, response: {self.response}'
         """ aiohttp client session ID."""
         return self._session
 
+    @property
+    def transport(self):
+        """ Transport used for http-posts, None for plain aiohttp."""
+        return self._transport
+
+    @property
+    def metrics(self):
+        """ ClientMetrics collected for this instance, None if disabled."""
+        return self._metrics
+
+    @property
+    def timeouts(self) -> Timeouts:
+        """ Request timeouts per endpoint."""
+        return self._timeouts
+
+    @property
+    def tracer(self):
+        """ Tracer receiving the call spans, None if disabled."""
+        return self._tracer
+
     @property
     def spec_version(self) -> str:
         """ supported version of the Soliscloud spec."""
@@ -269,9 +320,11 @@ error code: {self.code}, response: {self.response}'
     async def inverter_detail(
         self, key_id: str, secret: bytes, /, *,
         inverter_sn: int = None,
-        inverter_id: str = None
+        inverter_id: str = None,
+        fields: Sequence[str] = None,
+        as_tuple: bool = False
     ) -> dict[str, str]:
-        """Inverter details"""
+        """Inverter details, optionally only fields (as dict or tuple)"""
 
         params: dict[str, Any] = {}
         if (inverter_sn is not None and inverter_id is None):
@@ -280,7 +333,9 @@ error code: {self.code}, response: {self.response}'
             params['id'] = inverter_id
         else:
             raise SoliscloudAPI.SolisCloudError(ONLY_INV_ID_OR_SN_ERR)
-        return await self._get_data(INVERTER_DETAIL, key_id, secret, params)
+        project = projection(fields, as_tuple)
+        result = await self._get_data(INVERTER_DETAIL, key_id, secret, params)
+        return result if project is None else project(result)
 
     async def station_day(
         self, key_id: str, secret: bytes, /, *,
@@ -509,30 +564,80 @@ error code: {self.code}, response: {self.response}'
     async def station_detail_list(
         self, key_id: str, secret: bytes, /, *,
         page_no: int = 1,
-        page_size: int = 20
+        page_size: int = 20,
+        fields: Sequence[str] = None,
+        as_tuple: bool = False
     ) -> dict[str, str]:
-        """Batch acquire station details"""
+        """Batch acquire station details, optionally only fields"""
 
         if page_size > 100:
             raise SoliscloudAPI.SolisCloudError(PAGE_SIZE_ERR)
         params: dict[str, Any] = {'pageNo': page_no, 'pageSize': page_size}
 
-        return await self._get_records(
+        project = projection(fields, as_tuple)
+        records = await self._get_records(
             STATION_DETAIL_LIST, key_id, secret, params)
+        return records if project is None else project.many(records)
 
     async def inverter_detail_list(
         self, key_id: str, secret: bytes, /, *,
         page_no: int = 1,
-        page_size: int = 20
+        page_size: int = 20,
+        fields: Sequence[str] = None,
+        as_tuple: bool = False
     ) -> dict[str, str]:
-        """Batch acquire inverter details"""
+        """Batch acquire inverter details, optionally only fields"""
 
         if page_size > 100:
             raise SoliscloudAPI.SolisCloudError(PAGE_SIZE_ERR)
         params: dict[str, Any] = {'pageNo': page_no, 'pageSize': page_size}
 
-        return await self._get_records(
+        project = projection(fields, as_tuple)
+        records = await self._get_records(
             INVERTER_DETAIL_LIST, key_id, secret, params)
+        return records if project is None else project.many(records)
+
+    async def station_detail_list_stream(
+        self, key_id: str, secret: bytes, /, *,
+        page_no: int = 1,
+        page_size: int = 20,
+        fields: Sequence[str] = None,
+        as_tuple: bool = False
+    ):
+        """Batch acquire station details, yielded while the page arrives"""
+
+        if page_size > 100:
+            raise SoliscloudAPI.SolisCloudError(PAGE_SIZE_ERR)
+        params: dict[str, Any] = {'pageNo': page_no, 'pageSize': page_size}
+
+        records = self._stream_records(
+            STATION_DETAIL_LIST, key_id, secret, params, projection(fields, as_tuple))
+        try:
+            async for record in records:
+                yield record
+        finally:
+            await records.aclose()
+
+    async def inverter_detail_list_stream(
+        self, key_id: str, secret: bytes, /, *,
+        page_no: int = 1,
+        page_size: int = 20,
+        fields: Sequence[str] = None,
+        as_tuple: bool = False
+    ):
+        """Batch acquire inverter details, yielded while the page arrives"""
+
+        if page_size > 100:
+            raise SoliscloudAPI.SolisCloudError(PAGE_SIZE_ERR)
+        params: dict[str, Any] = {'pageNo': page_no, 'pageSize': page_size}
+
+        records = self._stream_records(
+            INVERTER_DETAIL_LIST, key_id, secret, params, projection(fields, as_tuple))
+        try:
+            async for record in records:
+                yield record
+        finally:
+            await records.aclose()
 
     async def station_day_energy_list(
         self, key_id: str, secret: bytes, /, *,
@@ -714,18 +819,25 @@ error code: {self.code}, response: {self.response}'
         Return all records from call
         """
 
-        header: dict[str, str] = SoliscloudAPI._prepare_header(
-            key_id, secret, params, canonicalized_resource)
+        with self._span('call', endpoint=canonicalized_resource):
+            with self._span('sign'):
+                header: dict[str, str] = SoliscloudAPI._prepare_header(
+                    key_id, secret, params, canonicalized_resource)
 
-        url = f"{self.domain}{canonicalized_resource}"
-        try:
-            result = await self._post_data_json(url, header, params)
-            if 'page' in result.keys():
-                return result['page']['records']
-            else:
-                return result['records']
-        except KeyError as err:
-            raise SoliscloudAPI.ApiError("Malformed data", result) from err
+            url = f"{self.domain}{canonicalized_resource}"
+            try:
+                result = await self._post_data_json(url, header, params)
+                if 'page' in result.keys():
+                    records = result['page']['records']
+                else:
+                    records = result['records']
+                if self._metrics is not None:
+                    self._metrics.observe_records(
+                        canonicalized_resource, len(records))
+                return records
+            except KeyError as err:
+                raise SoliscloudAPI.ApiError(
+                    "Malformed data", result) from err
 
     async def _get_data(
         self, canonicalized_resource: str, key_id: str, secret: bytes,
@@ -735,14 +847,199 @@ error code: {self.code}, response: {self.response}'
         Return data from call
         """
 
-        header: dict[str, str] = SoliscloudAPI._prepare_header(
-            key_id, secret, params, canonicalized_resource)
+        with self._span('call', endpoint=canonicalized_resource):
+            with self._span('sign'):
+                header: dict[str, str] = SoliscloudAPI._prepare_header(
+                    key_id, secret, params, canonicalized_resource)
 
-        url = f"{self.domain}{canonicalized_resource}"
-        result = await self._post_data_json(url, header, params)
+            url = f"{self.domain}{canonicalized_resource}"
+            result = await self._post_data_json(url, header, params)
 
         return result
 
+    async def _stream_records(
+        self, canonicalized_resource: str, key_id: str, secret: bytes,
+        params: dict[str, Any], project=None
+    ):
+        """
+        Yield records from call while the response body arrives, projected
+        if project is given; the decoder then parses only the projected
+        fields. Responses without a body stream (e.g. from a transport) are
+        decoded at once.
+        """
+
+        # Current only while the request runs, not while records are
+        # handed to the caller
+        call = None if self._tracer is None else self._tracer.start_span(
+            'call', endpoint=canonicalized_resource)
+        error = None
+        try:
+            with self._activate(call):
+                with self._span('sign'):
+                    header: dict[str, str] = SoliscloudAPI._prepare_header(
+                        key_id, secret, params, canonicalized_resource)
+                url = f"{self.domain}{canonicalized_resource}"
+                await self._wait_turn(url)
+            # Counted by outcome once the whole body has been read
+            request = nullcontext() if self._metrics is None \
+                else self._metrics.request(canonicalized_resource)
+            with request:
+                async for record in self._in_span(call, self._read_records(
+                        url, header, params, canonicalized_resource,
+                        None if project is None else project.fields)):
+                    yield record if project is None else project(record)
+        except Exception as err:
+            error = err
+            raise
+        finally:
+            if call is not None:
+                self._tracer.end_span(call, error)
+
+    def _activate(self, span):
+        """ Make span current for the with-block, if tracing."""
+        if span is None:
+            return nullcontext()
+        return self._tracer.activate(span)
+
+    async def _in_span(self, span, records):
+        """ Records of an async generator, advanced with span current."""
+        try:
+            while True:
+                with self._activate(span):
+                    try:
+                        record = await records.__anext__()
+                    except StopAsyncIteration:
+                        return
+                yield record
+        finally:
+            # Releases the response when the caller stops early
+            await records.aclose()
+
+    async def _read_records(
+        self, url: str, header: dict[str, Any], params: dict[str, Any],
+        canonicalized_resource: str, fields: Sequence[str] = None
+    ):
+        # Latency of the whole request, without the time the caller spends
+        # on the records, as _request_json observes it
+        start = monotonic()
+        resp = await self._open_stream(url, header, params)
+        try:
+            if not hasattr(resp, 'content'):
+                records = SoliscloudAPI._page_records(await resp.json())
+            else:
+                records = self._read_stream(
+                    resp, self._timeouts.get(canonicalized_resource).chunk,
+                    fields)
+            count = 0
+            elapsed = 0.0
+            async for record in _aiter(records):
+                count += 1
+                elapsed += monotonic() - start
+                yield record
+                start = monotonic()
+            self._timeouts.observe(
+                canonicalized_resource, elapsed + monotonic() - start)
+            if self._metrics is not None:
+                self._metrics.observe_records(canonicalized_resource, count)
+        except asyncio.TimeoutError as err:
+            raise SoliscloudAPI.TimeoutError() from err
+        except ClientError as err:
+            raise SoliscloudAPI.ApiError(err)
+        finally:
+            await resp.release()
+
+    async def _read_stream(
+        self, resp, timeout: float = TIMEOUT, fields: Sequence[str] = None
+    ):
+        stream = RecordStream(fields=fields)
+        # Records are held back until the code of the response is known
+        pending = []
+        while True:
+            chunk = await asyncio.wait_for(
+                resp.content.read(CHUNK_SIZE), timeout)
+            if not chunk:
+                break
+            try:
+                pending += stream.feed(chunk)
+            except ValueError as err:
+                raise SoliscloudAPI.ApiError(
+                    "Malformed server response") from err
+            if 'code' in stream.head:
+                SoliscloudAPI._check_code(stream.head)
+                for record in pending:
+                    yield record
+                pending = []
+        try:
+            envelope = stream.finish()
+        except ValueError as err:
+            raise SoliscloudAPI.ApiError(
+                "Malformed server response") from err
+        # Checks code and presence of the (now emptied) records
+        SoliscloudAPI._page_records(envelope)
+        for record in pending:
+            yield record
+
+    @staticmethod
+    def _check_code(result: dict[str, Any]) -> None:
+        """Raise ApiError if the code of a response is not success."""
+        if result['code'] != '0':
+            raise SoliscloudAPI.ApiError(result.get('msg'), result['code'])
+
+    @staticmethod
+    def _page_records(result: dict[str, Any]) -> list:
+        """Records of a decoded list response."""
+        try:
+            SoliscloudAPI._check_code(result)
+            data = result['data']
+            if 'page' in data:
+                return data['page']['records']
+            return data['records']
+        except (KeyError, TypeError) as err:
+            raise SoliscloudAPI.ApiError(
+                "Malformed server response", response=result) from err
+
+    async def _open_stream(
+        self,
+        url: str,
+        header: dict[str, Any],
+        params: dict[str, Any]
+    ):
+        """
+        Unthrottled http-post, returns the response once headers arrive.
+        Its latency is observed once the body has been read.
+        """
+        if self._session is None and self._transport is None:
+            raise SoliscloudAPI.SolisCloudError(
+                "aiohttp.ClientSession not set")
+        endpoint = url[len(self._domain):]
+        timeout = self._timeouts.get(endpoint)
+        # Replayed traffic is not timed out, so it can run at any speed
+        total = None if self._replaying else timeout.total
+        try:
+            async with async_timeout.timeout(total):
+                with self._span('network'):
+                    resp = await self._post(url, params, header, timeout)
+        except asyncio.TimeoutError as err:
+            self._timeouts.timed_out(endpoint, total)
+            raise SoliscloudAPI.TimeoutError() from err
+        except ClientError as err:
+            raise SoliscloudAPI.ApiError(err)
+        if resp.status != HTTPStatus.OK:
+            await resp.release()
+            raise SoliscloudAPI.HttpError(resp.status)
+        return resp
+
+    def observe_retry(self, canonicalized_resource: str) -> None:
+        """ Count a retried call in the metrics, if enabled."""
+        if self._metrics is not None:
+            self._metrics.observe_retry(canonicalized_resource)
+
+    def _span(self, name: str, **attributes):
+        """ Tracing span if a tracer is set, no-op context otherwise."""
+        if self._tracer is None:
+            return nullcontext()
+        return self._tracer.span(name, **attributes)
+
     @staticmethod
     def _now() -> datetime.datetime:
         return datetime.now(timezone.utc)
@@ -786,7 +1083,6 @@ error code: {self.code}, response: {self.response}'
         }
         return header
 
-    @throttle(rate_limit=2, period=1.0)
     async def _post_data_json(
         self,
         url: str,
@@ -795,25 +1091,64 @@ error code: {self.code}, response: {self.response}'
     ) -> dict[str, Any]:
         """ Http-post data to specified domain/canonicalized_resource. """
 
+        await self._wait_turn(url)
+        if self._metrics is None:
+            return await self._request_json(url, header, params)
+        with self._metrics.request(url[len(self._domain):]):
+            return await self._request_json(url, header, params)
+
+    @property
+    def _replaying(self) -> bool:
+        """ Whether responses come from a recorded trace, see transport."""
+        return getattr(self._transport, 'replay', False)
+
+    async def _wait_turn(self, url: str) -> None:
+        """ Wait for the rate limiter, not needed for replayed traffic."""
+        if self._replaying:
+            return
+        queued = monotonic()
+        with self._span('queue_wait'):
+            async with self._throttler:
+                pass
+        if self._metrics is not None:
+            self._metrics.observe_wait(
+                url[len(self._domain):], monotonic() - queued)
+
+    async def _request_json(
+        self,
+        url: str,
+        header: dict[str, Any],
+        params: dict[str, Any]
+    ) -> dict[str, Any]:
+        """ Unthrottled http-post, returns data part of the response. """
+
         resp = None
         result = None
-        if self._session is None:
+        if self._session is None and self._transport is None:
             raise SoliscloudAPI.SolisCloudError(
                 "aiohttp.ClientSession not set")
+        endpoint = url[len(self._domain):]
+        timeout = self._timeouts.get(endpoint)
+        total = None if self._replaying else timeout.total
         try:
-            async with async_timeout.timeout(10):
-                resp = await SoliscloudAPI._do_post_aiohttp(
-                    self._session, url, params, header)
-
-                result = await resp.json()
+            start = monotonic()
+            async with async_timeout.timeout(total):
+                with self._span('network'):
+                    resp = await self._post(url, params, header, timeout)
+                with self._span('parse'):
+                    result = await resp.json()
                 if resp.status == HTTPStatus.OK:
                     if result['code'] != '0':
                         raise SoliscloudAPI.ApiError(
                             result['msg'], result['code'])
-                    return result['data']
+                    data = result['data']
+                    # Successful requests only, errors have raised
+                    self._timeouts.observe(endpoint, monotonic() - start)
+                    return data
                 else:
                     raise SoliscloudAPI.HttpError(resp.status)
         except asyncio.TimeoutError as err:
+            self._timeouts.timed_out(endpoint, total)
             if resp is not None:
                 await resp.release()
             raise SoliscloudAPI.TimeoutError() from err
@@ -825,15 +1160,39 @@ error code: {self.code}, response: {self.response}'
             raise SoliscloudAPI.ApiError(
                 "Malformed server response", response=result) from err
 
+    async def _post(
+        self,
+        url: str,
+        params: dict[str, Any],
+        header: dict[str, Any],
+        timeout: Timeout = None
+    ):
+        """ Post using the configured transport, if any."""
+        if self._transport is not None:
+            resp = await self._transport.post(
+                self._session, url, params, header)
+        elif timeout is None:
+            resp = await SoliscloudAPI._do_post_aiohttp(
+                self._session, url, params, header)
+        else:
+            resp = await SoliscloudAPI._do_post_aiohttp(
+                self._session, url, params, header,
+                timeout=timeout.client_timeout())
+        if self._metrics is not None:
+            self._metrics.observe_payload(
+                url[len(self._domain):], getattr(resp, 'content_length', None))
+        return resp
+
     @staticmethod
     async def _do_post_aiohttp(
         session,
         url: str,
         params: dict[str, Any],
-        header: dict[str, Any]
+        header: dict[str, Any],
+        **kwargs
     ) -> dict[str, Any]:
         """ Allows mocking for unit tests."""
-        return await session.post(url, json=params, headers=header)
+        return await session.post(url, json=params, headers=header, **kwargs)
 
     @staticmethod
     def _verify_date(format: SoliscloudAPI.DateFormat, date: str):
@@ -850,3 +1209,13 @@ error code: {self.code}, response: {self.response}'
         if not rex.match(date):
             raise err
         return
+
+
+async def _aiter(records):
+    """Async iterator over a list or async iterator of records."""
+    if hasattr(records, '__aiter__'):
+        async for record in records:
+            yield record
+    else:
+        for record in records:
+            yield record
@@ -0,0 +1,187 @@
+"""Multi-account orchestration.
+
+config.json may hold a list of accounts, each with its own key and secret:
+
+    "accounts": [
+        {"name": "customer_a", "key": "...", "secret": "..."},
+        {"name": "customer_b", "key": "...", "secret": "...", "rate_limit": 2}
+    ]
+
+The single "key"/"secret" pair is still accepted as an account named default.
+Each account gets its own SoliscloudAPI instance and rate limiter, and a
+failure in one account does not affect the others.
+
+For more information: https://github.com/hultenvp/soliscloud_api
+"""
+from __future__ import annotations
+
+import asyncio
+import importlib
+import logging
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+
+from throttler import Throttler
+
+from soliscloud_api import SoliscloudAPI, RATE_LIMIT, RATE_PERIOD
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_DOMAIN = 'https://soliscloud.com:13333'
+
+
+class Account:
+    """Credentials and rate budget of one SoliscloudAPI key."""
+
+    def __init__(
+        self, name: str, key_id: str, secret: bytes, *,
+        nmi_code: str = None,
+        domain: str = DEFAULT_DOMAIN,
+        rate_limit: int = RATE_LIMIT
+    ) -> None:
+        self.name = name
+        self.key_id = key_id
+        self.secret = secret
+        self.nmi_code = nmi_code
+        self.domain = domain
+        self.rate_limit = rate_limit
+
+    def __repr__(self) -> str:
+        return f"Account({self.name!r})"
+
+    @staticmethod
+    def from_config(config: dict[str, Any], name: str = 'default') -> Account:
+        return Account(
+            config.get('name', name),
+            config['key'],
+            config['secret'].encode('utf-8'),
+            nmi_code=config.get('nmi_code'),
+            domain=config.get('domain', DEFAULT_DOMAIN),
+            rate_limit=config.get('rate_limit', RATE_LIMIT))
+
+    def to_config(self) -> dict[str, Any]:
+        return {
+            'name': self.name, 'key': self.key_id,
+            'secret': self.secret.decode('utf-8'),
+            'nmi_code': self.nmi_code, 'domain': self.domain,
+            'rate_limit': self.rate_limit}
+
+
+def load_accounts(config: dict[str, Any]) -> list[Account]:
+    """Accounts from the accounts list, or the single key/secret pair."""
+    if 'accounts' in config:
+        accounts = [Account.from_config(c) for c in config['accounts']]
+    else:
+        accounts = [Account.from_config(config)]
+    names = [a.name for a in accounts]
+    if len(set(names)) != len(names):
+        raise ValueError("Account names must be unique")
+    for account in accounts:
+        account.rate_limit = _rate_limit(account)
+    return accounts
+
+
+def _rate_limit(account: Account) -> int:
+    """rate_limit as requests per RATE_PERIOD, a whole number >= 1."""
+    limit = account.rate_limit
+    if isinstance(limit, float) and limit.is_integer():
+        limit = int(limit)
+    if isinstance(limit, bool) or not isinstance(limit, int) or limit < 1:
+        raise ValueError(
+            f"rate_limit of account {account.name} must be a whole number "
+            f">= 1 (requests per {RATE_PERIOD:g} s), got {limit!r}")
+    return limit
+
+
+def account_path(path: str, key_id) -> str:
+    """
+    path of per-account state, with the key id inserted before the
+    extension: account_path("device_registry.json", "123") gives
+    "device_registry.123.json".
+    """
+    root, ext = os.path.splitext(path)
+    return f"{root}.{re.sub(r'[^A-Za-z0-9_-]', '_', str(key_id))}{ext}"
+
+
+def shard(accounts: list, count: int) -> list[list]:
+    """Split accounts round-robin into at most count non-empty shards."""
+    shards = [accounts[i::count] for i in range(count)]
+    return [s for s in shards if s]
+
+
+def resolve(target: str):
+    """Import function from "module:function"."""
+    module, _, name = target.partition(':')
+    return getattr(importlib.import_module(module), name)
+
+
+class Orchestrator:
+    """
+    Runs a job for all accounts concurrently. A job is called as
+    await job(key_id, secret, soliscloud=api).
+    """
+
+    def __init__(self, accounts: list[Account], session=None, **api_kwargs):
+        self.accounts = accounts
+        self._session = session
+        self._api_kwargs = api_kwargs
+        self._apis: dict[str, SoliscloudAPI] = {}
+
+    def api(self, account: Account) -> SoliscloudAPI:
+        """SoliscloudAPI instance of account, kept for later runs."""
+        if account.name not in self._apis:
+            self._apis[account.name] = SoliscloudAPI(
+                account.domain, self._session,
+                throttler=Throttler(account.rate_limit, RATE_PERIOD),
+                **self._api_kwargs)
+        return self._apis[account.name]
+
+    async def _run_account(self, account: Account, job):
+        try:
+            return await job(
+                account.key_id, account.secret, soliscloud=self.api(account))
+        except Exception as err:
+            _LOGGER.exception("Job failed for account %s", account.name)
+            return err
+
+    async def run(self, job) -> dict[str, Any]:
+        """
+        Run job for all accounts, returns result per account name.
+        Failed accounts have the exception as result.
+        """
+        if self._session is None:
+            from aiohttp import ClientSession
+            async with ClientSession() as websession:
+                self._session = websession
+                try:
+                    return await self.run(job)
+                finally:
+                    self._session = None
+                    self._apis.clear()
+        results = await asyncio.gather(
+            *(self._run_account(a, job) for a in self.accounts))
+        return dict(zip((a.name for a in self.accounts), results))
+
+    def run_sharded(self, target: str, processes: int) -> dict[str, Any]:
+        """
+        Run target ("module:function") for all accounts, spread over worker
+        processes. Failed accounts have the exception text as result.
+        """
+        shards = shard([a.to_config() for a in self.accounts], processes)
+        results = {}
+        with ProcessPoolExecutor(max_workers=len(shards)) as executor:
+            for part in executor.map(
+                    _run_shard, shards, [target] * len(shards)):
+                results.update(part)
+        return results
+
+
+def _run_shard(account_configs: list[dict], target: str) -> dict[str, Any]:
+    """Worker process entry point, results must be picklable."""
+    accounts = [Account.from_config(c) for c in account_configs]
+    results = asyncio.run(Orchestrator(accounts).run(resolve(target)))
+    return {
+        name: repr(result) if isinstance(result, Exception) else result
+        for name, result in results.items()}
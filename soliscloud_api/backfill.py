@@ -0,0 +1,162 @@
+"""Backfill range planning.
+
+Clamps each device's backfill range to its first-power date and remembers
+periods that returned no data, so they are not requested again on later runs.
+A period marked empty shortly after it ended is checked again until it has
+been empty for settle_days, as the portal may still upload late data.
+
+For more information: https://github.com/hultenvp/soliscloud_api
+"""
+from __future__ import annotations
+
+import json
+import os
+from datetime import date, datetime, timedelta
+
+from soliscloud_api import SoliscloudAPI
+from soliscloud_api.helpers import Helpers
+
+# Record fields holding the first-power or commissioning date, best first
+FIRST_POWER_FIELDS = (
+    'fisGenerateTimeStr', 'fisPowerTimeStr', 'fisPowerTime',
+    'createDateStr', 'createDate')
+
+DEFAULT_START = date(2024, 1, 1)
+
+# Days after the end of a period before an empty result is trusted
+SETTLE_DAYS = 7
+
+
+def parse_date(value) -> date:
+    """Date from 'YYYY-MM-DD[ HH:MM:SS]' or epoch ms, None if invalid."""
+    if value in (None, ''):
+        return None
+    try:
+        return datetime.strptime(str(value)[:10], "%Y-%m-%d").date()
+    except ValueError:
+        pass
+    try:
+        return datetime.fromtimestamp(float(value) / 1000).date()
+    except (ValueError, OverflowError, OSError):
+        return None
+
+
+def first_power_date(record: dict) -> date:
+    """First-power date of a station or inverter record, None if unknown."""
+    for field in FIRST_POWER_FIELDS:
+        value = parse_date(record.get(field))
+        if value is not None:
+            return value
+    return None
+
+
+def day_range(start: date, end: date) -> list[str]:
+    """Days from start to end inclusive, as YYYY-MM-DD."""
+    return [(start + timedelta(days=i)).strftime("%Y-%m-%d")
+            for i in range((end - start).days + 1)]
+
+
+def month_range(start: date, end: date) -> list[str]:
+    """Months from start to end inclusive, as YYYY-MM."""
+    return [f"{year}-{month:02d}"
+            for year in range(start.year, end.year + 1)
+            for month in range(1, 13)
+            if (year, month) >= (start.year, start.month)
+            and (year, month) <= (end.year, end.month)]
+
+
+async def station_first_power_dates(
+    api: SoliscloudAPI, key, secret
+) -> dict[str, date]:
+    """First-power date per station id, from the paged station details."""
+    dates: dict[str, date] = {}
+    async for station in Helpers.iter_pages(
+            api.station_detail_list, key, secret):
+        start = first_power_date(station)
+        if start is not None:
+            dates[str(station.get('id'))] = start
+    return dates
+
+
+def period_end(period: str) -> date:
+    """Last day of a 'YYYY-MM-DD' day or 'YYYY-MM' month period."""
+    if len(period) > 7:
+        return datetime.strptime(period, "%Y-%m-%d").date()
+    first = datetime.strptime(period, "%Y-%m").date()
+    return (first + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+
+
+class NegativeCache:
+    """
+    Periods per device that returned no data, with the date they were marked,
+    optionally kept on disk. A period only counts as empty when it was marked
+    at least settle_days after it ended, younger marks are checked again.
+    """
+
+    def __init__(self, path: str = None, settle_days: int = SETTLE_DAYS) -> None:
+        self.path = path
+        self.settle_days = settle_days
+        self._empty: dict[str, dict[str, str]] = {}
+        if path is not None and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as file:
+                self._empty = json.load(file)
+
+    def __contains__(self, item: tuple) -> bool:
+        device_id, period = item
+        marked = self._empty.get(str(device_id), {}).get(period)
+        if marked is None:
+            return False
+        return (date.fromisoformat(marked) - period_end(period)).days >= \
+            self.settle_days
+
+    def add(self, device_id, period: str, marked: date = None) -> None:
+        marked = marked or date.today()
+        self._empty.setdefault(str(device_id), {})[period] = marked.isoformat()
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as file:
+            json.dump(self._empty, file, sort_keys=True)
+        os.replace(tmp, self.path)
+
+
+class BackfillPlanner:
+    """
+    Plans the days or months to fetch per device. Ranges start at the later
+    of default_start and the device's first-power date and skip periods in
+    the negative cache. The current and future periods are never cached as
+    empty, as data may still arrive.
+    """
+
+    def __init__(
+        self, cache: NegativeCache = None, default_start: date = DEFAULT_START
+    ) -> None:
+        self.cache = cache or NegativeCache()
+        self.default_start = default_start
+
+    @staticmethod
+    def _today() -> date:
+        return date.today()
+
+    def _start(self, first_power: date) -> date:
+        if first_power is None:
+            return self.default_start
+        return max(first_power, self.default_start)
+
+    def days(self, device_id, first_power: date = None) -> list[str]:
+        return [d for d in day_range(self._start(first_power), self._today())
+                if (device_id, d) not in self.cache]
+
+    def months(self, device_id, first_power: date = None) -> list[str]:
+        return [m for m in month_range(
+                    self._start(first_power), self._today())
+                if (device_id, m) not in self.cache]
+
+    def empty(self, device_id, period: str) -> None:
+        """Mark period as returning no data for device."""
+        today = self._today()
+        if period_end(period) >= today:
+            return
+        self.cache.add(device_id, period, today)
@@ -0,0 +1,548 @@
+"""Command line interface.
+
+    soliscloud snapshot inverter --sink influx
+    soliscloud daily --date 2025-03-15 --sink mysql
+    soliscloud daily --sink mysql --sink influx
+    soliscloud backfill month --sink mysql
+    soliscloud backfill day --sink mysql --bulk
+    soliscloud stations day --since 2024-01-01 --sink mysql
+    soliscloud rollup day_rows.jsonl --period month --by station
+    soliscloud export inverter_detail_list -o inverters.jsonl
+    soliscloud bench inverter_detail_list --count 20
+
+Commands run for every account in config.json (see accounts.py). Sinks and
+their drivers are imported only by the commands that write to them, so a
+short cron job does not load influxdb_client or mysql.connector, and
+writes do not block the event loop (see sinks.open_async_sink). Sink
+settings are read from "sinks" in config.json, e.g.
+{"sinks": {"mysql": {"host": ..., "user": ..., ...}}}, with configcentral.py
+as fallback.
+
+For more information: https://github.com/hultenvp/soliscloud_api
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import importlib
+import inspect
+import json
+import statistics
+import sys
+import time
+
+DEFAULT_CONFIG = 'config.json'
+
+# Sink options per sink, as configcentral.py attribute names
+CONFIGCENTRAL = {
+    'influx': {
+        'url': 'INFLUX_URL', 'token': 'INFLUX_TOKEN',
+        'org': 'INFLUX_ORG', 'bucket': 'INFLUX_BUCKET'},
+    'mysql': {
+        'host': 'MYSQL_HOST', 'user': 'MYSQL_USER',
+        'password': 'MYSQL_PASSWORD', 'database': 'MYSQL_DATABASE'},
+    'postgres': {'dsn': 'POSTGRES_DSN'},
+}
+
+
+def sink_options(name: str, config: dict) -> dict:
+    """Options of sink name from config.json, else from configcentral.py."""
+    options = config.get('sinks', {}).get(name)
+    if options is not None:
+        return dict(options)
+    if name not in CONFIGCENTRAL:
+        return {}
+    try:
+        configcentral = importlib.import_module('configcentral')
+    except ImportError:
+        return {}
+    return {
+        option: getattr(configcentral, attribute)
+        for option, attribute in CONFIGCENTRAL[name].items()
+        if hasattr(configcentral, attribute)}
+
+
+def _open(name: str, args, config: dict):
+    from soliscloud_api.sinks import ThreadedSink, open_async_sink, open_sink
+    options = sink_options(name, config)
+    if name == 'jsonl':
+        options.setdefault('path', args.output)
+    if getattr(args, 'bulk', False) and name == 'mysql':
+        options['bulk'] = True
+    if options.pop('bulk', False):
+        return ThreadedSink(open_sink(name, bulk=True, **options))
+    return open_async_sink(name, **options)
+
+
+def sink_for(args, config: dict):
+    """
+    Async sink of --sink, bulk loads run the sync sink on a thread. With
+    several --sink options every row is written to each of them.
+    """
+    names = list(dict.fromkeys(args.sink or [args.default_sink]))
+    if getattr(args, 'bulk', False) and 'mysql' not in names:
+        raise SystemExit("--bulk requires --sink mysql")
+    if len(names) == 1:
+        return _open(names[0], args, config)
+    from soliscloud_api.sinks.fanout import FanOutSink
+    return FanOutSink({name: _open(name, args, config) for name in names})
+
+
+async def run_accounts(args, config: dict, job) -> dict:
+    """Run job for the selected accounts, returns result per account."""
+    from soliscloud_api.accounts import Orchestrator, load_accounts
+    accounts = load_accounts(config)
+    if args.account:
+        accounts = [a for a in accounts if a.name in args.account]
+        if not accounts:
+            raise SystemExit(f"No account named {', '.join(args.account)}")
+    api_kwargs = {}
+    if args.replay:
+        from soliscloud_api.transport import ReplayTransport
+        api_kwargs['transport'] = ReplayTransport(args.replay)
+    elif args.record:
+        from soliscloud_api.transport import RecordingTransport
+        api_kwargs['transport'] = RecordingTransport(args.record)
+    if 'timeouts' in config:
+        from soliscloud_api.timeouts import Timeouts
+        api_kwargs['timeouts'] = Timeouts.from_config(config['timeouts'])
+    if args.metrics_file:
+        from soliscloud_api.metrics import ClientMetrics
+        api_kwargs['metrics'] = ClientMetrics()
+    try:
+        return await Orchestrator(accounts, **api_kwargs).run(job)
+    finally:
+        if 'transport' in api_kwargs:
+            api_kwargs['transport'].close()
+        if args.metrics_file:
+            api_kwargs['metrics'].registry.write_textfile(args.metrics_file)
+
+
+async def batches(records, size: int = 100):
+    """Lists of up to size items from an async iterator."""
+    batch = []
+    async for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def cmd_snapshot(args, config: dict) -> dict:
+    from soliscloud_api.accounts import account_path
+    from soliscloud_api.helpers import Helpers
+    from soliscloud_api.snapshot import SnapshotDiff
+    table = args.table or f"{args.kind}_detail_list"
+    async with sink_for(args, config) as sink:
+
+        async def job(key, secret, soliscloud):
+            # Own state per account, as the scripts keep it
+            snapshots = SnapshotDiff(path=account_path(
+                f"{args.kind}_detail_snapshot.json", key))
+            written = 0
+            fetch = getattr(soliscloud, f"{args.kind}_detail_list")
+            try:
+                async for page in batches(
+                        Helpers.iter_pages(fetch, key, secret)):
+                    rows = snapshots.changes(page)
+                    await sink.write(table, rows)
+                    snapshots.commit(page)
+                    written += len(rows)
+            finally:
+                snapshots.save()
+            return written
+
+        return await run_accounts(args, config, job)
+
+
+def month_rows(inverter: dict, records, day: str = None) -> list[dict]:
+    """inverter_month records as inverter_daily rows, optionally one day."""
+    return [
+        {
+            "inverter_id": inverter.get("id"),
+            "station_name": inverter.get("stationName"),
+            "dateStr": record.get("dateStr"),
+            "energy": float(record.get("energy")),
+            "money": float(record.get("money")),
+            "moneyStr": record.get("moneyStr"),
+            "energyStr": record.get("energyStr", ""),
+        }
+        for record in records or ()
+        if day is None or record.get("dateStr") == day]
+
+
+def day_rows(inverter: dict, records) -> list[dict]:
+    """
+    inverter_day records as Inverter_Daily rows. The unit keys are kept,
+    so the rows can be rolled up (soliscloud rollup) in W and kWh.
+    """
+    return [
+        {
+            "inverter_id": inverter.get("id"),
+            "station_name": inverter.get("stationName"),
+            "time": record.get("time"),
+            "timeStr": record.get("timeStr"),
+            "pac": float(record.get("pac")),
+            "pacStr": record.get("pacStr"),
+            "eToday": float(record.get("eToday")),
+            "eTodayStr": record.get("eTodayStr"),
+            "eTotal": float(record.get("eTotal")),
+            "eTotalStr": record.get("eTotalStr"),
+        }
+        for record in records or ()]
+
+
+async def _daily_from_month(args, day, key, secret, soliscloud, sink) -> int:
+    from soliscloud_api.helpers import Helpers
+    written = 0
+    async for inverter in Helpers.iter_pages(
+            soliscloud.inverter_detail_list, key, secret):
+        records = await soliscloud.inverter_month(
+            key, secret, currency=args.currency, month=day[:7],
+            inverter_id=inverter.get("id"))
+        rows = month_rows(inverter, records, day)
+        await sink.write(args.table or "inverter_daily", rows)
+        written += len(rows)
+    return written
+
+
+async def cmd_daily(args, config: dict) -> dict:
+    from soliscloud_api.daily import inverter_daily_totals, today
+    # Today where the inverters are, not on this host
+    day = args.date or today(args.time_zone)
+    async with sink_for(args, config) as sink:
+
+        async def job(key, secret, soliscloud):
+            if args.source == 'month':
+                return await _daily_from_month(
+                    args, day, key, secret, soliscloud, sink)
+            rows = await inverter_daily_totals(
+                soliscloud, key, secret, day, args.time_zone)
+            await sink.write(args.table or "inverter_daily", rows)
+            return len(rows)
+
+        return await run_accounts(args, config, job)
+
+
+async def _backfill_period(args, soliscloud, key, secret, inverter, period):
+    if args.kind == 'day':
+        # Whole hours are sent as before, e.g. 8 rather than 8.0
+        time_zone = int(args.time_zone) \
+            if args.time_zone == int(args.time_zone) else args.time_zone
+        records = await soliscloud.inverter_day(
+            key, secret, currency=args.currency, time=period,
+            time_zone=time_zone, inverter_id=inverter.get("id"))
+        return day_rows(inverter, records)
+    records = await soliscloud.inverter_month(
+        key, secret, currency=args.currency, month=period,
+        inverter_id=inverter.get("id"))
+    return month_rows(inverter, records)
+
+
+async def cmd_backfill(args, config: dict) -> dict:
+    from soliscloud_api.backfill import (
+        BackfillPlanner, NegativeCache, station_first_power_dates)
+    from soliscloud_api.accounts import account_path
+    from soliscloud_api.helpers import Helpers
+    table = args.table or (
+        "Inverter_Daily" if args.kind == 'day' else "inverter_daily")
+    async with sink_for(args, config) as sink:
+
+        async def job(key, secret, soliscloud):
+            # Own cache per account and kind, the scripts keep theirs apart
+            planner = BackfillPlanner(NegativeCache(account_path(
+                f"backfill_empty_cli_{args.kind}.json", key)))
+            plan = planner.days if args.kind == 'day' else planner.months
+            written = 0
+            first_power = await station_first_power_dates(
+                soliscloud, key, secret)
+            async for inverter in Helpers.iter_pages(
+                    soliscloud.inverter_detail_list, key, secret):
+                inverter_id = inverter.get("id")
+                start = first_power.get(str(inverter.get("stationId")))
+                for period in plan(inverter_id, start):
+                    rows = await _backfill_period(
+                        args, soliscloud, key, secret, inverter, period)
+                    if not rows:
+                        planner.empty(inverter_id, period)
+                    await sink.write(table, rows)
+                    written += len(rows)
+                planner.cache.save()
+            return written
+
+        return await run_accounts(args, config, job)
+
+
+async def cmd_stations(args, config: dict) -> dict:
+    from soliscloud_api.backfill import parse_date
+    from soliscloud_api.energy import EnergyState, collect, station_energy
+    state = EnergyState(args.state)
+    since = parse_date(args.since)
+    table = args.table or f"station_{args.kind}_energy"
+    async with sink_for(args, config) as sink:
+
+        async def job(key, secret, soliscloud):
+            if args.period:
+                rows = await station_energy(
+                    soliscloud, key, secret, args.kind, args.period,
+                    args.concurrency)
+                await sink.write(table, rows)
+                return len(rows)
+            written = 0
+            async for _, rows in collect(
+                    soliscloud, key, secret, args.kind, state, since=since,
+                    concurrency=args.concurrency):
+                await sink.write(table, rows)
+                written += len(rows)
+            return written
+
+        results = await run_accounts(args, config, job)
+    state.save()
+    return results
+
+
+async def cmd_rollup(args, config: dict) -> dict:
+    from soliscloud_api.rollup import Rollup
+    curves: dict = {}
+    with open(args.input, 'r', encoding='utf-8') as file:
+        for line in file:
+            row = json.loads(line)
+            curves.setdefault(
+                row.get("inverter_id"), (row.get("station_name"), []))[1] \
+                .append(row)
+    rollup = Rollup(time_zone=args.time_zone)
+    for inverter_id, (station_name, rows) in curves.items():
+        rollup.add(inverter_id, rows, station_name)
+    key = "inverter_id" if args.by == 'inverter' else "station_name"
+    rows = [
+        {key: owner, "period": period, "energy": round(energy, 3)}
+        for (owner, period), energy in rollup.totals(
+            args.period, args.by, args.source).items()]
+    async with sink_for(args, config) as sink:
+        await sink.write(args.table or f"{args.by}_{args.period}_energy", rows)
+    return {'rollup': len(rows)}
+
+
+# Lists that need one of these arguments, on top of the required ones
+ONE_OF = {'alarm_list': ('station_id', 'device_sn')}
+
+
+def list_endpoints() -> list[str]:
+    """Paged list methods of SoliscloudAPI."""
+    from soliscloud_api import SoliscloudAPI
+    return sorted(
+        name for name in dir(SoliscloudAPI)
+        if name.endswith('_list') and not name.startswith('_'))
+
+
+def required_params(name: str) -> list[str]:
+    """Keyword arguments list method name needs besides key and secret."""
+    from soliscloud_api import SoliscloudAPI
+    parameters = inspect.signature(getattr(SoliscloudAPI, name)).parameters
+    return [
+        p.name for p in parameters.values()
+        if p.kind is p.KEYWORD_ONLY and p.default is p.empty]
+
+
+def _params(values: list[str]) -> dict:
+    params = {}
+    for value in values or ():
+        name, sep, value = value.partition('=')
+        if not sep:
+            raise SystemExit(f"--param expects name=value, got '{name}'")
+        params[name] = value
+    return params
+
+
+def _endpoint(args) -> tuple[str, dict]:
+    """Endpoint of args and its --param arguments, checked up front."""
+    name = args.endpoint
+    if name not in list_endpoints():
+        raise SystemExit(
+            f"Unknown endpoint '{name}', expected one of "
+            f"{', '.join(list_endpoints())}")
+    params = _params(args.param)
+    missing = [p for p in required_params(name) if p not in params]
+    if missing:
+        raise SystemExit(
+            f"{name} needs {' '.join(f'--param {p}=...' for p in missing)}")
+    one_of = ONE_OF.get(name, ())
+    if one_of and sum(p in params for p in one_of) != 1:
+        raise SystemExit(
+            f"{name} needs one of {', '.join(f'--param {p}=...' for p in one_of)}")
+    return name, params
+
+
+async def cmd_export(args, config: dict) -> dict:
+    from soliscloud_api.helpers import Helpers
+    endpoint, params = _endpoint(args)
+    async with sink_for(args, config) as sink:
+
+        async def job(key, secret, soliscloud):
+            written = 0
+            fetch = getattr(soliscloud, endpoint)
+            async for page in batches(
+                    Helpers.iter_pages(fetch, key, secret, **params)):
+                await sink.write(args.table or endpoint, page)
+                written += len(page)
+            return written
+
+        return await run_accounts(args, config, job)
+
+
+async def cmd_bench(args, config: dict) -> dict:
+    endpoint, params = _endpoint(args)
+
+    async def job(key, secret, soliscloud):
+        fetch = getattr(soliscloud, endpoint)
+        latencies = []
+        records = 0
+        for _ in range(args.count):
+            start = time.perf_counter()
+            records += len(await fetch(
+                key, secret, page_no=1, page_size=args.page_size,
+                **params) or ())
+            latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        total = sum(latencies)
+        return {
+            'requests': len(latencies),
+            'records_per_s': round(records / total, 1) if total else None,
+            'min_ms': round(latencies[0] * 1000, 1),
+            'p50_ms': round(statistics.median(latencies) * 1000, 1),
+            'p99_ms': round(latencies[
+                min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 1),
+            'max_ms': round(latencies[-1] * 1000, 1),
+        }
+
+    return await run_accounts(args, config, job)
+
+
+def _add_param(parser) -> None:
+    parser.add_argument(
+        '--param', action='append', metavar='NAME=VALUE',
+        help="Extra argument of the list method, e.g. time=2024-02-01 "
+             "for station_day_energy_list (repeatable)")
+
+
+def _add_sink(parser, default: str) -> None:
+    parser.add_argument(
+        '--sink', action='append',
+        choices=('influx', 'mysql', 'postgres', 'jsonl'),
+        help=f"Output sink, repeat to write to several (default {default})")
+    parser.set_defaults(default_sink=default)
+    parser.add_argument(
+        '-o', '--output', help="Output file of the jsonl sink (default stdout)")
+    parser.add_argument('--table', help="Measurement or table name")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='soliscloud', description="SolisCloud data collection")
+    parser.add_argument('-c', '--config', default=DEFAULT_CONFIG)
+    parser.add_argument(
+        '--account', action='append', help="Only this account (repeatable)")
+    parser.add_argument(
+        '--record', help="Record API exchanges to this trace file")
+    parser.add_argument(
+        '--replay', help="Answer API calls from this trace file")
+    parser.add_argument(
+        '--metrics-file',
+        help="Write client metrics to this node_exporter textfile")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    snapshot = commands.add_parser(
+        'snapshot', help="Write changed inverter or station details")
+    snapshot.add_argument('kind', choices=('inverter', 'station'))
+    _add_sink(snapshot, 'influx')
+    snapshot.set_defaults(func=cmd_snapshot)
+
+    daily = commands.add_parser('daily', help="Write daily inverter energy")
+    daily.add_argument(
+        '--date', help="YYYY-MM-DD (default today at --time-zone)")
+    daily.add_argument(
+        '--source', default='detail', choices=('detail', 'month'),
+        help="eToday of inverter_detail_list pages (default), or "
+             "inverter_month per inverter (adds money)")
+    daily.add_argument('--currency', default='MYR')
+    daily.add_argument('--time-zone', type=float, default=8)
+    _add_sink(daily, 'mysql')
+    daily.set_defaults(func=cmd_daily)
+
+    backfill = commands.add_parser(
+        'backfill', help="Write inverter history since first power")
+    backfill.add_argument('kind', choices=('day', 'month'))
+    backfill.add_argument('--currency', default='MYR')
+    backfill.add_argument('--time-zone', type=float, default=8)
+    _add_sink(backfill, 'mysql')
+    backfill.add_argument(
+        '--bulk', action='store_true',
+        help="Upsert in large LOAD DATA batches (mysql sink)")
+    backfill.set_defaults(func=cmd_backfill)
+
+    stations = commands.add_parser(
+        'stations', help="Write station energy of all stations per period")
+    stations.add_argument('kind', choices=('day', 'month', 'year'))
+    stations.add_argument(
+        '--period', help="Only this period (default: since the last run)")
+    stations.add_argument(
+        '--since', help="YYYY-MM-DD to start from on the first run")
+    stations.add_argument(
+        '--state', default='station_energy_state.json',
+        help="Last collected period per account and kind")
+    stations.add_argument(
+        '--concurrency', type=int, default=4, help="Pages requested at once")
+    _add_sink(stations, 'mysql')
+    stations.set_defaults(func=cmd_stations)
+
+    rollup = commands.add_parser(
+        'rollup', help="Derive energy totals from stored day curves")
+    rollup.add_argument(
+        'input', help="JSON lines of backfill day rows (--sink jsonl)")
+    rollup.add_argument(
+        '--period', default='month', choices=('day', 'month', 'year'))
+    rollup.add_argument(
+        '--by', default='inverter', choices=('inverter', 'station'))
+    rollup.add_argument(
+        '--source', default='auto', choices=('auto', 'etoday', 'pac'))
+    rollup.add_argument('--time-zone', type=float, default=8)
+    _add_sink(rollup, 'jsonl')
+    rollup.set_defaults(func=cmd_rollup)
+
+    export = commands.add_parser('export', help="Write all pages of a list")
+    export.add_argument('endpoint', help="e.g. inverter_detail_list")
+    _add_param(export)
+    _add_sink(export, 'jsonl')
+    export.set_defaults(func=cmd_export)
+
+    bench = commands.add_parser('bench', help="Time repeated list requests")
+    bench.add_argument('endpoint', help="e.g. inverter_detail_list")
+    _add_param(bench)
+    bench.add_argument('--count', type=int, default=10)
+    bench.add_argument('--page-size', type=int, default=100)
+    bench.set_defaults(func=cmd_bench)
+    return parser
+
+
+def main(argv: list[str] = None) -> int:
+    args = build_parser().parse_args(argv)
+    with open(args.config, 'r', encoding='utf-8') as file:
+        config = json.load(file)
+    from soliscloud_api.sinks.fanout import FanOutError
+    try:
+        results = asyncio.run(args.func(args, config))
+    except FanOutError as error:
+        print(error, file=sys.stderr)
+        return 1
+    failed = False
+    for account, result in results.items():
+        failed = failed or isinstance(result, Exception)
+        print(f"{account}: {result!r}" if isinstance(result, Exception)
+              else f"{account}: {json.dumps(result)}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
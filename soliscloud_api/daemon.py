@@ -0,0 +1,417 @@
+"""Long-running scheduler for the collection jobs.
+
+Runs jobs on cron-like schedules in one process, sharing a single aiohttp
+session and SoliscloudAPI instance (and with that the rate limiter) across
+all runs. Jobs are configured in config.json:
+
+    "jobs": [
+        {"name": "inverter_daily", "target": "inverter_month_mysql:fetch_all_station",
+         "schedule": "55 23 * * *", "jitter": 30, "misfire_grace": 300}
+    ]
+
+A target is "module:function", called for every configured account as
+await function(key_id, secret, soliscloud=api). With "processes": N in the
+config, accounts are sharded over N daemon processes.
+
+Instead of a schedule, a job can be polled adaptively (see polling.py). Its
+target returns the dataTimestamp (epoch ms) per device id; the upload cadence
+is learnt per device and the job runs again just after the first device is
+expected to upload, at most once per heartbeat outside the daylight window.
+A target may return {"dataTimestamp", "sr", "ss", "timeZone"} per device
+instead, to throttle each device by its station's sunrise and sunset; the
+optional daylight window of the config applies to devices without them:
+
+    {"name": "inverter_detail", "target": "inverter_detail_list:fetch_all_inverters",
+     "poll": {"delay": 30, "default_interval": 300, "heartbeat": 3600,
+              "daylight": {"sunrise": "06:30", "sunset": "19:30", "time_zone": 8}}}
+
+With a "metrics" section the client metrics are served over http and/or
+written to a node_exporter textfile after every job run:
+
+    "metrics": {"host": "127.0.0.1", "port": 9464, "textfile": "soliscloud.prom"}
+
+Sharded daemons serve on port + shard index and write textfile.<index>.prom.
+
+Usage: python -m soliscloud_api.daemon [config.json]
+
+For more information: https://github.com/hultenvp/soliscloud_api
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import json
+import logging
+import multiprocessing
+import random
+import signal
+import sys
+from datetime import datetime, timedelta
+
+from soliscloud_api.accounts import (
+    Orchestrator, account_path, load_accounts, resolve, shard)
+from soliscloud_api.metrics import ClientMetrics
+from soliscloud_api.polling import DaylightWindow, PollScheduler
+from soliscloud_api.timeouts import Timeouts
+
+_LOGGER = logging.getLogger(__name__)
+
+# Field ranges: minute, hour, day of month, month, day of week (0/7 = Sunday)
+_RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+
+def _parse_field(field: str, low: int, high: int) -> frozenset:
+    values = set()
+    for part in field.split(','):
+        step = 1
+        if '/' in part:
+            part, step = part.split('/')
+            step = int(step)
+        if part == '*':
+            start, end = low, high
+        elif '-' in part:
+            start, end = (int(v) for v in part.split('-'))
+        else:
+            start = int(part)
+            end = high if step > 1 else start
+        if start < low or end > high or start > end or step < 1:
+            raise ValueError(f"Invalid cron field '{field}'")
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+
+class CronSchedule:
+    """Standard 5 field cron expression: minute hour day month weekday."""
+
+    def __init__(self, expression: str) -> None:
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(
+                f"Cron expression needs 5 fields, got '{expression}'")
+        self.expression = expression
+        (self.minutes, self.hours, self.days, self.months,
+         weekdays) = (_parse_field(f, *r) for f, r in zip(fields, _RANGES))
+        self.weekdays = frozenset(d % 7 for d in weekdays)
+        self._any_day = fields[2].startswith('*')
+        self._any_weekday = fields[4].startswith('*')
+
+    def _day_matches(self, dt: datetime) -> bool:
+        day = dt.day in self.days
+        weekday = (dt.weekday() + 1) % 7 in self.weekdays
+        if self._any_day or self._any_weekday:
+            # Only one restricted, both must hold
+            return day and weekday
+        # Both restricted, cron matches either
+        return day or weekday
+
+    def next_after(self, dt: datetime) -> datetime:
+        """First matching minute strictly after dt."""
+        dt = dt.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = dt + timedelta(days=366 * 5)
+        while dt < limit:
+            if dt.month not in self.months:
+                month = dt.month % 12 + 1
+                dt = dt.replace(
+                    year=dt.year + (dt.month == 12), month=month, day=1,
+                    hour=0, minute=0)
+            elif not self._day_matches(dt):
+                dt = (dt + timedelta(days=1)).replace(hour=0, minute=0)
+            elif dt.hour not in self.hours:
+                dt = (dt + timedelta(hours=1)).replace(minute=0)
+            elif dt.minute not in self.minutes:
+                dt += timedelta(minutes=1)
+            else:
+                return dt
+        raise ValueError(f"'{self.expression}' never fires")
+
+
+class Job:
+    """A coroutine function run on a cron schedule or polled adaptively."""
+
+    def __init__(
+        self, name: str, schedule: str, func, *,
+        jitter: float = 0, misfire_grace: float = 60,
+        poller: PollScheduler = None
+    ) -> None:
+        if (schedule is None) == (poller is None):
+            raise ValueError(f"Job {name} needs either a schedule or poll")
+        self.name = name
+        self.schedule = None if schedule is None else CronSchedule(schedule)
+        self.func = func
+        self.jitter = jitter
+        self.misfire_grace = misfire_grace
+        self.poller = poller
+        self.next_run: datetime = None
+        self.running = False
+        self.runs = 0
+        self.misfires = 0
+
+    @property
+    def trigger(self) -> str:
+        if self.poller is not None:
+            return "adaptive polling"
+        return f"'{self.schedule.expression}'"
+
+    @staticmethod
+    def from_config(config: dict) -> Job:
+        name = config.get('name', config['target'])
+        poller = None
+        if 'poll' in config:
+            options = dict(config['poll'])
+            daylight = options.pop('daylight', None)
+            if daylight is not None:
+                options['daylight'] = DaylightWindow(
+                    daylight['sunrise'], daylight['sunset'],
+                    daylight.get('time_zone'), daylight.get('margin', 1800))
+            poller = PollScheduler(**options)
+        return Job(
+            name, config.get('schedule'), resolve(config['target']),
+            jitter=config.get('jitter', 0),
+            misfire_grace=config.get('misfire_grace', 60), poller=poller)
+
+
+def _devices(result) -> dict:
+    # Devices of a polled run's results per account
+    devices = {}
+    for account in (result or {}).values():
+        if isinstance(account, dict):
+            devices.update(account)
+    return devices
+
+
+def device_timestamps(result) -> dict:
+    """dataTimestamp per device id of a polled run's results per account."""
+    return {
+        device_id: data.get('dataTimestamp') if isinstance(data, dict)
+        else data for device_id, data in _devices(result).items()}
+
+
+def device_daylight(result) -> dict:
+    """
+    Daylight window per device id of a polled run's results per account,
+    from the sr/ss/timeZone of the station a device reports. None where the
+    station is unknown, the job's own window applies there.
+    """
+    return {
+        device_id: DaylightWindow.from_station(data)
+        for device_id, data in _devices(result).items()
+        if isinstance(data, dict)}
+
+
+class Scheduler:
+    """
+    Runs jobs on their schedule. A run starting later than misfire_grace
+    seconds after its slot is skipped, missed slots are coalesced into the
+    next one, and a job never overlaps with its own previous run. Polled
+    jobs are planned again when their run finishes.
+    """
+
+    def __init__(self, jobs: list[Job], *args, **kwargs) -> None:
+        self.jobs = jobs
+        self._args = args
+        self._kwargs = kwargs
+        self._stopped = asyncio.Event()
+        self._wake = asyncio.Event()
+        self._tasks: set[asyncio.Task] = set()
+
+    @staticmethod
+    def _now() -> datetime:
+        return datetime.now()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._wake.set()
+
+    async def _run(self, job: Job) -> None:
+        job.running = True
+        result = None
+        try:
+            _LOGGER.info("Running job %s", job.name)
+            result = await job.func(*self._args, **self._kwargs)
+        except Exception:
+            _LOGGER.exception("Job %s failed", job.name)
+        finally:
+            job.running = False
+            job.runs += 1
+            if job.poller is not None:
+                self._replan(
+                    job, device_timestamps(result), device_daylight(result))
+
+    def _replan(
+        self, job: Job, timestamps: dict, daylight: dict = None
+    ) -> None:
+        poller = job.poller
+        if timestamps:
+            # Devices are known, drop the stand-in of the first run
+            poller.remove(job.name)
+            for device_id, window in (daylight or {}).items():
+                poller.set_daylight(device_id, window)
+            poller.observe_all(timestamps)
+        elif job.name in poller or poller.next_due() is None:
+            poller.observe(job.name, None)
+        else:
+            poller.observe_all({})
+        job.next_run = self._plan(job, self._now())
+        self._wake.set()
+
+    def _dispatch(self, job: Job, now: datetime) -> None:
+        late = (now - job.next_run).total_seconds()
+        if late > job.misfire_grace:
+            job.misfires += 1
+            _LOGGER.warning(
+                "Job %s misfired by %.0f seconds, skipped", job.name, late)
+        elif job.running:
+            _LOGGER.warning("Job %s still running, skipped", job.name)
+        else:
+            task = asyncio.ensure_future(self._run(job))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            if job.poller is not None:
+                # Planned from the data the run returns
+                job.next_run = datetime.max
+                return
+        if job.poller is not None:
+            self._replan(job, {})
+        else:
+            job.next_run = self._plan(job, now)
+
+    @staticmethod
+    def _plan(job: Job, now: datetime) -> datetime:
+        if job.poller is not None:
+            return datetime.fromtimestamp(job.poller.next_due())
+        return job.schedule.next_after(now) + timedelta(
+            seconds=random.uniform(0, job.jitter))
+
+    async def run(self) -> None:
+        """Run until stop() is called, then wait for running jobs."""
+        now = self._now()
+        for job in self.jobs:
+            if job.poller is not None:
+                # Stands in for the devices until the first run returns them
+                job.poller.add(job.name)
+            job.next_run = self._plan(job, now)
+        while not self._stopped.is_set():
+            job = min(self.jobs, key=lambda j: j.next_run)
+            delay = (job.next_run - self._now()).total_seconds()
+            if delay > 0:
+                # Woken early by stop() or a polled job planning its next run
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await asyncio.sleep(0)
+            self._dispatch(job, self._now())
+        if self._tasks:
+            await asyncio.gather(*self._tasks)
+
+
+def _with_textfile(func, metrics: ClientMetrics, path: str):
+    @functools.wraps(func)
+    async def run(*args, **kwargs):
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            metrics.registry.write_textfile(path)
+    return run
+
+
+async def _serve_metrics(config: dict, metrics: ClientMetrics, jobs: list):
+    """Start the metrics endpoint and textfile of config, returns the runner."""
+    settings = config['metrics']
+    index = config.get('shard')
+    textfile = settings.get('textfile')
+    if textfile:
+        if index is not None:
+            textfile = account_path(textfile, index)
+        for job in jobs:
+            job.func = _with_textfile(job.func, metrics, textfile)
+    if 'port' not in settings:
+        return None
+    port = settings['port'] + (index or 0)
+    _LOGGER.info("Serving metrics on port %d", port)
+    return await metrics.registry.serve(
+        settings.get('host', '127.0.0.1'), port)
+
+
+async def run_daemon(config: dict) -> None:
+    from aiohttp import ClientSession
+
+    jobs = [Job.from_config(c) for c in config.get('jobs', [])]
+    if not jobs:
+        raise ValueError("No jobs configured")
+    accounts = load_accounts(config)
+    metrics = ClientMetrics() if 'metrics' in config else None
+    async with ClientSession() as websession:
+        orchestrator = Orchestrator(
+            accounts, websession, metrics=metrics,
+            timeouts=Timeouts.from_config(config.get('timeouts', {})))
+        for job in jobs:
+            job.func = functools.partial(orchestrator.run, job.func)
+        runner = None
+        if metrics is not None:
+            runner = await _serve_metrics(config, metrics, jobs)
+        scheduler = Scheduler(jobs)
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(sig, scheduler.stop)
+            except NotImplementedError:
+                # Windows event loops have no signal handlers
+                pass
+        for job in jobs:
+            _LOGGER.info("Job %s scheduled %s for %s",
+                         job.name, job.trigger, accounts)
+        try:
+            await scheduler.run()
+        finally:
+            if runner is not None:
+                await runner.cleanup()
+
+
+def _daemon_process(config: dict) -> None:
+    _setup()
+    asyncio.run(run_daemon(config))
+
+
+def _setup() -> None:
+    logging.basicConfig(
+        level=logging.INFO,
+        format='[%(asctime)s] %(processName)s %(levelname)s: %(message)s')
+    # Jobs live in the scripts next to config.json
+    if '.' not in sys.path:
+        sys.path.insert(0, '.')
+
+
+def run_sharded(config: dict, processes: int) -> None:
+    """Run one daemon process per shard of accounts."""
+    workers = []
+    for index, accounts in enumerate(shard(config['accounts'], processes)):
+        worker = multiprocessing.Process(
+            target=_daemon_process,
+            args=({**config, 'accounts': accounts, 'shard': index},))
+        worker.start()
+        workers.append(worker)
+
+    def terminate(signum, frame):
+        for worker in workers:
+            worker.terminate()
+    signal.signal(signal.SIGTERM, terminate)
+    for worker in workers:
+        worker.join()
+
+
+def main(argv: list[str] = None) -> None:
+    argv = sys.argv[1:] if argv is None else argv
+    with open(argv[0] if argv else 'config.json', 'r') as file:
+        config = json.load(file)
+    processes = config.get('processes', 1)
+    if processes > 1 and len(config.get('accounts', [])) > 1:
+        run_sharded(config, processes)
+    else:
+        _daemon_process(config)
+
+
+if __name__ == '__main__':
+    main()
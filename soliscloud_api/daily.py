@@ -0,0 +1,102 @@
+"""Daily energy totals from the inverter_detail_list pages.
+
+inverter_detail_list returns eToday for up to 100 inverters per call, so
+the fleet's totals of today cost about N/100 calls instead of an
+inverter_detail and an inverter_month call per inverter. Rows have the
+inverter_daily layout (inverter_id, station_name, dateStr, energy, ...).
+The detail records carry no income: add_money fills money/moneyStr from
+one inverter_month call per inverter where the table needs them.
+
+A record only counts for the day its dataTimestamp falls on in the
+inverter's time zone: an inverter that has not reported yet today still
+carries yesterday's eToday and is skipped.
+
+For more information: https://github.com/hultenvp/soliscloud_api
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from soliscloud_api.helpers import Helpers
+from soliscloud_api.units import scaled
+
+DETAIL_FIELDS = (
+    'id', 'stationName', 'eToday', 'eTodayStr', 'dataTimestamp', 'timeZone')
+
+
+def today(time_zone: float = 8) -> str:
+    """YYYY-MM-DD of today in time_zone hours from UTC."""
+    return datetime.now(timezone(timedelta(hours=time_zone))) \
+        .strftime("%Y-%m-%d")
+
+
+def local_day(record: dict[str, Any], time_zone: float) -> str:
+    """YYYY-MM-DD of the record's dataTimestamp, None if it has none."""
+    try:
+        hours = float(record.get('timeZone', time_zone))
+    except (TypeError, ValueError):
+        hours = time_zone
+    try:
+        moment = datetime.fromtimestamp(
+            float(record['dataTimestamp']) / 1000,
+            tz=timezone(timedelta(hours=hours)))
+    except (KeyError, TypeError, ValueError, OverflowError, OSError):
+        return None
+    return moment.strftime("%Y-%m-%d")
+
+
+def daily_row(
+    record: dict[str, Any], day: str = None, time_zone: float = 8
+) -> dict[str, Any]:
+    """inverter_daily row of a detail record, None if not of day."""
+    record_day = local_day(record, time_zone)
+    energy = scaled(record, 'eToday', 'kWh')
+    if record_day is None or energy is None \
+            or (day is not None and record_day != day):
+        return None
+    return {
+        "inverter_id": record.get("id"),
+        "station_name": record.get("stationName"),
+        "dateStr": record_day,
+        "energy": energy,
+        "energyStr": "kWh",
+    }
+
+
+async def inverter_daily_totals(
+    api, key, secret, day: str = None, time_zone: float = 8
+) -> list[dict[str, Any]]:
+    """
+    inverter_daily rows of day (default today in time_zone hours from UTC)
+    for all inverters that reported on that day.
+    """
+    if day is None:
+        day = today(time_zone)
+    rows = []
+    async for record in Helpers.iter_pages(
+            api.inverter_detail_list, key, secret, fields=DETAIL_FIELDS):
+        row = daily_row(record, day, time_zone)
+        if row is not None:
+            rows.append(row)
+    return rows
+
+
+async def add_money(
+    api, key, secret, rows: list[dict[str, Any]], currency: str = 'MYR'
+) -> list[dict[str, Any]]:
+    """
+    Set money and moneyStr of inverter_daily rows from the inverter_month
+    record of their day, one call per row; None without one, so all rows
+    keep the same columns. Returns rows.
+    """
+    for row in rows:
+        row.update(money=None, moneyStr=None)
+        records = await api.inverter_month(
+            key, secret, currency=currency, month=row["dateStr"][:7],
+            inverter_id=row["inverter_id"])
+        for record in records or ():
+            if record.get("dateStr") == row["dateStr"]:
+                row["money"] = scaled(record, "money")
+                row["moneyStr"] = record.get("moneyStr")
+    return rows
@@ -0,0 +1,129 @@
+"""Fleet-wide station energy from the paged *_energy_list endpoints.
+
+station_day_energy_list, station_month_energy_list and
+station_year_energy_list return the energy of up to 100 stations per call,
+so a period of the whole fleet costs one call per 100 stations instead of
+one per station. Pages are requested in parallel (Helpers.gather_pages).
+
+EnergyState remembers the last collected period per account and kind, so a
+scheduled run fetches only the periods since then: the last one again, as
+it may have been incomplete, up to the current one.
+
+For more information: https://github.com/hultenvp/soliscloud_api
+"""
+from __future__ import annotations
+
+import json
+import os
+from datetime import date
+from typing import Any
+
+from soliscloud_api.backfill import day_range, month_range, parse_date
+from soliscloud_api.helpers import Helpers
+from soliscloud_api.units import scaled
+
+# List method and its period argument per kind
+KINDS = {
+    'day': ('station_day_energy_list', 'time'),
+    'month': ('station_month_energy_list', 'month'),
+    'year': ('station_year_energy_list', 'year'),
+}
+
+
+def period_of(kind: str, day: date) -> str:
+    """Period of kind containing day, as YYYY-MM-DD, YYYY-MM or YYYY."""
+    return day.strftime({'day': "%Y-%m-%d", 'month': "%Y-%m", 'year': "%Y"}[kind])
+
+
+def period_range(kind: str, start: date, end: date) -> list[str]:
+    """Periods of kind from the one of start to the one of end."""
+    if kind == 'day':
+        return day_range(start, end)
+    if kind == 'month':
+        return month_range(start, end)
+    return [str(year) for year in range(start.year, end.year + 1)]
+
+
+def _start(period: str) -> date:
+    return parse_date((period + "-01-01")[:10])
+
+
+def station_rows(period: str, records) -> list[dict[str, Any]]:
+    """Rows (station_id, station_name, period, energy in kWh, money)."""
+    rows = []
+    for record in records or ():
+        energy = scaled(record, 'energy', 'kWh')
+        if energy is None:
+            continue
+        rows.append({
+            "station_id": record.get("id", record.get("stationId")),
+            "station_name": record.get("stationName", record.get("sno")),
+            "period": period,
+            "energy": energy,
+            "money": scaled(record, 'money'),
+            "moneyStr": record.get("moneyStr"),
+        })
+    return rows
+
+
+async def station_energy(
+    api, key, secret, kind: str, period: str, concurrency: int = 4
+) -> list[dict[str, Any]]:
+    """Energy rows of all stations in period of kind ('day', 'month', 'year')."""
+    if kind not in KINDS:
+        raise ValueError(f"kind must be one of {', '.join(KINDS)}")
+    method, argument = KINDS[kind]
+    records = await Helpers.gather_pages(
+        getattr(api, method), key, secret, concurrency=concurrency,
+        **{argument: period})
+    return station_rows(period, records)
+
+
+class EnergyState:
+    """Last collected period per account and kind, optionally kept on disk."""
+
+    def __init__(self, path: str = None) -> None:
+        self.path = path
+        self._last: dict[str, str] = {}
+        if path is not None and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as file:
+                self._last = json.load(file)
+
+    def periods(
+        self, account: str, kind: str, today: date = None, since: date = None
+    ) -> list[str]:
+        """
+        Periods to collect: from the last collected one (else since, else
+        today) up to the one of today.
+        """
+        today = today or date.today()
+        last = self._last.get(f"{account}:{kind}")
+        start = _start(last) if last else (since or today)
+        return period_range(kind, min(start, today), today)
+
+    def done(self, account: str, kind: str, period: str) -> None:
+        key = f"{account}:{kind}"
+        self._last[key] = max(period, self._last.get(key, period))
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as file:
+            json.dump(self._last, file, indent=1, sort_keys=True)
+        os.replace(tmp, self.path)
+
+
+async def collect(
+    api, key, secret, kind: str, state: EnergyState, account: str = None,
+    today: date = None, since: date = None, concurrency: int = 4
+):
+    """
+    Async generator of (period, rows) for the periods state has not
+    collected yet; each period is marked done in state once yielded.
+    """
+    account = account or str(key)
+    for period in state.periods(account, kind, today, since):
+        rows = await station_energy(api, key, secret, kind, period, concurrency)
+        yield period, rows
+        state.done(account, kind, period)
@@ -4,11 +4,73 @@ For more information: https://github.com/hultenvp/soliscloud_api
 """
 from __future__ import annotations
 
+import asyncio
+
 from soliscloud_api import SoliscloudAPI
 
 
 class Helpers:
 
+    @staticmethod
+    async def iter_pages(fetch, key, secret, page_size: int = 100, **kwargs):
+        """
+        Async generator of the records of a paged list call, e.g.
+        iter_pages(api.inverter_detail_list, key, secret).
+        Stops after an empty or short page.
+        """
+        page_no = 1
+        while True:
+            response = await fetch(
+                key, secret, page_no=page_no, page_size=page_size, **kwargs)
+            for record in response or ():
+                yield record
+            if not response or len(response) < page_size:
+                break
+            page_no += 1
+
+    @staticmethod
+    async def gather_pages(
+        fetch, key, secret, page_size: int = 100, concurrency: int = 4,
+        **kwargs
+    ) -> list:
+        """
+        All records of a paged list call. After a full first page the next
+        pages are requested concurrency at a time, until one is short.
+        """
+        async def page(page_no):
+            return await fetch(
+                key, secret, page_no=page_no, page_size=page_size, **kwargs)
+
+        records = []
+        pages = [await page(1)]
+        page_no = 2
+        while True:
+            for response in pages:
+                records.extend(response or ())
+                if not response or len(response) < page_size:
+                    return records
+            pages = await asyncio.gather(
+                *(page(page_no + i) for i in range(concurrency)))
+            page_no += concurrency
+
+    @staticmethod
+    async def stream_pages(stream, key, secret, page_size: int = 100, **kwargs):
+        """
+        As iter_pages, for the *_stream methods, e.g.
+        stream_pages(api.inverter_detail_list_stream, key, secret).
+        Records are yielded while each page arrives.
+        """
+        page_no = 1
+        while True:
+            count = 0
+            async for record in stream(
+                    key, secret, page_no=page_no, page_size=page_size, **kwargs):
+                count += 1
+                yield record
+            if count < page_size:
+                break
+            page_no += 1
+
     @staticmethod
     async def get_station_ids(api: SoliscloudAPI, key, secret, nmi=None) -> tuple:
         """
@@ -0,0 +1,244 @@
+"""Optional metrics for the Soliscloud API client.
+
+Small self-contained metric types rendered in the Prometheus text exposition
+format. Metrics can be served from a local http endpoint or written to a file
+for the node_exporter textfile collector.
+
+For more information: https://github.com/hultenvp/soliscloud_api
+"""
+from __future__ import annotations
+
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from time import monotonic
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n') \
+        .replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, extra: str = None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra is not None:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames=()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"{self.name} expects labels {self.labelnames}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def _samples(self):
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            lines.extend(self._samples())
+        return '\n'.join(lines)
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        for key, value in self._values.items():
+            yield f'{self.name}{_labels(self.labelnames, key)} {value}'
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(
+        self, name: str, documentation: str, labelnames=(),
+        buckets=DEFAULT_BUCKETS
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(
+                key, ([0] * (len(self.buckets) + 1), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            counts[-1] += 1
+            self._values[key] = (counts, total + value)
+
+    def count(self, **labels) -> int:
+        return self._values.get(self._key(labels), ([0], 0.0))[0][-1]
+
+    def sum(self, **labels) -> float:
+        return self._values.get(self._key(labels), ([0], 0.0))[1]
+
+    def _samples(self):
+        for key, (counts, total) in self._values.items():
+            bounds = [str(b) for b in self.buckets] + ['+Inf']
+            for bound, count in zip(bounds, counts):
+                labels = _labels(self.labelnames, key, f'le="{bound}"')
+                yield f'{self.name}_bucket{labels} {count}'
+            labels = _labels(self.labelnames, key)
+            yield f'{self.name}_sum{labels} {total}'
+            yield f'{self.name}_count{labels} {counts[-1]}'
+
+
+class Registry:
+    """Collection of metrics, rendered together."""
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(
+            Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        return '\n'.join(
+            m.render() for m in self._metrics.values()) + '\n'
+
+    def write_textfile(self, path: str) -> None:
+        """Atomically write all metrics to path."""
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as file:
+            file.write(self.render())
+        os.replace(tmp, path)
+
+    async def serve(self, host: str = '127.0.0.1', port: int = 9464):
+        """
+        Serve metrics on http://host:port/metrics.
+        Returns the aiohttp AppRunner, call cleanup() on it to stop.
+        """
+        from aiohttp import web
+
+        async def handler(request):
+            return web.Response(
+                body=self.render().encode('utf-8'),
+                headers={'Content-Type': CONTENT_TYPE})
+
+        app = web.Application()
+        app.router.add_get('/metrics', handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        return runner
+
+
+class ClientMetrics:
+    """Metrics collected by SoliscloudAPI, labeled per endpoint."""
+
+    def __init__(self, registry: Registry = None) -> None:
+        self.registry = registry or Registry()
+        r = self.registry
+        self.requests = r.counter(
+            'soliscloud_requests_total',
+            'API requests by endpoint and outcome',
+            ('endpoint', 'outcome'))
+        self.latency = r.histogram(
+            'soliscloud_request_duration_seconds',
+            'API request latency, excluding rate limiter wait',
+            ('endpoint',))
+        self.wait = r.histogram(
+            'soliscloud_rate_limit_wait_seconds',
+            'Time spent waiting in the rate limiter',
+            ('endpoint',))
+        self.retries = r.counter(
+            'soliscloud_retries_total',
+            'Retried API requests', ('endpoint',))
+        self.payload = r.counter(
+            'soliscloud_response_bytes_total',
+            'Response payload bytes', ('endpoint',))
+        self.records = r.counter(
+            'soliscloud_records_total',
+            'Records returned by list endpoints', ('endpoint',))
+
+    @staticmethod
+    def outcome(err: BaseException = None) -> str:
+        # GeneratorExit: a streamed response the caller stopped reading early
+        if err is None or isinstance(err, GeneratorExit):
+            return 'ok'
+        name = type(err).__name__
+        if name == 'TimeoutError':
+            return 'timeout'
+        if name in ('HttpError', 'ApiError'):
+            return name
+        return 'error'
+
+    @contextmanager
+    def request(self, endpoint: str):
+        """Time a request and count it by outcome."""
+        start = monotonic()
+        try:
+            yield
+        except BaseException as err:
+            self.requests.inc(endpoint=endpoint, outcome=self.outcome(err))
+            raise
+        else:
+            self.requests.inc(endpoint=endpoint, outcome='ok')
+        finally:
+            self.latency.observe(monotonic() - start, endpoint=endpoint)
+
+    def observe_wait(self, endpoint: str, seconds: float) -> None:
+        self.wait.observe(seconds, endpoint=endpoint)
+
+    def observe_retry(self, endpoint: str) -> None:
+        self.retries.inc(endpoint=endpoint)
+
+    def observe_payload(self, endpoint: str, size: int) -> None:
+        if size is not None:
+            self.payload.inc(size, endpoint=endpoint)
+
+    def observe_records(self, endpoint: str, count: int) -> None:
+        self.records.inc(count, endpoint=endpoint)
@@ -0,0 +1,201 @@
+"""Bounded-queue streaming pipelines.
+
+A Pipeline connects an async source (e.g. Helpers.iter_pages or fan_out) to
+transform stages and sinks through bounded asyncio queues. Each stage runs
+its own workers, so fetching, transforming and writing overlap; a slow stage
+fills its input queue and holds back the stages before it.
+
+    await Pipeline(Helpers.iter_pages(api.inverter_detail_list, key, secret))
+        .map(to_point, concurrency=2)
+        .sink(write_points, batch_size=500)
+        .run()
+
+For more information: https://github.com/hultenvp/soliscloud_api
+"""
+from __future__ import annotations
+
+import asyncio
+import inspect
+from typing import Any, AsyncIterable, Awaitable, Callable, Iterable
+
+from soliscloud_api.metrics import Registry
+
+_DONE = object()
+
+
+async def _call(func: Callable, *args) -> Any:
+    result = func(*args)
+    if inspect.isawaitable(result):
+        result = await result
+    return result
+
+
+async def fan_out(
+    fetch: Callable[[Any], Awaitable], items: Iterable, concurrency: int = 4
+):
+    """
+    Async generator of await fetch(item) for all items, at most concurrency
+    fetches in flight. Results are yielded in completion order; None results
+    are skipped.
+    """
+    items = iter(items)
+    pending: set = set()
+    try:
+        while True:
+            while len(pending) < concurrency:
+                item = next(items, _DONE)
+                if item is _DONE:
+                    break
+                pending.add(asyncio.ensure_future(fetch(item)))
+            if not pending:
+                return
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                result = task.result()
+                if result is not None:
+                    yield result
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+class Stage:
+    """
+    A pipeline step. func is called per item (or per list of up to
+    batch_size items) by concurrency workers reading from a queue of maxsize
+    items. For transforms, a None result drops the item.
+    """
+
+    def __init__(
+        self, name: str, func: Callable, *,
+        concurrency: int = 1,
+        maxsize: int = 100,
+        batch_size: int = None,
+        emits: bool = True
+    ) -> None:
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        self.name = name
+        self.func = func
+        self.concurrency = concurrency
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.emits = emits
+
+
+class Pipeline:
+    """
+    Source, stages and sinks connected by bounded queues.
+
+    Pass a Registry to export queue depth and processed items per stage. An
+    exception in any stage cancels the pipeline and is raised by run().
+    """
+
+    def __init__(
+        self, source: AsyncIterable | Iterable, *,
+        name: str = 'pipeline',
+        registry: Registry = None
+    ) -> None:
+        self.source = source
+        self.name = name
+        self.stages: list[Stage] = []
+        self._depth = self._items = None
+        if registry is not None:
+            self._depth = registry.gauge(
+                'soliscloud_pipeline_queue_depth',
+                'Items waiting in the input queue of a pipeline stage',
+                ('pipeline', 'stage'))
+            self._items = registry.counter(
+                'soliscloud_pipeline_items_total',
+                'Items processed by a pipeline stage', ('pipeline', 'stage'))
+
+    def map(self, func: Callable, *, name: str = None, **kwargs) -> Pipeline:
+        """Add a transform, its results are passed to the next stage."""
+        self.stages.append(Stage(
+            name or getattr(func, '__name__', 'map'), func, **kwargs))
+        return self
+
+    def sink(self, func: Callable, *, name: str = None, **kwargs) -> Pipeline:
+        """Add a final stage, its results are discarded."""
+        self.stages.append(Stage(
+            name or getattr(func, '__name__', 'sink'), func,
+            emits=False, **kwargs))
+        return self
+
+    def _observe(self, stage: Stage, queue: asyncio.Queue, count=0) -> None:
+        if self._depth is not None:
+            self._depth.set(
+                queue.qsize(), pipeline=self.name, stage=stage.name)
+            if count:
+                self._items.inc(count, pipeline=self.name, stage=stage.name)
+
+    async def _feed(self, queue: asyncio.Queue, stage: Stage) -> None:
+        if hasattr(self.source, '__aiter__'):
+            async for item in self.source:
+                await queue.put(item)
+                self._observe(stage, queue)
+        else:
+            for item in self.source:
+                await queue.put(item)
+                self._observe(stage, queue)
+        for _ in range(stage.concurrency):
+            await queue.put(_DONE)
+
+    async def _process(
+        self, stage: Stage, items: list, outq: asyncio.Queue
+    ) -> None:
+        if stage.batch_size:
+            results = [await _call(stage.func, items)]
+        else:
+            results = [await _call(stage.func, item) for item in items]
+        if stage.emits and outq is not None:
+            for result in results:
+                if result is not None:
+                    await outq.put(result)
+
+    async def _worker(
+        self, stage: Stage, inq: asyncio.Queue, outq: asyncio.Queue
+    ) -> None:
+        size = stage.batch_size or 1
+        items = []
+        while True:
+            item = await inq.get()
+            self._observe(stage, inq)
+            if item is not _DONE:
+                items.append(item)
+            if items and (item is _DONE or len(items) >= size):
+                await self._process(stage, items, outq)
+                self._observe(stage, inq, len(items))
+                items = []
+            if item is _DONE:
+                return
+
+    async def _run_stage(
+        self, index: int, queues: list[asyncio.Queue]
+    ) -> None:
+        stage = self.stages[index]
+        outq = queues[index + 1] if index + 1 < len(queues) else None
+        await asyncio.gather(*(
+            self._worker(stage, queues[index], outq)
+            for _ in range(stage.concurrency)))
+        if outq is not None:
+            for _ in range(self.stages[index + 1].concurrency):
+                await outq.put(_DONE)
+
+    async def run(self) -> None:
+        """Run until the source is exhausted and all stages are drained."""
+        if not self.stages:
+            raise ValueError("Pipeline has no stages")
+        queues = [asyncio.Queue(stage.maxsize) for stage in self.stages]
+        tasks = [asyncio.ensure_future(self._feed(queues[0], self.stages[0]))]
+        tasks += [
+            asyncio.ensure_future(self._run_stage(i, queues))
+            for i in range(len(self.stages))]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
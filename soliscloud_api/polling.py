@@ -0,0 +1,280 @@
+"""Adaptive per-device poll scheduling.
+
+Dataloggers upload at a fixed interval (typically 5 or 10 minutes), each
+with its own phase. PollScheduler learns interval and phase per device from
+the last dataTimestamp values and plans the next poll just after the expected
+upload, instead of polling on a wall-clock schedule. With a DaylightWindow
+from the station's sunrise/sunset (sr/ss), devices drop to a heartbeat
+rate at night.
+
+For more information: https://github.com/hultenvp/soliscloud_api
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import statistics
+import time
+from collections import deque
+from datetime import datetime
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def to_seconds(data_timestamp) -> float:
+    """dataTimestamp (epoch ms, as string or number) in epoch seconds."""
+    value = float(data_timestamp)
+    return value / 1000 if value > 1e11 else value
+
+
+DAY = 86400
+
+
+def _seconds_of_day(value: str) -> int:
+    """HH:MM or HH:MM:SS in seconds since midnight."""
+    parts = [int(p) for p in str(value).strip().split(':')]
+    if len(parts) not in (2, 3):
+        raise ValueError(f"Invalid time of day '{value}'")
+    return parts[0] * 3600 + parts[1] * 60 + (parts[2] if len(parts) == 3 else 0)
+
+
+class DaylightWindow:
+    """
+    Daytime of a station, from sunrise/sunset as HH:MM station local time.
+
+    time_zone is the station UTC offset in hours (station timeZone field),
+    None for the local time of this host. margin widens the window on both
+    ends, so polling is back at full rate before dawn.
+    """
+
+    def __init__(
+        self, sunrise: str, sunset: str, time_zone: float = None,
+        margin: float = 1800
+    ) -> None:
+        self.sunrise = _seconds_of_day(sunrise)
+        self.sunset = _seconds_of_day(sunset)
+        self.time_zone = time_zone
+        self.margin = margin
+
+    @staticmethod
+    def from_station(record: dict, margin: float = 1800) -> DaylightWindow:
+        """Window from a station_detail(_list) record, None without sr/ss."""
+        if not record.get('sr') or not record.get('ss'):
+            return None
+        time_zone = record.get('timeZone')
+        return DaylightWindow(
+            record['sr'], record['ss'],
+            None if time_zone is None else float(time_zone), margin)
+
+    def _seconds(self, now: float) -> float:
+        if self.time_zone is None:
+            local = datetime.fromtimestamp(now)
+            return local.hour * 3600 + local.minute * 60 + local.second
+        return (now + self.time_zone * 3600) % DAY
+
+    def is_daylight(self, now: float) -> bool:
+        seconds = self._seconds(now)
+        return self.sunrise - self.margin <= seconds \
+            < self.sunset + self.margin
+
+    def next_dawn(self, now: float) -> float:
+        """Epoch time at which the next daytime window starts."""
+        start = (self.sunrise - self.margin) % DAY
+        return now + (start - self._seconds(now)) % DAY
+
+
+class Cadence:
+    """Upload interval and phase of one device."""
+
+    def __init__(self, history: int = 8, default_interval: float = 300):
+        self._uploads: deque = deque(maxlen=history)
+        self._default_interval = default_interval
+
+    @property
+    def last_upload(self) -> float:
+        return self._uploads[-1] if self._uploads else None
+
+    @property
+    def interval(self) -> float:
+        """Median time between uploads, missed uploads are folded back."""
+        diffs = [b - a for a, b in zip(self._uploads, list(self._uploads)[1:])]
+        if not diffs:
+            return self._default_interval
+        base = min(diffs)
+        if base <= 0:
+            return self._default_interval
+        # A gap of 2 or 3 intervals means uploads were missed in between
+        return statistics.median(d / max(1, round(d / base)) for d in diffs)
+
+    def observe(self, upload: float) -> bool:
+        """Add an upload time, False if it is not newer than the last."""
+        if self._uploads and upload <= self._uploads[-1]:
+            return False
+        self._uploads.append(upload)
+        return True
+
+    def next_upload(self, now: float) -> float:
+        """Expected time of the first upload after now."""
+        last = self.last_upload
+        if last is None:
+            return now
+        interval = self.interval
+        periods = max(1, math.floor((now - last) / interval) + 1)
+        return last + periods * interval
+
+
+class PollScheduler:
+    """
+    Plans polls per device.
+
+    A poll is planned delay seconds after the expected upload. When a poll
+    returns no newer data the device is retried every retry seconds, until
+    half an interval has passed; it then waits for the next expected upload.
+    Devices with a daylight window (their own, or the default daylight) are
+    polled every heartbeat seconds at night, and at full rate again from dawn.
+    """
+
+    def __init__(
+        self, *,
+        delay: float = 30,
+        retry: float = 30,
+        default_interval: float = 300,
+        history: int = 8,
+        heartbeat: float = 3600,
+        daylight: DaylightWindow = None
+    ) -> None:
+        self.delay = delay
+        self.retry = retry
+        self.default_interval = default_interval
+        self.history = history
+        self.heartbeat = heartbeat
+        # Window of devices without one of their own
+        self.daylight = daylight
+        self._cadence: dict[str, Cadence] = {}
+        self._next: dict[str, float] = {}
+        self._daylight: dict[str, DaylightWindow] = {}
+
+    @staticmethod
+    def _now() -> float:
+        return time.time()
+
+    def __contains__(self, device_id) -> bool:
+        return str(device_id) in self._next
+
+    def cadence(self, device_id) -> Cadence:
+        device_id = str(device_id)
+        if device_id not in self._cadence:
+            self._cadence[device_id] = Cadence(
+                self.history, self.default_interval)
+        return self._cadence[device_id]
+
+    def add(self, device_id, when: float = None) -> None:
+        """Register a device, polled first at when (default now)."""
+        self._next.setdefault(
+            str(device_id), self._now() if when is None else when)
+
+    def remove(self, device_id) -> None:
+        self._next.pop(str(device_id), None)
+        self._cadence.pop(str(device_id), None)
+        self._daylight.pop(str(device_id), None)
+
+    def set_daylight(self, device_id, window: DaylightWindow) -> None:
+        """Throttle device at night, None removes the throttle."""
+        if window is None:
+            self._daylight.pop(str(device_id), None)
+        else:
+            self._daylight[str(device_id)] = window
+
+    def _throttle(self, device_id: str, planned: float, now: float) -> float:
+        window = self._daylight.get(device_id, self.daylight)
+        if window is None or window.is_daylight(planned):
+            return planned
+        # Night: at most one poll per heartbeat, full rate again from dawn
+        return min(max(planned, now + self.heartbeat), window.next_dawn(now))
+
+    def next_poll(self, device_id) -> float:
+        return self._next[str(device_id)]
+
+    def observe(self, device_id, data_timestamp, now: float = None) -> float:
+        """
+        Record the dataTimestamp returned by a poll and plan the next one.
+        Returns the planned time.
+        """
+        now = self._now() if now is None else now
+        cadence = self.cadence(device_id)
+        fresh = data_timestamp is not None \
+            and cadence.observe(to_seconds(data_timestamp))
+        expected = cadence.next_upload(now) + self.delay
+        last = cadence.last_upload
+        if not fresh and last is None:
+            # Nothing known yet
+            expected = now + self.retry
+        elif not fresh and now - last < 1.5 * cadence.interval:
+            # Upload is late, retry soon
+            expected = min(expected, now + self.retry)
+        expected = self._throttle(str(device_id), expected, now)
+        self._next[str(device_id)] = expected
+        return expected
+
+    def observe_all(self, timestamps: dict, now: float = None) -> float:
+        """
+        Record a poll that returned several devices, as dataTimestamp per
+        device id. Only devices with newer data or a due poll are planned
+        again, so one device's upload does not make another look late.
+        Returns the earliest planned poll.
+        """
+        now = self._now() if now is None else now
+        timestamps = {str(d): t for d, t in timestamps.items()}
+        for device_id, data_timestamp in timestamps.items():
+            last = self.cadence(device_id).last_upload
+            fresh = data_timestamp is not None and (
+                last is None or to_seconds(data_timestamp) > last)
+            if fresh or self._next.get(device_id, now) <= now:
+                self.observe(device_id, data_timestamp, now)
+        for device_id in self.due(now):
+            if device_id not in timestamps:
+                self.observe(device_id, None, now)
+        return self.next_due()
+
+    def next_due(self) -> float:
+        """Time of the earliest planned poll, None without devices."""
+        return min(self._next.values(), default=None)
+
+    def due(self, now: float = None) -> list[str]:
+        """Devices whose poll is due, earliest first."""
+        now = self._now() if now is None else now
+        return sorted(
+            (d for d, t in self._next.items() if t <= now),
+            key=self._next.get)
+
+    def sleep_time(self, now: float = None) -> float:
+        """Seconds until the next poll, None without devices."""
+        if not self._next:
+            return None
+        now = self._now() if now is None else now
+        return max(0.0, min(self._next.values()) - now)
+
+    async def run(self, poll, stop: asyncio.Event = None) -> None:
+        """
+        Poll due devices until stop is set. poll is awaited as
+        poll(device_id) and returns the fetched record, which must hold
+        dataTimestamp, or None.
+        """
+        stop = stop or asyncio.Event()
+        while not stop.is_set():
+            delay = self.sleep_time()
+            if delay is None or delay > 0:
+                try:
+                    await asyncio.wait_for(stop.wait(), delay or 1.0)
+                    break
+                except asyncio.TimeoutError:
+                    continue
+            for device_id in self.due():
+                try:
+                    record = await poll(device_id)
+                except Exception:
+                    _LOGGER.exception("Poll of %s failed", device_id)
+                    record = None
+                self.observe(
+                    device_id, (record or {}).get('dataTimestamp'))
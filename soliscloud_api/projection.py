@@ -0,0 +1,66 @@
+"""Field projection of API records.
+
+Detail records hold well over a hundred fields. A Projection keeps only the
+requested ones, as a dict or as a plain tuple in field order. Projections
+are compiled once per field list and reused. The _stream methods hand the
+fields to the decoder (streaming.py), which skips the other values while
+parsing; the other methods decode the whole page first, there a projection
+only shrinks the rows passed on.
+
+For more information: https://github.com/hultenvp/soliscloud_api
+"""
+from __future__ import annotations
+
+from functools import lru_cache
+from operator import itemgetter
+from typing import Any, Iterable, Sequence
+
+
+class Projection:
+    """Keeps fields of a record; missing fields become None."""
+
+    def __init__(self, fields: Sequence[str], as_tuple: bool = False) -> None:
+        if isinstance(fields, str):
+            raise TypeError("fields must be a sequence of field names")
+        self.fields = tuple(fields)
+        if not self.fields:
+            raise ValueError("fields must not be empty")
+        self.as_tuple = as_tuple
+        getter = itemgetter(*self.fields)
+        if len(self.fields) == 1:
+            self._getter = lambda record: (getter(record),)
+        else:
+            self._getter = getter
+
+    def values(self, record: dict[str, Any]) -> tuple:
+        try:
+            return self._getter(record)
+        except KeyError:
+            return tuple(record.get(field) for field in self.fields)
+
+    def __call__(self, record: dict[str, Any]) -> dict[str, Any] | tuple:
+        if record is None:
+            return None
+        values = self.values(record)
+        if self.as_tuple:
+            return values
+        return dict(zip(self.fields, values))
+
+    def many(self, records: Iterable[dict[str, Any]]) -> list:
+        return [self(record) for record in records]
+
+
+@lru_cache(maxsize=64)
+def _compiled(fields: tuple, as_tuple: bool) -> Projection:
+    return Projection(fields, as_tuple)
+
+
+def projection(fields: Sequence[str] = None, as_tuple: bool = False):
+    """Compiled Projection of fields, None to keep all fields."""
+    if fields is None:
+        if as_tuple:
+            raise ValueError("as_tuple requires fields")
+        return None
+    if isinstance(fields, str):
+        raise TypeError("fields must be a sequence of field names")
+    return _compiled(tuple(fields), as_tuple)
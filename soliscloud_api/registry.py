@@ -0,0 +1,187 @@
+"""Device registry.
+
+DeviceRegistry keeps the metadata of an account's stations, inverters,
+collectors, EPMs and weather instruments, taken from the paged list
+endpoints, with O(1) lookups by id, serial number and station. Only
+metadata fields are kept (see KINDS), so a snapshot on disk stays small
+and loads instantly. refresh() re-reads a kind only when its snapshot is
+older than MAX_AGE, and reports the devices added, changed and removed.
+A snapshot holds one account: keep one file per account key.
+
+    registry = DeviceRegistry(account_path("device_registry.json", key))
+    await registry.refresh(api, key, secret, kinds=("inverter", "station"))
+    registry.save()
+    name = registry.get("inverter", inverter_id)["stationName"]
+
+For more information: https://github.com/hultenvp/soliscloud_api
+"""
+from __future__ import annotations
+
+import json
+import os
+import time
+from typing import Any, Iterable
+
+from soliscloud_api.backfill import FIRST_POWER_FIELDS
+from soliscloud_api.helpers import Helpers
+
+# List method and the metadata fields kept per kind
+KINDS = {
+    'station': ('station_detail_list', (
+        'id', 'stationName', 'sno', 'timeZone', 'sr', 'ss', 'capacity',
+        'capacityStr', *FIRST_POWER_FIELDS)),
+    'inverter': ('inverter_detail_list', (
+        'id', 'sn', 'stationId', 'stationName', 'collectorId', 'collectorsn',
+        'model', 'timeZone')),
+    'collector': ('collector_list', (
+        'id', 'sn', 'stationId', 'stationName', 'model')),
+    'epm': ('epm_list', ('id', 'sn', 'stationId', 'stationName')),
+    'weather': ('weather_list', ('id', 'sn', 'stationId', 'stationName')),
+}
+
+# Methods that take fields= (see projection.py)
+_PROJECTED = ('station_detail_list', 'inverter_detail_list')
+
+# Seconds before a kind is read from the API again
+MAX_AGE = {'station': 3600, 'inverter': 3600, 'collector': 86400,
+           'epm': 86400, 'weather': 86400}
+
+
+class DeviceRegistry:
+    """Devices per kind by id, optionally kept in a snapshot at path."""
+
+    def __init__(self, path: str = None) -> None:
+        self.path = path
+        # Key id of the account the devices belong to
+        self.account: str = None
+        self.refreshed: dict[str, float] = {}
+        self._devices: dict[str, dict[str, dict]] = {k: {} for k in KINDS}
+        self._by_sn: dict[str, dict[str, str]] = {k: {} for k in KINDS}
+        self._by_station: dict[str, dict[str, list]] = {k: {} for k in KINDS}
+        if path is not None and os.path.exists(path):
+            self.load()
+
+    def __len__(self) -> int:
+        return sum(len(devices) for devices in self._devices.values())
+
+    def get(self, kind: str, device_id) -> dict[str, Any]:
+        """Record of device_id, None if unknown."""
+        return self._devices[kind].get(str(device_id))
+
+    def by_sn(self, kind: str, sn: str) -> dict[str, Any]:
+        """Record of the device with serial number sn, None if unknown."""
+        device_id = self._by_sn[kind].get(str(sn))
+        return None if device_id is None else self._devices[kind][device_id]
+
+    def by_station(self, kind: str, station_id) -> list[dict[str, Any]]:
+        """Records of the devices of kind at station_id."""
+        devices = self._devices[kind]
+        return [devices[i]
+                for i in self._by_station[kind].get(str(station_id), ())]
+
+    def station_of(self, kind: str, device_id) -> dict[str, Any]:
+        """Station record of a device, None if either is unknown."""
+        device = self.get(kind, device_id)
+        if device is None:
+            return None
+        return self.get('station', device.get('stationId'))
+
+    def ids(self, kind: str) -> tuple[str, ...]:
+        return tuple(self._devices[kind])
+
+    def update(self, kind: str, records: Iterable[dict]) -> dict[str, int]:
+        """
+        Replace the devices of kind with records. Returns the number of
+        devices added, changed and removed.
+        """
+        fields = KINDS[kind][1]
+        old = self._devices[kind]
+        new = {}
+        for record in records or ():
+            if record.get('id') is not None:
+                new[str(record['id'])] = {
+                    f: record[f] for f in fields if record.get(f) is not None}
+        self._devices[kind] = new
+        self._index(kind)
+        return {
+            'added': len(new.keys() - old.keys()),
+            'changed': sum(1 for i in new.keys() & old.keys()
+                           if new[i] != old[i]),
+            'removed': len(old.keys() - new.keys()),
+        }
+
+    def _index(self, kind: str) -> None:
+        by_sn: dict[str, str] = {}
+        by_station: dict[str, list] = {}
+        for device_id, device in self._devices[kind].items():
+            if device.get('sn') is not None:
+                by_sn[str(device['sn'])] = device_id
+            if device.get('stationId') is not None:
+                by_station.setdefault(
+                    str(device['stationId']), []).append(device_id)
+        self._by_sn[kind] = by_sn
+        self._by_station[kind] = by_station
+
+    def stale(self, kind: str, now: float = None) -> bool:
+        now = time.time() if now is None else now
+        return now - self.refreshed.get(kind, 0) >= MAX_AGE[kind]
+
+    async def refresh(
+        self, api, key, secret, kinds: Iterable[str] = None,
+        force: bool = False, concurrency: int = 4
+    ) -> dict[str, dict[str, int]]:
+        """
+        Read the stale kinds (all kinds if force) from the API. Returns the
+        changes per kind read, see update. Devices of another account are
+        dropped first.
+        """
+        self._claim(key)
+        changes = {}
+        for kind in kinds or KINDS:
+            if not force and not self.stale(kind):
+                continue
+            method, fields = KINDS[kind]
+            options = {'fields': fields} if method in _PROJECTED else {}
+            records = await Helpers.gather_pages(
+                getattr(api, method), key, secret, concurrency=concurrency,
+                **options)
+            changes[kind] = self.store(key, kind, records)
+        return changes
+
+    def store(
+        self, key, kind: str, records: Iterable[dict]
+    ) -> dict[str, int]:
+        """
+        Replace the devices of kind with all records of account key read
+        elsewhere, as refresh would. Returns the changes, see update.
+        """
+        self._claim(key)
+        changes = self.update(kind, records)
+        self.refreshed[kind] = time.time()
+        return changes
+
+    def _claim(self, key) -> None:
+        # Devices of another account are dropped
+        if self.account != str(key):
+            for kind in KINDS:
+                self.update(kind, ())
+            self.refreshed = {}
+            self.account = str(key)
+
+    def load(self) -> None:
+        with open(self.path, 'r', encoding='utf-8') as file:
+            snapshot = json.load(file)
+        self.account = snapshot.get('account')
+        self.refreshed = snapshot.get('refreshed', {})
+        for kind in KINDS:
+            self._devices[kind] = snapshot.get('devices', {}).get(kind, {})
+            self._index(kind)
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as file:
+            json.dump({'account': self.account, 'refreshed': self.refreshed,
+                       'devices': self._devices}, file, separators=(',', ':'))
+        os.replace(tmp, self.path)
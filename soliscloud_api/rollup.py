@@ -0,0 +1,174 @@
+"""Local energy rollups from inverter day curves, requires numpy.
+
+Rollup takes the inverter_day records we already fetch for backfill and
+derives daily energy per inverter from eToday (the day's maximum) or, where
+eToday is missing, by integrating pac over time. Daily values are summed
+into monthly and yearly totals per inverter or per station, so these no
+longer need inverter_month/inverter_year calls. Totals can be reconciled
+against API totals when wanted.
+
+For more information: https://github.com/hultenvp/soliscloud_api
+"""
+from __future__ import annotations
+
+from typing import Any, Iterable
+
+import numpy as np
+
+from soliscloud_api.units import scaled
+
+DAY = 86400
+
+# Larger gaps between samples are not integrated (e.g. logger offline)
+MAX_GAP = 1800
+
+PERIODS = {'day': 'datetime64[D]', 'month': 'datetime64[M]',
+           'year': 'datetime64[Y]'}
+
+
+def value(record: dict[str, Any], key: str, unit: str = None) -> float:
+    """record[key] scaled by the unit in record[key + 'Str'], NaN if absent."""
+    number = scaled(record, key, unit)
+    return np.nan if number is None else number
+
+
+def api_totals(
+    key, records: Iterable[dict[str, Any]], date_key: str = 'dateStr'
+) -> dict[tuple, float]:
+    """
+    Totals in kWh from inverter_month/inverter_year (or station) records,
+    keyed (key, period) as returned by Rollup.totals.
+    """
+    totals = {}
+    for record in records or ():
+        energy = value(record, 'energy', 'kWh')
+        if record.get(date_key) and not np.isnan(energy):
+            totals[(key, record[date_key])] = energy
+    return totals
+
+
+class Rollup:
+    """
+    Day curves of many inverters, rolled up in bulk.
+
+    time_zone is the UTC offset in hours that defines the day boundaries.
+    """
+
+    def __init__(self, time_zone: float = 0, max_gap: float = MAX_GAP) -> None:
+        self.time_zone = time_zone
+        self.max_gap = max_gap
+        self._index: dict[Any, int] = {}
+        self._stations: dict[Any, Any] = {}
+        self._chunks: list[tuple] = []
+
+    def __len__(self) -> int:
+        return sum(len(chunk[1]) for chunk in self._chunks)
+
+    def add(
+        self, inverter_id, records: Iterable[dict[str, Any]], station_id=None
+    ) -> int:
+        """
+        Add inverter_day records (time in epoch ms, pac, eToday). Returns the
+        number of samples added; records without time are skipped.
+        """
+        records = [r for r in records or () if r.get('time') is not None]
+        index = self._index.setdefault(inverter_id, len(self._index))
+        if station_id is not None:
+            self._stations[inverter_id] = station_id
+        if records:
+            self._chunks.append((
+                np.full(len(records), index, dtype=np.int64),
+                np.array([float(r['time']) for r in records]) / 1000,
+                np.array([value(r, 'pac', 'W') for r in records]),
+                np.array([value(r, 'eToday', 'kWh') for r in records])))
+        return len(records)
+
+    def _samples(self) -> tuple:
+        """All samples sorted by inverter and time."""
+        inverter, time, pac, etoday = (
+            np.concatenate(column) for column in zip(*self._chunks))
+        order = np.lexsort((time, inverter))
+        return inverter[order], time[order], pac[order], etoday[order]
+
+    def _integrate(self, groups, time, pac, count: int):
+        """Trapezoid integral of pac per group in kWh."""
+        dt = np.diff(time)
+        mean = (pac[1:] + pac[:-1]) / 2
+        valid = (groups[1:] == groups[:-1]) & (dt > 0) \
+            & (dt <= self.max_gap) & ~np.isnan(mean)
+        return np.bincount(
+            groups[1:][valid], weights=(mean * dt)[valid],
+            minlength=count) / 3.6e6
+
+    def _daily(self, source: str) -> tuple:
+        """Inverter index, day number and energy (kWh) arrays."""
+        if not self._chunks:
+            empty = np.array([], dtype=np.int64)
+            return empty, empty, np.array([])
+        inverter, time, pac, etoday = self._samples()
+        day = np.floor((time + self.time_zone * 3600) / DAY).astype(np.int64)
+        keys, groups = np.unique(
+            np.stack([inverter, day], axis=1), axis=0, return_inverse=True)
+        groups = groups.reshape(-1)
+        maximum = np.full(len(keys), np.nan)
+        np.fmax.at(maximum, groups, etoday)
+        if source == 'etoday':
+            energy = maximum
+        else:
+            integrated = self._integrate(groups, time, pac, len(keys))
+            energy = integrated if source == 'pac' else np.where(
+                np.isnan(maximum), integrated, maximum)
+        return keys[:, 0], keys[:, 1], energy
+
+    def totals(
+        self, period: str = 'day', by: str = 'inverter', source: str = 'auto'
+    ) -> dict[tuple, float]:
+        """
+        Energy in kWh keyed (inverter or station id, period) with period as
+        YYYY-MM-DD, YYYY-MM or YYYY. source is 'etoday', 'pac' or 'auto'
+        (eToday where present, else integrated pac).
+        """
+        if period not in PERIODS:
+            raise ValueError(f"period must be one of {', '.join(PERIODS)}")
+        if source not in ('auto', 'etoday', 'pac'):
+            raise ValueError("source must be 'auto', 'etoday' or 'pac'")
+        inverter, day, energy = self._daily(source)
+        ids = list(self._index)
+        if by == 'station':
+            names = [self._stations.get(i) for i in ids]
+        elif by == 'inverter':
+            names = ids
+        else:
+            raise ValueError("by must be 'inverter' or 'station'")
+        labels = sorted(set(names), key=str)
+        position = {name: i for i, name in enumerate(labels)}
+        owner = np.array(
+            [position[n] for n in names], dtype=np.int64)[inverter]
+        periods = day.astype('datetime64[D]').astype(PERIODS[period])
+        valid = ~np.isnan(energy)
+        keys, groups = np.unique(
+            np.stack([owner[valid], periods[valid].astype(np.int64)], axis=1),
+            axis=0, return_inverse=True)
+        sums = np.bincount(
+            groups.reshape(-1), weights=energy[valid], minlength=len(keys))
+        return {
+            (labels[o], str(np.array(p, dtype=PERIODS[period]))): float(e)
+            for (o, p), e in zip(keys, sums)}
+
+    def reconcile(
+        self, api: dict[tuple, float], period: str = 'month',
+        by: str = 'inverter', tolerance: float = 0.02
+    ) -> dict[tuple, tuple]:
+        """
+        Compare totals with API totals (see api_totals). Returns
+        {key: (local, api)} where they differ by more than tolerance
+        (relative) or the local total is missing.
+        """
+        local = self.totals(period, by)
+        mismatches = {}
+        for key, expected in api.items():
+            actual = local.get(key)
+            if actual is None or abs(actual - expected) > \
+                    tolerance * max(abs(expected), 1e-9):
+                mismatches[key] = (actual, expected)
+        return mismatches
@@ -0,0 +1,232 @@
+"""Declarative InfluxDB schemas for API records.
+
+A Schema maps the keys of a record to the tags, fields and timestamp of a
+point. Tags are limited to bounded identifiers (inverter_id, station_id,
+...): keys that vary per record, such as times, dates and URLs, are
+rejected as tags, and a tag that exceeds max_tag_values distinct values
+raises, so series cardinality stays proportional to the fleet.
+
+For more information: https://github.com/hultenvp/soliscloud_api
+"""
+from __future__ import annotations
+
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable
+
+# Keys whose values are unique per record and must not become tags
+UNBOUNDED = re.compile(r'(?i)(time|date|timestamp|url|str$)')
+
+TIME_FORMATS = ('ms', 's', 'date', 'month')
+
+
+def _text(value) -> str:
+    return str(value)
+
+
+def _number(value):
+    """Number as sent by the API: ints stay integer fields, as they were."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    return float(value)
+
+
+class Schema:
+    """
+    Mapping of records to points of measurement.
+
+    tags and fields map the tag or field name to the record key. A field
+    key may be given as (key, type), type defaults to float; values that
+    are missing or cannot be converted are left out. time is (key, format)
+    with format 'ms' or 's' (epoch) or 'date'/'month' (YYYY-MM-DD/YYYY-MM at
+    midnight in time_zone hours from UTC).
+    """
+
+    def __init__(
+        self, measurement: str, *,
+        tags: dict[str, str],
+        fields: dict[str, Any],
+        time: tuple[str, str] = None,
+        time_zone: float = 0,
+        max_tag_values: int = 100000
+    ) -> None:
+        for name, key in tags.items():
+            if UNBOUNDED.search(name) or UNBOUNDED.search(key):
+                raise ValueError(f"Unbounded tag '{name}' ({key})")
+        if time is not None and time[1] not in TIME_FORMATS:
+            raise ValueError(
+                f"time format must be one of {', '.join(TIME_FORMATS)}")
+        self.measurement = measurement
+        self.tags = dict(tags)
+        self.fields: dict[str, tuple[str, Callable]] = {
+            name: (spec, float) if isinstance(spec, str) else tuple(spec)
+            for name, spec in fields.items()}
+        self.time = time
+        self.time_zone = time_zone
+        self.max_tag_values = max_tag_values
+        self._seen: dict[str, set] = {name: set() for name in self.tags}
+
+    def _tag_values(self, record: dict[str, Any]) -> dict[str, str]:
+        tags = {}
+        for name, key in self.tags.items():
+            value = record.get(key)
+            if value is None or value == '':
+                continue
+            value = str(value)
+            seen = self._seen[name]
+            if value not in seen:
+                if len(seen) >= self.max_tag_values:
+                    raise ValueError(
+                        f"Tag '{name}' of {self.measurement} exceeds "
+                        f"{self.max_tag_values} values")
+                seen.add(value)
+            tags[name] = value
+        return tags
+
+    def _field_values(self, record: dict[str, Any]) -> dict[str, Any]:
+        fields = {}
+        for name, (key, convert) in self.fields.items():
+            value = record.get(key)
+            if value is None or value == '':
+                continue
+            try:
+                fields[name] = convert(value)
+            except (TypeError, ValueError):
+                continue
+        return fields
+
+    def timestamp(self, record: dict[str, Any]) -> datetime:
+        """Record time as aware datetime, None if absent or invalid."""
+        if self.time is None:
+            return None
+        key, fmt = self.time
+        value = record.get(key)
+        try:
+            if fmt in ('ms', 's'):
+                seconds = float(value) / (1000 if fmt == 'ms' else 1)
+                return datetime.fromtimestamp(seconds, tz=timezone.utc)
+            parsed = datetime.strptime(
+                str(value), "%Y-%m-%d" if fmt == 'date' else "%Y-%m")
+        except (TypeError, ValueError, OverflowError, OSError):
+            return None
+        return parsed.replace(tzinfo=timezone(timedelta(hours=self.time_zone)))
+
+    def map(self, record: dict[str, Any], default_time: datetime = None):
+        """(tags, fields, time) of record, time falls back to default_time."""
+        time = self.timestamp(record)
+        return (
+            self._tag_values(record), self._field_values(record),
+            default_time if time is None else time)
+
+    def point(self, record: dict[str, Any], default_time: datetime = None):
+        """influxdb_client Point of record, None if it has no fields."""
+        from influxdb_client import Point, WritePrecision
+        tags, fields, time = self.map(record, default_time)
+        if not fields:
+            return None
+        point = Point(self.measurement)
+        for name, value in tags.items():
+            point.tag(name, value)
+        for name, value in fields.items():
+            point.field(name, value)
+        if time is not None:
+            point.time(time, WritePrecision.S)
+        return point
+
+    def points(self, records, default_time: datetime = None) -> list:
+        return [p for p in (self.point(r, default_time) for r in records)
+                if p is not None]
+
+
+# Tags and field types of the points the scripts wrote before schemas, so
+# existing series continue; only the unbounded dataTimestampStr and timeStr
+# tags are gone (the point time holds dataTimestamp)
+INVERTER_DETAIL = Schema(
+    "inverter_detail_list",
+    tags={
+        "inverter_id": "id", "model": "model", "stationName": "stationName",
+        "stationId": "stationId", "sn": "sn", "sno": "sno",
+        "collectorsn": "collectorsn", "collectorId": "collectorId",
+        "inverterMeterModel": "inverterMeterModel"},
+    fields={
+        "pac": "pac", "eToday": "eToday", "eMonth": "eMonth",
+        "eYear": "eYear", "eTotal": "eTotal", "fullHour": "fullHour",
+        "timeZone": "timeZone", "power": "power", "dcBus": "dcBus",
+        "porwerPercent": "porwerPercent", "apparentPower": "apparentPower",
+        "dcPac": "dcPac", "pacPec": ("pacPec", _number),
+        "acOutputType": ("acOutputType", int),
+        "dcInputType": ("dcInputType", int),
+        "state": ("state", _number), "alarmState": ("alarmState", _number),
+        "stateExceptionFlag": ("stateExceptionFlag", _number),
+        "currentState": ("currentState", _text),
+        "tempName": ("tempName", _text),
+        "shelfState": ("shelfState", _text),
+        "updateShelfEndTimeStr": ("updateShelfEndTimeStr", _text),
+        "allInCome": ("allInCome", _number),
+        "gridPurchasedTodayEnergy": ("gridPurchasedTodayEnergy", _number),
+        "gridSellTodayEnergy": ("gridSellTodayEnergy", _number),
+        "uAc1": ("uAc1", _number), "uAc2": ("uAc2", _number),
+        "uAc3": ("uAc3", _number), "iAc1": ("iAc1", _number),
+        "iAc2": ("iAc2", _number), "iAc3": ("iAc3", _number),
+        "uPv1": ("uPv1", _number), "iPv1": ("iPv1", _number),
+        "insulationResistance": ("insulationResistance", _number),
+        "iLeakLimt": ("iLeakLimt", _number),
+        "inverterTemperature": ("inverterTemperature", _number),
+        "powerFactor": ("powerFactor", _number), "fac": ("fac", _number)},
+    time=("dataTimestamp", "ms"))
+
+STATION_DETAIL = Schema(
+    "station_detail_list",
+    tags={"station_id": "id", "stationName": "stationName",
+          "orgCode": "orgCode"},
+    fields={
+        "DailyPowerGen": "dayEnergy",
+        "monthCarbonDioxide": "mountCarbonDioxide",
+        "MonthlyPowerGen": "monthEnergy", "YearlyPowerGen": "yearEnergy",
+        "TotalPowerGen": "allEnergy", "FullPowerHours": "fullHour",
+        "capacity": "capacity", "state": ("state", int), "power": "power",
+        "dayIncome": ("dayIncome", _number),
+        "monthInCome": ("monthInCome", _number),
+        "yearInCome": ("yearInCome", _number),
+        "allInCome": ("allInCome", _number),
+        "homeLoadEnergy": ("homeLoadEnergy", _number),
+        "homeLoadMonthEnergy": ("homeLoadMonthEnergy", _number),
+        "weather": ("weather", _text), "sr": ("sr", _text),
+        "ss": ("ss", _text), "condTxtD": ("condTxtD", _text),
+        "condTxtN": ("condTxtN", _text),
+        "weatherType": ("weatherType", _text),
+        "weatherUpdateDateStr": ("weatherUpdateDateStr", _text),
+        "createDateStr": ("createDateStr", _text),
+        "installerEmail": ("installerEmail", _text),
+        "installerMobile": ("installerMobile", _text),
+        "region": ("regionStr", _text), "city": ("cityStr", _text),
+        "country": ("countryStr", _text), "county": ("countyStr", _text)},
+    time=("dataTimestamp", "ms"))
+
+# Rows of the day backfill (inverter_day curves)
+INVERTER_DAY = Schema(
+    "Inverter_Daily",
+    tags={"inverter_id": "inverter_id", "station_name": "station_name"},
+    fields={"pac": "pac", "eToday": "eToday", "eTotal": "eTotal"},
+    time=("time", "ms"))
+
+# Rows of the daily energy jobs (inverter_month records), at local midnight
+INVERTER_DAILY = Schema(
+    "inverter_daily",
+    tags={"inverter_id": "inverter_id", "station_name": "station_name"},
+    fields={"energy": "energy", "money": "money",
+            "moneyStr": ("moneyStr", _text),
+            "energyStr": ("energyStr", _text)},
+    time=("dateStr", "date"), time_zone=8)
+
+# Rows of the station day energy collector (energy.py), at local midnight
+STATION_DAY_ENERGY = Schema(
+    "station_day_energy",
+    tags={"station_id": "station_id", "station_name": "station_name"},
+    fields={"energy": "energy", "money": "money",
+            "moneyStr": ("moneyStr", _text)},
+    time=("period", "date"), time_zone=8)
+
+SCHEMAS = {s.measurement: s for s in (
+    INVERTER_DETAIL, STATION_DETAIL, INVERTER_DAY, INVERTER_DAILY,
+    STATION_DAY_ENERGY)}
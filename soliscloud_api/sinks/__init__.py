@@ -0,0 +1,121 @@
+"""Record sinks.
+
+A sink writes lists of flat dict rows to a named table (measurement,
+table or file). Drivers are imported only when a sink is opened, so code
+that never writes to InfluxDB does not load influxdb_client.
+
+Coroutines write through an AsyncSink so database round trips do not block
+the event loop: open_async_sink returns the native async driver where
+there is one (ASYNC_SINKS) and otherwise runs the sink on its own thread.
+
+For more information: https://github.com/hultenvp/soliscloud_api
+"""
+from __future__ import annotations
+
+import asyncio
+import importlib
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+SINKS = {
+    'influx': 'soliscloud_api.sinks.influx:InfluxSink',
+    'mysql': 'soliscloud_api.sinks.mysql:MysqlSink',
+    'jsonl': 'soliscloud_api.sinks.jsonl:JsonlSink',
+}
+
+ASYNC_SINKS = {
+    'mysql': 'soliscloud_api.sinks.mysql_async:AsyncMysqlSink',
+    'postgres': 'soliscloud_api.sinks.postgres:PostgresSink',
+}
+
+_IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+def quote_identifier(identifier: str, quote: str = '`') -> str:
+    """Table or column name in quotes, rejects anything but [A-Za-z0-9_]."""
+    if not _IDENTIFIER.match(identifier):
+        raise ValueError(f"Invalid SQL identifier '{identifier}'")
+    return f"{quote}{identifier}{quote}"
+
+
+def upsert_query(table: str, columns: list[str]) -> str:
+    """MySQL INSERT of columns, rows with an existing key are updated."""
+    names = [quote_identifier(c) for c in columns]
+    return "INSERT INTO {} ({}) VALUES ({}) ON DUPLICATE KEY UPDATE {}".format(
+        quote_identifier(table), ', '.join(names),
+        ', '.join(['%s'] * len(names)),
+        ', '.join(f"{n} = VALUES({n})" for n in names))
+
+
+class Sink:
+    """Sink interface."""
+
+    def write(self, table: str, rows: list[dict]) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> Sink:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class AsyncSink:
+    """Async sink interface."""
+
+    async def write(self, table: str, rows: list[dict]) -> None:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+    async def __aenter__(self) -> AsyncSink:
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+
+class ThreadedSink(AsyncSink):
+    """Sink on a dedicated thread, writes are queued and keep their order."""
+
+    def __init__(self, sink: Sink) -> None:
+        self.sink = sink
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='sink')
+
+    async def _run(self, func, *args) -> None:
+        await asyncio.get_running_loop().run_in_executor(
+            self._executor, func, *args)
+
+    async def write(self, table: str, rows: list[dict]) -> None:
+        await self._run(self.sink.write, table, rows)
+
+    async def close(self) -> None:
+        try:
+            await self._run(self.sink.close)
+        finally:
+            self._executor.shutdown(wait=False)
+
+
+def _load(registry: dict[str, str], name: str):
+    module, _, attribute = registry[name].partition(':')
+    return getattr(importlib.import_module(module), attribute)
+
+
+def open_sink(name: str, **options) -> Sink:
+    """Sink registered as name in SINKS, constructed with options."""
+    if name not in SINKS:
+        raise ValueError(
+            f"Unknown sink '{name}', expected one of {', '.join(SINKS)}")
+    return _load(SINKS, name)(**options)
+
+
+def open_async_sink(name: str, **options) -> AsyncSink:
+    """Native async sink of name, else the sink of name on a thread."""
+    if name in ASYNC_SINKS:
+        return _load(ASYNC_SINKS, name)(**options)
+    return ThreadedSink(open_sink(name, **options))
@@ -0,0 +1,130 @@
+"""Delivery of one stream of rows to several sinks.
+
+FanOutSink passes every write to each of its sinks through a bounded
+queue per sink. Each sink drains its queue in its own task, merging queued
+writes into batches of up to its batch size, so a slow sink only falls
+behind (until its queue is full) instead of delaying the others. A sink
+that fails is dropped for the rest of the run; the other sinks continue
+and close() raises FanOutError listing the failed sinks.
+
+    async with FanOutSink({'mysql': open_async_sink('mysql', ...),
+                           'influx': open_async_sink('influx', ...)}) as sink:
+        await sink.write('inverter_daily', rows)
+
+For more information: https://github.com/hultenvp/soliscloud_api
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+
+from soliscloud_api.sinks import AsyncSink
+
+_LOGGER = logging.getLogger(__name__)
+
+# Rows per write to a sink
+BATCH_SIZE = 500
+
+# Writes queued per sink before write() waits for it
+MAXSIZE = 1000
+
+
+class FanOutError(Exception):
+    """Sinks of a FanOutSink failed, errors maps their names to the error."""
+
+    def __init__(self, errors: dict[str, Exception]) -> None:
+        super().__init__("Sink(s) failed: " + ', '.join(
+            f"{name} ({error!r})" for name, error in errors.items()))
+        self.errors = errors
+
+
+class FanOutSink(AsyncSink):
+    """
+    Writes to every sink in sinks (name: AsyncSink). batch_size is the
+    maximum rows per sink write, an int or a dict per sink name.
+    """
+
+    def __init__(
+        self, sinks: dict[str, AsyncSink], *, batch_size=BATCH_SIZE,
+        maxsize: int = MAXSIZE
+    ) -> None:
+        if not sinks:
+            raise ValueError("FanOutSink needs at least one sink")
+        self.sinks = dict(sinks)
+        self.batch_sizes = {
+            name: batch_size.get(name, BATCH_SIZE)
+            if isinstance(batch_size, dict) else batch_size
+            for name in self.sinks}
+        self.maxsize = maxsize
+        self.errors: dict[str, Exception] = {}
+        self.written = {name: 0 for name in self.sinks}
+        self._queues: dict[str, asyncio.Queue] = {}
+        self._tasks: list[asyncio.Task] = []
+
+    def _start(self) -> None:
+        for name in self.sinks:
+            self._queues[name] = asyncio.Queue(self.maxsize)
+            self._tasks.append(asyncio.create_task(self._drain(name)))
+
+    async def write(self, table: str, rows: list[dict]) -> None:
+        if not rows:
+            return
+        if not self._tasks:
+            self._start()
+        for name, queue in self._queues.items():
+            if name not in self.errors:
+                await queue.put((table, rows))
+
+    def _batch(self, name: str, first: tuple) -> tuple[dict, bool]:
+        """Rows per table of first and the writes queued after it."""
+        queue = self._queues[name]
+        batch = {first[0]: list(first[1])}
+        count = len(first[1])
+        while count < self.batch_sizes[name]:
+            try:
+                item = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            if item is None:
+                return batch, True
+            batch.setdefault(item[0], []).extend(item[1])
+            count += len(item[1])
+        return batch, False
+
+    async def _deliver(self, name: str, batch: dict) -> None:
+        if name in self.errors:
+            return
+        size = self.batch_sizes[name]
+        try:
+            for table, rows in batch.items():
+                for start in range(0, len(rows), size):
+                    await self.sinks[name].write(
+                        table, rows[start:start + size])
+                    self.written[name] += len(rows[start:start + size])
+        except Exception as error:
+            _LOGGER.exception("Sink %s failed, dropped for this run", name)
+            self.errors[name] = error
+
+    async def _drain(self, name: str) -> None:
+        queue = self._queues[name]
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            batch, stop = self._batch(name, item)
+            await self._deliver(name, batch)
+            if stop:
+                return
+
+    async def close(self) -> None:
+        """Deliver the queued writes and close all sinks."""
+        for queue in self._queues.values():
+            await queue.put(None)
+        await asyncio.gather(*self._tasks)
+        for name, sink in self.sinks.items():
+            try:
+                await sink.close()
+            except Exception as error:
+                self.errors.setdefault(name, error)
+        if self.errors:
+            raise FanOutError(self.errors)
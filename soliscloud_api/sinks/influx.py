@@ -0,0 +1,86 @@
+"""InfluxDB 2.x sink, requires influxdb-client.
+
+For more information: https://github.com/hultenvp/soliscloud_api
+"""
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from typing import Callable
+
+from influxdb_client import InfluxDBClient, Point, WritePrecision
+from influxdb_client.client.write_api import SYNCHRONOUS
+
+from soliscloud_api.lineprotocol import compile_encoder
+from soliscloud_api.schema import SCHEMAS, Schema
+from soliscloud_api.sinks import Sink
+
+# Row keys written as tags, all other values are written as fields
+DEFAULT_TAGS = (
+    'id', 'inverter_id', 'sn', 'stationId', 'stationName', 'station_name')
+
+# Row keys holding the record time in epoch ms, best first
+TIME_KEYS = ('dataTimestamp', 'time')
+
+
+def _time(row: dict) -> datetime:
+    for key in TIME_KEYS:
+        try:
+            return datetime.fromtimestamp(
+                float(row[key]) / 1000, tz=timezone.utc)
+        except (KeyError, TypeError, ValueError):
+            continue
+    return datetime.now(tz=timezone.utc)
+
+
+class InfluxSink(Sink):
+    """
+    Writes each row as a point of measurement table, mapped by the schema
+    of that measurement if there is one (see schema.py). Rows of a schema
+    are encoded to line protocol by its compiled encoder (lineprotocol.py)
+    instead of through Point objects.
+    """
+
+    def __init__(
+        self, url: str, token: str, org: str, bucket: str,
+        tags: tuple = DEFAULT_TAGS, schemas: dict[str, Schema] = None
+    ) -> None:
+        self.bucket = bucket
+        self.tags = tags
+        self.schemas = SCHEMAS if schemas is None else schemas
+        self._encoders: dict[str, Callable[..., bytes]] = {}
+        self._client = InfluxDBClient(url=url, token=token, org=org)
+        self._write_api = self._client.write_api(write_options=SYNCHRONOUS)
+
+    def point(self, table: str, row: dict) -> Point:
+        point = Point(table).time(_time(row), WritePrecision.S)
+        for key, value in row.items():
+            if value is None or isinstance(value, (dict, list)):
+                continue
+            if key in self.tags:
+                point.tag(key, str(value))
+            else:
+                point.field(key, value)
+        return point
+
+    def encoder(self, table: str) -> Callable[..., bytes]:
+        """Line protocol encoder of the schema of table, None without."""
+        if table not in self._encoders:
+            schema = self.schemas.get(table)
+            self._encoders[table] = None if schema is None \
+                else compile_encoder(schema)
+        return self._encoders[table]
+
+    def write(self, table: str, rows: list[dict]) -> None:
+        encode = self.encoder(table)
+        if encode is None:
+            points = [self.point(table, r) for r in rows]
+            self._write_api.write(bucket=self.bucket, record=points)
+            return
+        data = encode(rows)
+        if data:
+            self._write_api.write(
+                bucket=self.bucket, record=data,
+                write_precision=WritePrecision.S)
+
+    def close(self) -> None:
+        self._client.close()
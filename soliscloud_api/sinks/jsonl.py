@@ -0,0 +1,37 @@
+"""JSON lines sink.
+
+For more information: https://github.com/hultenvp/soliscloud_api
+"""
+from __future__ import annotations
+
+import json
+import sys
+
+from soliscloud_api.sinks import Sink
+
+
+class JsonlSink(Sink):
+    """
+    Appends rows as JSON lines to path, or to stdout if path is None or '-'.
+    With table_key, the table name is added to every row under that key.
+    """
+
+    def __init__(self, path: str = None, table_key: str = None) -> None:
+        self.table_key = table_key
+        if path in (None, '-'):
+            self._file = sys.stdout
+            self._close = False
+        else:
+            self._file = open(path, 'a', encoding='utf-8')
+            self._close = True
+
+    def write(self, table: str, rows: list[dict]) -> None:
+        for row in rows:
+            if self.table_key is not None:
+                row = {self.table_key: table, **row}
+            self._file.write(json.dumps(row, separators=(",", ":")) + "\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        if self._close:
+            self._file.close()
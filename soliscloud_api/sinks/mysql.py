@@ -0,0 +1,127 @@
+"""MySQL sink, requires mysql-connector-python.
+
+With bulk=True rows are buffered per table and loaded in large batches for
+backfills: the batch is written to a local TSV file, loaded with LOAD DATA
+LOCAL INFILE into a temporary staging table with the target's columns and merged
+into the target with one INSERT ... SELECT ... ON DUPLICATE KEY UPDATE.
+The server must allow local_infile.
+
+For more information: https://github.com/hultenvp/soliscloud_api
+"""
+from __future__ import annotations
+
+import os
+import tempfile
+
+import mysql.connector
+
+from soliscloud_api.sinks import Sink, quote_identifier as _quote, upsert_query
+
+# Rows buffered per table before a bulk load
+BULK_ROWS = 50000
+
+_TSV_ESCAPES = str.maketrans({
+    '\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r', '\0': '\\0'})
+
+
+def tsv_value(value) -> str:
+    """value as a LOAD DATA field with the default escapes, None as NULL."""
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        value = int(value)
+    return str(value).translate(_TSV_ESCAPES)
+
+
+def write_tsv(file, columns: list[str], rows: list[dict]) -> None:
+    for row in rows:
+        file.write('\t'.join(tsv_value(row.get(c)) for c in columns) + '\n')
+
+
+class MysqlSink(Sink):
+    """
+    Upserts rows into the table of the same name, columns from row keys,
+    like AsyncMysqlSink. In bulk mode rows are loaded in batches of bulk_rows.
+    """
+
+    def __init__(
+        self, host: str, user: str, password: str, database: str, *,
+        bulk: bool = False, bulk_rows: int = BULK_ROWS, tmp_dir: str = None,
+        **options
+    ) -> None:
+        if bulk:
+            options.setdefault('allow_local_infile', True)
+        self._connection = mysql.connector.connect(
+            host=host, user=user, password=password, database=database,
+            **options)
+        self.bulk = bulk
+        self.bulk_rows = bulk_rows
+        self.tmp_dir = tmp_dir
+        self._buffer: dict[str, list[dict]] = {}
+
+    def write(self, table: str, rows: list[dict]) -> None:
+        if not rows:
+            return
+        if self.bulk:
+            buffer = self._buffer.setdefault(table, [])
+            buffer.extend(rows)
+            if len(buffer) >= self.bulk_rows:
+                self.flush(table)
+            return
+        columns = list(rows[0])
+        cursor = self._connection.cursor()
+        try:
+            cursor.executemany(
+                upsert_query(table, columns),
+                [tuple(row.get(c) for c in columns) for row in rows])
+            self._connection.commit()
+        finally:
+            cursor.close()
+
+    def flush(self, table: str = None) -> None:
+        """Bulk load the buffered rows of table, or of all tables."""
+        for name in [table] if table else list(self._buffer):
+            rows = self._buffer.pop(name, None)
+            if rows:
+                self._load(name, rows)
+
+    def _load(self, table: str, rows: list[dict]) -> None:
+        columns = list(rows[0])
+        names = ', '.join(_quote(c) for c in columns)
+        target = _quote(table)
+        stage = _quote(f"{table}_stage")
+        with tempfile.NamedTemporaryFile(
+                'w', encoding='utf-8', newline='', suffix='.tsv',
+                dir=self.tmp_dir, delete=False) as file:
+            write_tsv(file, columns, rows)
+        cursor = self._connection.cursor()
+        try:
+            # Column types of the target without its keys, seq keeps the
+            # order so the last of duplicate rows wins in the merge
+            cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {stage}")
+            cursor.execute(
+                f"CREATE TEMPORARY TABLE {stage} "
+                "(`_seq` BIGINT AUTO_INCREMENT PRIMARY KEY) "
+                f"SELECT {names} FROM {target} LIMIT 0")
+            cursor.execute(
+                f"LOAD DATA LOCAL INFILE %s INTO TABLE {stage} "
+                f"CHARACTER SET utf8mb4 ({names})", (file.name,))
+            cursor.execute(
+                f"INSERT INTO {target} ({names}) SELECT {names} FROM {stage} "
+                "ORDER BY `_seq` "
+                "ON DUPLICATE KEY UPDATE " + ', '.join(
+                    f"{_quote(c)} = VALUES({_quote(c)})" for c in columns))
+            cursor.execute(f"DROP TEMPORARY TABLE {stage}")
+            self._connection.commit()
+        except Exception:
+            self._connection.rollback()
+            raise
+        finally:
+            cursor.close()
+            os.remove(file.name)
+
+    def close(self) -> None:
+        try:
+            self.flush()
+        finally:
+            self._connection.close()
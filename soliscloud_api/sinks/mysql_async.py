@@ -0,0 +1,67 @@
+"""Async MySQL sink, requires aiomysql.
+
+Rows are upserted (INSERT ... ON DUPLICATE KEY UPDATE) in batches over a
+connection pool, so concurrent writers use separate connections and the
+event loop keeps serving API requests during database round trips.
+
+For more information: https://github.com/hultenvp/soliscloud_api
+"""
+from __future__ import annotations
+
+import asyncio
+
+import aiomysql
+
+from soliscloud_api.sinks import AsyncSink, upsert_query
+
+# Rows per INSERT statement
+BATCH_SIZE = 1000
+
+
+class AsyncMysqlSink(AsyncSink):
+    """
+    Upserts rows into the table of the same name, columns from row keys.
+    The pool (minsize..maxsize connections) is created on the first write.
+    """
+
+    def __init__(
+        self, host: str, user: str, password: str, database: str, *,
+        port: int = 3306, batch_size: int = BATCH_SIZE, minsize: int = 1,
+        maxsize: int = 4, **options
+    ) -> None:
+        self.batch_size = batch_size
+        self._options = dict(
+            host=host, port=port, user=user, password=password, db=database,
+            minsize=minsize, maxsize=maxsize, autocommit=False, **options)
+        self._pool = None
+        self._lock = asyncio.Lock()
+
+    async def _connect(self):
+        async with self._lock:
+            if self._pool is None:
+                self._pool = await aiomysql.create_pool(**self._options)
+        return self._pool
+
+    async def write(self, table: str, rows: list[dict]) -> None:
+        if not rows:
+            return
+        columns = list(rows[0])
+        query = upsert_query(table, columns)
+        pool = await self._connect()
+        async with pool.acquire() as connection:
+            try:
+                async with connection.cursor() as cursor:
+                    for start in range(0, len(rows), self.batch_size):
+                        await cursor.executemany(query, [
+                            tuple(row.get(c) for c in columns)
+                            for row in rows[start:start + self.batch_size]])
+                await connection.commit()
+            except Exception:
+                await connection.rollback()
+                raise
+
+    async def close(self) -> None:
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.close()
+            await pool.wait_closed()
@@ -0,0 +1,216 @@
+"""PostgreSQL/TimescaleDB sink, requires asyncpg.
+
+Rows are copied with binary COPY into a temporary staging table and merged
+into the target with one INSERT ... ON CONFLICT DO UPDATE per batch.
+
+Tables of the schemas in schema.py (inverter telemetry, daily energy,
+station snapshots) are created on first use with a time column, a text
+column per tag and a typed column per field, keyed on (time, first tag).
+When the timescaledb extension is installed they are made hypertables on
+time. Other tables must exist; their column types are read from the
+database and the upsert keys are given per table with keys=.
+
+For more information: https://github.com/hultenvp/soliscloud_api
+"""
+from __future__ import annotations
+
+import asyncio
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from typing import Any, Callable
+
+import asyncpg
+
+from soliscloud_api.schema import SCHEMAS, Schema, _number
+from soliscloud_api.sinks import AsyncSink, quote_identifier
+
+
+def _quote(identifier: str) -> str:
+    return quote_identifier(identifier, '"')
+
+
+# Column types of schema fields by converter, others are TEXT
+COLUMN_TYPES = {
+    float: 'DOUBLE PRECISION', _number: 'DOUBLE PRECISION', int: 'BIGINT'}
+
+
+def _int(value) -> int:
+    return int(float(value))
+
+
+def _timestamp(value) -> datetime:
+    """datetime, epoch ms or ISO 8601 text as aware datetime."""
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    try:
+        return datetime.fromtimestamp(float(value) / 1000, tz=timezone.utc)
+    except ValueError:
+        return _timestamp(datetime.fromisoformat(str(value)))
+
+
+def _date(value) -> date:
+    return value if isinstance(value, date) else \
+        date.fromisoformat(str(value)[:10])
+
+
+# Conversions of row values to the binary COPY type of a column
+CONVERTERS: dict[str, Callable] = {
+    'float4': float, 'float8': float, 'numeric': lambda v: Decimal(str(v)),
+    'int2': _int, 'int4': _int, 'int8': _int, 'bool': bool,
+    'text': str, 'varchar': str, 'bpchar': str, 'date': _date,
+    'timestamptz': _timestamp,
+    'timestamp': lambda v: _timestamp(v).astimezone(timezone.utc)
+    .replace(tzinfo=None),
+}
+
+
+def _convert(convert: Callable, value) -> Any:
+    if value is None or value == '':
+        return None
+    try:
+        return convert(value)
+    except (TypeError, ValueError, ArithmeticError):
+        return None
+
+
+def schema_keys(schema: Schema) -> tuple[str, ...]:
+    return ('time', next(iter(schema.tags)))
+
+
+def schema_columns(schema: Schema) -> list[str]:
+    return ['time', *schema.tags, *schema.fields]
+
+
+def table_ddl(table: str, schema: Schema) -> str:
+    """CREATE TABLE statement of the rows of schema."""
+    columns = [f"{_quote('time')} TIMESTAMPTZ NOT NULL"]
+    columns += [f"{_quote(tag)} TEXT" for tag in schema.tags]
+    columns += [
+        f"{_quote(field)} {COLUMN_TYPES.get(convert, 'TEXT')}"
+        for field, (_, convert) in schema.fields.items()]
+    columns.append("PRIMARY KEY ({})".format(
+        ', '.join(_quote(k) for k in schema_keys(schema))))
+    return "CREATE TABLE IF NOT EXISTS {} ({})".format(
+        _quote(table), ', '.join(columns))
+
+
+def schema_records(schema: Schema, rows: list[dict]) -> list[tuple]:
+    """Rows as schema_columns tuples, rows without key tag or fields skipped."""
+    now = datetime.now(tz=timezone.utc)
+    key = next(iter(schema.tags))
+    records = []
+    for row in rows:
+        tags, fields, time = schema.map(row, now)
+        if fields and key in tags:
+            records.append((
+                time, *(tags.get(t) for t in schema.tags),
+                *(fields.get(f) for f in schema.fields)))
+    return records
+
+
+def merge_query(
+    table: str, stage: str, columns: list[str], keys: tuple[str, ...]
+) -> str:
+    """Upsert of the staged rows, the last staged row of a key wins."""
+    names = ', '.join(_quote(c) for c in columns)
+    if not keys:
+        return f"INSERT INTO {_quote(table)} ({names}) " \
+            f"SELECT {names} FROM {stage}"
+    key_names = ', '.join(_quote(k) for k in keys)
+    updates = [
+        f"{_quote(c)} = EXCLUDED.{_quote(c)}"
+        for c in columns if c not in keys]
+    return (
+        f"INSERT INTO {_quote(table)} ({names}) "
+        f"SELECT DISTINCT ON ({key_names}) {names} FROM {stage} "
+        f"ORDER BY {key_names}, _seq DESC "
+        f"ON CONFLICT ({key_names}) DO "
+        + (f"UPDATE SET {', '.join(updates)}" if updates else "NOTHING"))
+
+
+class PostgresSink(AsyncSink):
+    """
+    Upserts rows into the table of the same name. Rows of a table in
+    schemas are mapped by that schema, others are written by row keys and
+    merged on keys[table] (appended if the table has no keys).
+    """
+
+    def __init__(
+        self, dsn: str = None, *, schemas: dict[str, Schema] = None,
+        keys: dict[str, tuple] = None, min_size: int = 1, max_size: int = 4,
+        **options
+    ) -> None:
+        self.schemas = SCHEMAS if schemas is None else schemas
+        self.keys = {t: tuple(k) for t, k in (keys or {}).items()}
+        self._options = dict(
+            dsn=dsn, min_size=min_size, max_size=max_size, **options)
+        self._pool = None
+        self._lock = asyncio.Lock()
+        self._created: set[str] = set()
+
+    async def _connect(self):
+        async with self._lock:
+            if self._pool is None:
+                self._pool = await asyncpg.create_pool(**self._options)
+        return self._pool
+
+    async def _create(self, connection, table: str, schema: Schema) -> None:
+        if table in self._created:
+            return
+        await connection.execute(table_ddl(table, schema))
+        if await connection.fetchval(
+                "SELECT 1 FROM pg_extension WHERE extname = 'timescaledb'"):
+            await connection.execute(
+                "SELECT create_hypertable($1::regclass, 'time', "
+                "if_not_exists => TRUE, migrate_data => TRUE)",
+                _quote(table))
+        self._created.add(table)
+
+    async def _records(self, connection, table: str, rows: list[dict]):
+        """Columns, key columns and typed records of rows."""
+        columns = list(rows[0])
+        statement = await connection.prepare("SELECT {} FROM {} LIMIT 0".format(
+            ', '.join(_quote(c) for c in columns), _quote(table)))
+        converters = [
+            CONVERTERS.get(attribute.type.name, lambda v: v)
+            for attribute in statement.get_attributes()]
+        records = [
+            tuple(_convert(f, row.get(c)) for f, c in zip(converters, columns))
+            for row in rows]
+        return columns, self.keys.get(table, ()), records
+
+    async def write(self, table: str, rows: list[dict]) -> None:
+        if not rows:
+            return
+        pool = await self._connect()
+        async with pool.acquire() as connection:
+            schema = self.schemas.get(table)
+            if schema is not None:
+                await self._create(connection, table, schema)
+                columns = schema_columns(schema)
+                keys = schema_keys(schema)
+                records = schema_records(schema, rows)
+            else:
+                columns, keys, records = await self._records(
+                    connection, table, rows)
+            if records:
+                await self._merge(connection, table, columns, keys, records)
+
+    async def _merge(self, connection, table, columns, keys, records) -> None:
+        stage = _quote(f"{table}_stage")
+        names = ', '.join(_quote(c) for c in columns)
+        async with connection.transaction():
+            await connection.execute(
+                f"CREATE TEMPORARY TABLE {stage} ON COMMIT DROP AS "
+                f"SELECT {names} FROM {_quote(table)} WITH NO DATA")
+            await connection.execute(
+                f"ALTER TABLE {stage} ADD COLUMN _seq BIGSERIAL")
+            await connection.copy_records_to_table(
+                f"{table}_stage", records=records, columns=columns)
+            await connection.execute(
+                merge_query(table, stage, columns, keys))
+
+    async def close(self) -> None:
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            await pool.close()
@@ -0,0 +1,129 @@
+"""Change-only filtering of detail snapshots.
+
+Keeps the last seen record per device and drops records whose dataTimestamp
+did not advance since, optionally reducing the rest to the changed fields.
+
+For more information: https://github.com/hultenvp/soliscloud_api
+"""
+from __future__ import annotations
+
+import json
+import os
+from typing import Any, Iterable
+
+
+def _timestamp(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class SnapshotDiff:
+    """
+    Last seen state per device.
+
+    key is the record field identifying the device, timestamp the field
+    holding the upload time. With changed_only, emitted records hold the key,
+    the timestamp, the fields in keep and the fields that changed. When path
+    is given, state is loaded from and saved to that JSON file.
+    """
+
+    def __init__(
+        self, *,
+        key: str = 'id',
+        timestamp: str = 'dataTimestamp',
+        changed_only: bool = False,
+        keep: Iterable[str] = (),
+        path: str = None
+    ) -> None:
+        self.key = key
+        self.timestamp = timestamp
+        self.changed_only = changed_only
+        self.keep = tuple(keep)
+        self.path = path
+        self._state: dict[str, dict[str, Any]] = {}
+        self.skipped = 0
+        if path is not None and os.path.exists(path):
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self._state)
+
+    def last(self, device_id) -> dict[str, Any]:
+        """Last seen record of device, None if unknown."""
+        return self._state.get(str(device_id))
+
+    def _diff(self, previous: dict, record: dict) -> dict[str, Any]:
+        fixed = (self.key, self.timestamp) + self.keep
+        return {
+            k: v for k, v in record.items()
+            if k in fixed or previous.get(k) != v}
+
+    def _advanced(self, record: dict[str, Any]) -> bool:
+        previous = self._state.get(str(record.get(self.key)))
+        if previous is None:
+            return True
+        new_ts = _timestamp(record.get(self.timestamp))
+        old_ts = _timestamp(previous.get(self.timestamp))
+        return new_ts is None or old_ts is None or new_ts > old_ts
+
+    def _emit(self, record: dict[str, Any]) -> dict[str, Any]:
+        previous = self._state.get(str(record.get(self.key)))
+        if self.changed_only and previous is not None:
+            return self._diff(previous, record)
+        return record
+
+    def update(self, record: dict[str, Any]) -> dict[str, Any]:
+        """
+        Record, or its changed fields, if it is newer than the last seen
+        state of its device, None if it is stale.
+        """
+        if not self._advanced(record):
+            self.skipped += 1
+            return None
+        update = self._emit(record)
+        self._state[str(record.get(self.key))] = record
+        return update
+
+    def filter(self, records: Iterable[dict]) -> list[dict[str, Any]]:
+        """Records (or changes) that advanced, stale ones are dropped."""
+        result = []
+        for record in records:
+            update = self.update(record)
+            if update is not None:
+                result.append(update)
+        return result
+
+    def changes(self, records: Iterable[dict]) -> list[dict[str, Any]]:
+        """
+        Records (or changes) that advanced, like filter, but the state is
+        left as it is: commit the records once they are written, so a
+        failed write is retried on the next run.
+        """
+        result = []
+        for record in records:
+            if self._advanced(record):
+                result.append(self._emit(record))
+            else:
+                self.skipped += 1
+        return result
+
+    def commit(self, records: Iterable[dict]) -> None:
+        """Keep the records that advanced as last seen state."""
+        for record in records:
+            if self._advanced(record):
+                self._state[str(record.get(self.key))] = record
+
+    def load(self) -> None:
+        with open(self.path, 'r', encoding='utf-8') as file:
+            self._state = json.load(file)
+
+    def save(self) -> None:
+        """Atomically write state to path."""
+        if self.path is None:
+            return
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as file:
+            json.dump(self._state, file, separators=(",", ":"))
+        os.replace(tmp, self.path)
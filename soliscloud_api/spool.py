@@ -0,0 +1,148 @@
+"""Durable on-disk spool between fetch and sinks.
+
+Records that could not be written to a sink are appended to segment files
+(JSON lines) and replayed once the sink is back, so a sink outage does not
+cost an API re-fetch. Writes are fsynced in batches; a crash loses at most
+the records appended since the last sync.
+
+For more information: https://github.com/hultenvp/soliscloud_api
+"""
+from __future__ import annotations
+
+import inspect
+import json
+import os
+import time
+from typing import Any
+
+SEGMENT_PREFIX = 'segment-'
+SEGMENT_SUFFIX = '.jsonl'
+
+
+class Spool:
+    """
+    Append-only spool in directory.
+
+    The active segment is rotated when it exceeds segment_bytes. Appends are
+    fsynced after sync_records records or sync_interval seconds, whichever
+    comes first.
+    """
+
+    def __init__(
+        self, directory: str, *,
+        segment_bytes: int = 16 * 1024 * 1024,
+        sync_records: int = 100,
+        sync_interval: float = 1.0
+    ) -> None:
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.sync_records = sync_records
+        self.sync_interval = sync_interval
+        os.makedirs(directory, exist_ok=True)
+        self._file = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self.appended = 0
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def segments(self) -> list[str]:
+        """Segment file names, oldest first."""
+        return sorted(
+            n for n in os.listdir(self.directory)
+            if n.startswith(SEGMENT_PREFIX) and n.endswith(SEGMENT_SUFFIX))
+
+    def __bool__(self) -> bool:
+        """True if records are waiting for replay."""
+        return self._file is not None or any(
+            os.path.getsize(self._path(n)) > self._offset(n)
+            for n in self.segments())
+
+    def _open(self) -> None:
+        segments = self.segments()
+        sequence = int(segments[-1][len(SEGMENT_PREFIX):-len(
+            SEGMENT_SUFFIX)]) + 1 if segments else 0
+        name = f"{SEGMENT_PREFIX}{sequence:012d}{SEGMENT_SUFFIX}"
+        self._file = open(self._path(name), 'ab')
+
+    def append(self, record: Any) -> None:
+        if self._file is None:
+            self._open()
+        self._file.write(
+            json.dumps(record, separators=(",", ":")).encode('utf-8') + b"\n")
+        self.appended += 1
+        self._unsynced += 1
+        if self._unsynced >= self.sync_records or \
+                time.monotonic() - self._last_sync >= self.sync_interval:
+            self.sync()
+        if self._file.tell() >= self.segment_bytes:
+            self.rotate()
+
+    def sync(self) -> None:
+        """Flush and fsync the active segment."""
+        if self._file is not None and self._unsynced:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def rotate(self) -> None:
+        """Close the active segment, the next append starts a new one."""
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+    close = rotate
+
+    def _offset(self, name: str) -> int:
+        try:
+            with open(self._path(name + '.offset'), 'r') as file:
+                return int(file.read())
+        except (OSError, ValueError):
+            return 0
+
+    def _commit(self, name: str, offset: int) -> None:
+        tmp = self._path(name + '.offset.tmp')
+        with open(tmp, 'w') as file:
+            file.write(str(offset))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp, self._path(name + '.offset'))
+
+    def _remove(self, name: str) -> None:
+        for path in (self._path(name), self._path(name + '.offset')):
+            if os.path.exists(path):
+                os.remove(path)
+
+    async def _replay_segment(self, name: str, deliver, batch_size) -> int:
+        delivered = 0
+        offset = self._offset(name)
+        with open(self._path(name), 'rb') as file:
+            file.seek(offset)
+            while True:
+                lines = [file.readline() for _ in range(batch_size)]
+                lines = [line for line in lines if line.endswith(b"\n")]
+                if not lines:
+                    return delivered
+                result = deliver([json.loads(line) for line in lines])
+                if inspect.isawaitable(result):
+                    await result
+                offset += sum(len(line) for line in lines)
+                self._commit(name, offset)
+                delivered += len(lines)
+
+    async def replay(self, deliver, batch_size: int = 500) -> int:
+        """
+        Hand spooled records in batches to deliver (function or coroutine
+        function), oldest first. Delivered segments are removed. If deliver
+        raises, the exception propagates and the batch is kept for the next
+        replay. Returns the number of delivered records.
+        """
+        self.rotate()
+        delivered = 0
+        for name in self.segments():
+            delivered += await self._replay_segment(name, deliver, batch_size)
+            self._remove(name)
+        return delivered
@@ -0,0 +1,187 @@
+"""Incremental decoding of paged API responses.
+
+RecordStream is fed the response body in chunks and returns every record of
+the (page.)records array as soon as its closing brace has arrived. Only the
+record being decoded is buffered, so peak memory is about one record instead
+of the whole page. Everything outside the records array (code, msg, total,
+...) is kept and decoded by finish(); top level strings such as code and msg
+are available in head as soon as they are decoded.
+
+With fields, only the values of those top level keys of a record are
+decoded; the other values are skipped by the scanner and never parsed.
+
+For more information: https://github.com/hultenvp/soliscloud_api
+"""
+from __future__ import annotations
+
+import json
+import re
+from typing import Any, Iterable
+
+# Structural characters, everything else is skipped by the scanner
+_STRUCTURE = re.compile(rb'[\[\]{}",:]')
+
+CHUNK_SIZE = 64 * 1024
+
+
+class RecordStream:
+    """
+    Incremental decoder of the first array under key in a JSON body,
+    records keep only fields if given.
+    """
+
+    def __init__(
+        self, key: str = 'records', fields: Iterable[str] = None
+    ) -> None:
+        self._key = key.encode('utf-8')
+        self._fields = None if fields is None \
+            else {f.encode('utf-8') for f in fields}
+        # Decoded values of the record being scanned, with fields
+        self._values: dict[str, Any] = {}
+        self._value_key = None
+        self._value_start = None
+        self._buf = bytearray()
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._string_start = 0
+        self._candidate = None
+        self._current_key = None
+        self._records_depth = None
+        self._records_seen = False
+        self._element = None
+        self._envelope = bytearray()
+        self._envelope_from = 0
+        self.head: dict[str, str] = {}
+        self.count = 0
+
+    def feed(self, chunk: bytes) -> list[dict[str, Any]]:
+        """Add a chunk of the body, returns the records completed by it."""
+        self._buf += chunk
+        records: list[dict[str, Any]] = []
+        self._scan(records)
+        self._compact()
+        self.count += len(records)
+        return records
+
+    def finish(self) -> dict[str, Any]:
+        """Decode the body without its records, raises ValueError if invalid."""
+        if self._envelope_from is not None:
+            self._envelope += self._buf[self._envelope_from:]
+        return json.loads(bytes(self._envelope))
+
+    def _close_string(self, end: int) -> bool:
+        # A quote preceded by an odd number of backslashes is escaped
+        backslashes = 0
+        while end - backslashes - 1 >= self._string_start \
+                and self._buf[end - backslashes - 1] == 0x5c:
+            backslashes += 1
+        if backslashes % 2:
+            return False
+        self._in_string = False
+        self._candidate = bytes(self._buf[self._string_start:end])
+        if self._depth == 1 and self._current_key is not None:
+            self.head[self._current_key.decode('utf-8')] = \
+                json.loads(b'"' + self._candidate + b'"')
+        return True
+
+    def _scan(self, records: list) -> None:
+        buf = self._buf
+        while True:
+            if self._in_string:
+                end = buf.find(b'"', self._pos)
+                if end < 0:
+                    self._pos = len(buf)
+                    return
+                self._pos = end + 1
+                self._close_string(end)
+                continue
+            match = _STRUCTURE.search(buf, self._pos)
+            if match is None:
+                self._pos = len(buf)
+                return
+            index = match.start()
+            self._pos = index + 1
+            self._token(buf[index], index, records)
+
+    def _token(self, char: int, index: int, records: list) -> None:
+        if char == 0x22:  # "
+            self._in_string = True
+            self._string_start = index + 1
+        elif char == 0x3a:  # :
+            self._current_key, self._candidate = self._candidate, None
+            if self._in_record() and self._current_key in self._fields:
+                self._value_key = self._current_key
+                self._value_start = index + 1
+        elif char == 0x2c:  # ,
+            if self._in_record():
+                self._end_value(index)
+            self._current_key = None
+        elif char in (0x7b, 0x5b):  # { [
+            self._open(char, index)
+        else:  # } ]
+            self._close(char, index, records)
+
+    def _open(self, char: int, index: int) -> None:
+        self._depth += 1
+        if char == 0x5b and self._current_key == self._key \
+                and not self._records_seen:
+            self._records_depth = self._depth
+            self._records_seen = True
+            self._envelope += self._buf[self._envelope_from:index + 1]
+            self._envelope_from = None
+        elif char == 0x7b and self._records_depth is not None \
+                and self._depth == self._records_depth + 1:
+            self._element = index
+        self._current_key = None
+
+    def _in_record(self) -> bool:
+        # At the top level of a record, when projecting
+        return self._fields is not None and self._element is not None \
+            and self._depth == self._records_depth + 1
+
+    def _end_value(self, end: int) -> None:
+        if self._value_start is None:
+            return
+        self._values[self._value_key.decode('utf-8')] = json.loads(
+            bytes(self._buf[self._value_start:end]))
+        self._value_start = None
+
+    def _record(self, end: int) -> dict[str, Any]:
+        if self._fields is None:
+            return json.loads(bytes(self._buf[self._element:end + 1]))
+        self._end_value(end)
+        record, self._values = self._values, {}
+        return record
+
+    def _close(self, char: int, index: int, records: list) -> None:
+        if char == 0x7d and self._element is not None \
+                and self._depth == self._records_depth + 1:
+            records.append(self._record(index))
+            self._element = None
+        elif char == 0x5d and self._depth == self._records_depth:
+            self._records_depth = None
+            self._envelope_from = index
+        self._depth -= 1
+
+    def _compact(self) -> None:
+        """Drop consumed bytes, keeping an open string or record."""
+        if self._envelope_from is not None:
+            self._envelope += self._buf[self._envelope_from:self._pos]
+            self._envelope_from = self._pos
+        keep = self._pos
+        if self._in_string:
+            keep = min(keep, self._string_start)
+        if self._element is not None:
+            keep = min(keep, self._element)
+        if keep == 0:
+            return
+        del self._buf[:keep]
+        self._pos -= keep
+        self._string_start -= keep
+        if self._element is not None:
+            self._element -= keep
+        if self._value_start is not None:
+            self._value_start -= keep
+        if self._envelope_from is not None:
+            self._envelope_from -= keep
@@ -0,0 +1,197 @@
+"""Request timeouts for the Soliscloud API client.
+
+Each endpoint can have its own connect, read and total timeout. In adaptive
+mode the total timeout of an endpoint follows its observed latency: once
+enough successful requests have been seen it becomes a percentile of the
+recent latencies times a factor, never above the configured timeout.
+
+For more information: https://github.com/hultenvp/soliscloud_api
+"""
+from __future__ import annotations
+
+import math
+import threading
+from collections import deque
+from typing import Any
+
+from aiohttp import ClientTimeout
+
+# Seconds to wait for the response headers or the next chunk of a body
+TOTAL = 10.0
+
+
+class Timeout:
+    """
+    Timeouts of one request in seconds. connect bounds setting up the
+    connection, read each wait for data and total the whole request
+    (up to the response headers for streamed responses).
+    None for connect or read means only total applies.
+    """
+
+    def __init__(
+        self, total: float = TOTAL, connect: float = None, read: float = None
+    ) -> None:
+        for name, value in (('total', total), ('connect', connect),
+                            ('read', read)):
+            if value is not None and value <= 0:
+                raise ValueError(f"{name} timeout must be positive")
+        self.total = total
+        self.connect = connect
+        self.read = read
+
+    def __repr__(self) -> str:
+        return (f"Timeout(total={self.total}, connect={self.connect}, "
+                f"read={self.read})")
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Timeout) and (
+            self.total, self.connect, self.read) == (
+                other.total, other.connect, other.read)
+
+    @property
+    def chunk(self) -> float:
+        """Seconds to wait for the next chunk of a streamed body."""
+        return self.total if self.read is None else self.read
+
+    def client_timeout(self) -> ClientTimeout:
+        """aiohttp timeout for connect and read, total is enforced around."""
+        return ClientTimeout(
+            total=None, sock_connect=self.connect, sock_read=self.read)
+
+    @staticmethod
+    def from_config(config: dict[str, Any], base: Timeout = None) -> Timeout:
+        base = base or Timeout()
+        return Timeout(
+            config.get('total', base.total),
+            config.get('connect', base.connect),
+            config.get('read', base.read))
+
+
+class Timeouts:
+    """
+    Timeouts per endpoint, e.g.
+    Timeouts(Timeout(10, connect=3), {INVERTER_DAY: Timeout(30)}).
+    Endpoints are resource paths such as '/v1/api/inverterDay'.
+
+    With adaptive=True the total timeout of an endpoint becomes the
+    percentile of its last window latencies times factor, at least minimum
+    and at most the configured total, once min_samples are available.
+    A timed out request counts as a sample of its timeout and doubles the
+    endpoint's timeout until requests succeed again, so a lasting rise in
+    latency raises the timeout instead of failing every request.
+    """
+
+    def __init__(
+        self, default: Timeout = None, endpoints: dict[str, Timeout] = None,
+        *,
+        adaptive: bool = False,
+        percentile: float = 99,
+        factor: float = 3.0,
+        minimum: float = 1.0,
+        window: int = 200,
+        min_samples: int = 20
+    ) -> None:
+        if not 0 < percentile <= 100:
+            raise ValueError("percentile must be in (0, 100]")
+        if factor <= 0 or minimum <= 0:
+            raise ValueError("factor and minimum must be positive")
+        if min_samples < 1 or window < min_samples:
+            raise ValueError("window must hold at least min_samples >= 1")
+        self.default = default or Timeout()
+        self.endpoints = dict(endpoints or {})
+        self.adaptive = adaptive
+        self.percentile = percentile
+        self.factor = factor
+        self.minimum = minimum
+        self.window = window
+        self.min_samples = min_samples
+        self._latencies: dict[str, deque] = {}
+        self._backoff: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def configured(self, endpoint: str) -> Timeout:
+        """Timeout set for endpoint, or the default."""
+        return self.endpoints.get(endpoint, self.default)
+
+    def get(self, endpoint: str) -> Timeout:
+        """Timeout to use for the next request to endpoint."""
+        timeout = self.configured(endpoint)
+        if not self.adaptive:
+            return timeout
+        latency = self.latency(endpoint)
+        if latency is None:
+            return timeout
+        total = min(
+            max(latency * self.factor, self.minimum)
+            * self._backoff.get(endpoint, 1), timeout.total)
+        return Timeout(
+            total, timeout.connect,
+            None if timeout.read is None else min(timeout.read, total))
+
+    def observe(self, endpoint: str, seconds: float) -> None:
+        """Record the latency of a successful request."""
+        with self._lock:
+            backoff = self._backoff.pop(endpoint, 1)
+            if backoff > 2:
+                self._backoff[endpoint] = backoff / 2
+            self._append(endpoint, seconds)
+
+    def timed_out(self, endpoint: str, seconds: float) -> None:
+        """
+        Record a request that timed out after seconds, None (no timeout
+        set, e.g. on replay) is ignored.
+        """
+        if seconds is None:
+            return
+        with self._lock:
+            # Doubling beyond this cannot raise the timeout any further
+            limit = self.configured(endpoint).total / self.minimum
+            self._backoff[endpoint] = min(
+                self._backoff.get(endpoint, 1) * 2, max(limit, 1))
+            self._append(endpoint, seconds)
+
+    def _append(self, endpoint: str, seconds: float) -> None:
+        latencies = self._latencies.get(endpoint)
+        if latencies is None:
+            latencies = self._latencies[endpoint] = deque(
+                maxlen=self.window)
+        latencies.append(seconds)
+
+    def latency(self, endpoint: str) -> float | None:
+        """
+        Latency percentile of endpoint in seconds, None while fewer than
+        min_samples requests have been observed.
+        """
+        with self._lock:
+            latencies = sorted(self._latencies.get(endpoint, ()))
+        if len(latencies) < self.min_samples:
+            return None
+        rank = math.ceil(self.percentile / 100 * len(latencies))
+        return latencies[max(rank, 1) - 1]
+
+    @staticmethod
+    def from_config(config: dict[str, Any]) -> Timeouts:
+        """
+        Timeouts from the "timeouts" section of config.json, e.g.
+
+            "timeouts": {
+                "total": 10, "connect": 3,
+                "endpoints": {"inverterDay": {"total": 30}},
+                "adaptive": true, "factor": 3
+            }
+
+        Endpoint names without a leading / are taken relative to /v1/api/.
+        """
+        from soliscloud_api import RESOURCE_PREFIX
+
+        default = Timeout.from_config(config)
+        endpoints = {
+            (name if name.startswith('/') else RESOURCE_PREFIX + name):
+                Timeout.from_config(options, default)
+            for name, options in config.get('endpoints', {}).items()}
+        options = {
+            key: config[key] for key in (
+                'adaptive', 'percentile', 'factor', 'minimum', 'window',
+                'min_samples')
+            if key in config}
+        return Timeouts(default, endpoints, **options)
@@ -0,0 +1,223 @@
+"""Optional OpenTelemetry-style tracing.
+
+Spans nest through a context variable, so a span opened in a job becomes the
+parent of the spans opened by SoliscloudAPI during that job. Finished spans
+are exported as OTLP/JSON, to a local collector or to a JSONL file. Up to
+max_spans finished spans are kept until flush(), older ones are dropped, so
+a long-running process that never flushes does not grow without bound.
+
+For more information: https://github.com/hultenvp/soliscloud_api
+"""
+from __future__ import annotations
+
+import contextvars
+import json
+import os
+import time
+import urllib.request
+from collections import deque
+from contextlib import contextmanager
+from typing import Any
+
+_CURRENT: contextvars.ContextVar = contextvars.ContextVar(
+    'soliscloud_span', default=None)
+
+# OTLP status codes
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+
+def _attribute(key: str, value: Any) -> dict[str, Any]:
+    if isinstance(value, bool):
+        return {'key': key, 'value': {'boolValue': value}}
+    if isinstance(value, int):
+        return {'key': key, 'value': {'intValue': str(value)}}
+    if isinstance(value, float):
+        return {'key': key, 'value': {'doubleValue': value}}
+    return {'key': key, 'value': {'stringValue': str(value)}}
+
+
+class Span:
+    """A timed operation, part of a trace."""
+
+    def __init__(
+        self, name: str, parent: Span = None, attributes: dict = None
+    ) -> None:
+        self.name = name
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.error = None
+
+    @property
+    def duration(self) -> float:
+        """Duration in seconds, None while the span is open."""
+        if self.end_ns is None:
+            return None
+        return (self.end_ns - self.start_ns) / 1e9
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def to_otlp(self) -> dict[str, Any]:
+        span = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': 1,
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns),
+            'attributes': [
+                _attribute(k, v) for k, v in self.attributes.items()],
+            'status': {'code': STATUS_OK},
+        }
+        if self.parent_id is not None:
+            span['parentSpanId'] = self.parent_id
+        if self.error is not None:
+            span['status'] = {'code': STATUS_ERROR, 'message': self.error}
+        return span
+
+
+class JsonFileExporter:
+    """Appends one OTLP/JSON payload per export to a JSONL file."""
+
+    def __init__(self, path: str) -> None:
+        self._path = path
+
+    def export(self, payload: dict[str, Any]) -> None:
+        with open(self._path, 'a', encoding='utf-8') as file:
+            file.write(json.dumps(payload, separators=(",", ":")) + "\n")
+
+
+class OtlpHttpExporter:
+    """Posts OTLP/JSON payloads to a collector, e.g. a local otelcol."""
+
+    def __init__(
+        self, endpoint: str = 'http://localhost:4318/v1/traces',
+        timeout: float = 5.0
+    ) -> None:
+        self._endpoint = endpoint
+        self._timeout = timeout
+
+    def export(self, payload: dict[str, Any]) -> None:
+        request = urllib.request.Request(
+            self._endpoint,
+            data=json.dumps(payload).encode('utf-8'),
+            headers={'Content-Type': 'application/json'},
+            method='POST')
+        with urllib.request.urlopen(request, timeout=self._timeout):
+            pass
+
+
+# Finished spans kept until flush()
+MAX_SPANS = 10000
+
+
+class Tracer:
+    """Creates spans and hands finished ones to the exporter on flush()."""
+
+    def __init__(
+        self, exporter=None, service_name: str = 'soliscloud',
+        max_spans: int = MAX_SPANS
+    ) -> None:
+        self._exporter = exporter
+        self._service_name = service_name
+        self.finished: deque[Span] = deque(maxlen=max_spans)
+        # Finished spans dropped unexported since the last flush()
+        self.dropped = 0
+
+    @staticmethod
+    def current() -> Span:
+        return _CURRENT.get()
+
+    def start_span(self, name: str, parent: Span = None, **attributes):
+        """Start a span without making it current, end with end_span()."""
+        return Span(name, parent or _CURRENT.get(), attributes)
+
+    def end_span(self, span: Span, error: BaseException = None) -> None:
+        span.end_ns = time.time_ns()
+        if error is not None:
+            span.error = f"{type(error).__name__}: {error}"
+        if len(self.finished) == self.finished.maxlen:
+            self.dropped += 1
+        self.finished.append(span)
+
+    @contextmanager
+    def activate(self, span: Span):
+        """
+        Make span the parent of the spans opened in the with-block, without
+        ending it. Keeps a span that outlives a yield from leaking into the
+        context of the consumer.
+        """
+        token = _CURRENT.set(span)
+        try:
+            yield span
+        finally:
+            _CURRENT.reset(token)
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """Open a nested span for the duration of the with-block."""
+        span = self.start_span(name, **attributes)
+        with self.activate(span):
+            try:
+                yield span
+            except BaseException as err:
+                self.end_span(span, err)
+                raise
+            else:
+                self.end_span(span)
+
+    def flush(self) -> None:
+        """Export and forget all finished spans."""
+        spans = list(self.finished)
+        self.finished.clear()
+        self.dropped = 0
+        if self._exporter is None or not spans:
+            return
+        self._exporter.export({'resourceSpans': [{
+            'resource': {'attributes': [
+                _attribute('service.name', self._service_name)]},
+            'scopeSpans': [{
+                'scope': {'name': 'soliscloud_api'},
+                'spans': [s.to_otlp() for s in spans]}]}]})
+
+    def trace_config(self):
+        """
+        aiohttp TraceConfig adding DNS, connection and request spans,
+        pass it to ClientSession(trace_configs=[...]).
+        """
+        from aiohttp import TraceConfig
+
+        config = TraceConfig()
+
+        def starter(name):
+            async def on_start(session, ctx, params):
+                setattr(ctx, name, self.start_span(name))
+            return on_start
+
+        def ender(name):
+            async def on_end(session, ctx, params):
+                span = getattr(ctx, name, None)
+                if span is not None:
+                    self.end_span(span)
+            return on_end
+
+        config.on_dns_resolvehost_start.append(starter('dns'))
+        config.on_dns_resolvehost_end.append(ender('dns'))
+        config.on_connection_create_start.append(starter('connect'))
+        config.on_connection_create_end.append(ender('connect'))
+        config.on_connection_queued_start.append(starter('pool_wait'))
+        config.on_connection_queued_end.append(ender('pool_wait'))
+        config.on_request_start.append(starter('http'))
+        config.on_request_end.append(ender('http'))
+
+        async def on_exception(session, ctx, params):
+            span = getattr(ctx, 'http', None)
+            if span is not None:
+                self.end_span(span, params.exception)
+        config.on_request_exception.append(on_exception)
+        return config
@@ -0,0 +1,182 @@
+"""Pluggable transports for the Soliscloud API client.
+
+A transport performs the actual HTTP POST for SoliscloudAPI. Besides the
+default aiohttp transport, traffic can be recorded to gzip compressed JSONL
+and replayed deterministically afterwards, without touching the API.
+
+For more information: https://github.com/hultenvp/soliscloud_api
+"""
+from __future__ import annotations
+
+import asyncio
+import gzip
+import json
+import os
+import time
+import zlib
+from collections import defaultdict, deque
+from typing import Any
+from urllib.parse import urlsplit
+
+from soliscloud_api import SoliscloudAPI
+
+
+class Transport:
+    """Base class, performs one POST and returns an aiohttp-like response."""
+
+    # Responses come from a trace: SoliscloudAPI skips rate limiting and
+    # timeouts for these
+    replay = False
+
+    async def post(
+        self,
+        session,
+        url: str,
+        params: dict[str, Any],
+        header: dict[str, Any]
+    ):
+        raise NotImplementedError
+
+    def close(self) -> None:
+        return
+
+
+class AiohttpTransport(Transport):
+    """Default transport, posts using the aiohttp session."""
+
+    async def post(self, session, url, params, header):
+        return await SoliscloudAPI._do_post_aiohttp(
+            session, url, params, header)
+
+
+class RecordedResponse():
+    """Response rebuilt from a decoded body, mimics aiohttp.ClientResponse."""
+
+    def __init__(
+        self, status: int, body: Any, content_length: int = None
+    ) -> None:
+        self._status = status
+        self._body = body
+        if content_length is None:
+            content_length = len(json.dumps(
+                body, separators=(",", ":")).encode('utf-8'))
+        self._content_length = content_length
+
+    @property
+    def status(self) -> int:
+        return self._status
+
+    @property
+    def content_length(self) -> int:
+        return self._content_length
+
+    async def json(self):
+        return self._body
+
+    async def release(self):
+        return
+
+
+def _resource(url: str) -> str:
+    return urlsplit(url).path
+
+
+def _key(resource: str, params: dict[str, Any]) -> tuple[str, str]:
+    return resource, json.dumps(params, sort_keys=True, separators=(",", ":"))
+
+
+def _cut_short(path: str) -> bool:
+    """Whether the trace at path lacks the end of its last gzip member."""
+    try:
+        with gzip.open(path, 'rb') as file:
+            while file.read(1024 * 1024):
+                pass
+    except EOFError:
+        return True
+    return False
+
+
+class RecordingTransport(Transport):
+    """
+    Wraps another transport and appends every exchange to a trace file.
+
+    Each line holds resource, params, status, response, content_length and
+    latency (s). The compressor is flushed after every exchange, so a trace
+    holds all completed exchanges even if the process dies before close().
+    Such a trace is moved aside to path.<time>.partial when recording to it
+    again, as appending to it would make the new exchanges unreadable.
+    """
+
+    def __init__(self, path: str, transport: Transport = None) -> None:
+        self._transport = transport or AiohttpTransport()
+        if os.path.exists(path) and _cut_short(path):
+            os.replace(path, f"{path}.{int(time.time())}.partial")
+        self._file = gzip.open(path, 'ab')
+
+    async def post(self, session, url, params, header):
+        start = time.monotonic()
+        resp = await self._transport.post(session, url, params, header)
+        body = await resp.json()
+        latency = time.monotonic() - start
+        content_length = getattr(resp, 'content_length', None)
+        entry = {
+            'resource': _resource(url),
+            'params': params,
+            'status': resp.status,
+            'response': body,
+            'content_length': content_length,
+            'latency': round(latency, 6),
+        }
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        self._file.write(line.encode('utf-8'))
+        self._file.flush(zlib.Z_SYNC_FLUSH)
+        return RecordedResponse(resp.status, body, content_length)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class ReplayTransport(Transport):
+    """
+    Serves responses from a trace written by RecordingTransport.
+
+    Identical requests are answered in recorded order. With speed set, each
+    response is delayed by its recorded latency divided by speed, otherwise
+    responses return immediately. Replayed requests are not held back by
+    the API rate limit. A trace cut short (the recording process died) is
+    read up to its last flushed exchange.
+    """
+
+    replay = True
+
+    def __init__(self, path: str, speed: float = None) -> None:
+        if speed is not None and speed <= 0:
+            raise ValueError("speed must be > 0")
+        self._speed = speed
+        self._entries: dict[tuple[str, str], deque] = defaultdict(deque)
+        with gzip.open(path, 'rt', encoding='utf-8') as file:
+            try:
+                for line in file:
+                    self._add(line)
+            except EOFError:
+                pass
+
+    def _add(self, line: str) -> None:
+        if not line.strip():
+            return
+        entry = json.loads(line)
+        self._entries[_key(entry['resource'], entry['params'])].append(entry)
+
+    def __len__(self) -> int:
+        return sum(len(queue) for queue in self._entries.values())
+
+    async def post(self, session, url, params, header):
+        queue = self._entries.get(_key(_resource(url), params))
+        if not queue:
+            raise SoliscloudAPI.SolisCloudError(
+                f"No recorded response for {_resource(url)} {params}")
+        entry = queue.popleft()
+        if self._speed is not None:
+            await asyncio.sleep(entry['latency'] / self._speed)
+        return RecordedResponse(
+            entry['status'], entry['response'], entry.get('content_length'))
@@ -0,0 +1,29 @@
+"""Unit scaling of API values.
+
+Energy and power values come with the unit in a sibling key, e.g. eToday
+and eTodayStr ('kWh', 'MWh', ...).
+
+For more information: https://github.com/hultenvp/soliscloud_api
+"""
+from __future__ import annotations
+
+from typing import Any
+
+# Multipliers to W (power) and kWh (energy)
+UNITS = {
+    'W': 1.0, 'kW': 1e3, 'MW': 1e6,
+    'Wh': 1e-3, 'kWh': 1.0, 'MWh': 1e3, 'GWh': 1e6,
+}
+
+
+def scaled(record: dict[str, Any], key: str, unit: str = None) -> float:
+    """
+    record[key] in unit (W or kWh if None) using the unit in
+    record[key + 'Str'], None if absent or not a number.
+    """
+    try:
+        number = float(record[key])
+    except (KeyError, TypeError, ValueError):
+        return None
+    scale = UNITS.get(record.get(key + 'Str'), 1.0)
+    return number * scale / UNITS[unit] if unit else number * scale
@@ -3,10 +3,14 @@ import json
 import requests
 import configcentral
 from aiohttp import ClientSession
-from soliscloud_api import SoliscloudAPI
-from influxdb_client import InfluxDBClient, Point, WritePrecision
+from soliscloud_api import SoliscloudAPI, STATION_DETAIL_LIST
+from soliscloud_api.accounts import account_path
+from soliscloud_api.energy import EnergyState, collect
+from soliscloud_api.registry import DeviceRegistry
+from soliscloud_api.schema import STATION_DAY_ENERGY, STATION_DETAIL
+from soliscloud_api.snapshot import SnapshotDiff
+from influxdb_client import InfluxDBClient
 from influxdb_client.client.write_api import SYNCHRONOUS
-from datetime import datetime
 
 
 
@@ -41,117 +45,116 @@ def send_telegram_message(message):
     except Exception as e:
         print(f"🚨 Telegram Error: {e}")
 
-# Function to Insert Data into InfluxDB
+# Function to Insert Data into InfluxDB, stamped with the station's dataTimestamp (not the time of the run).
+# Returns whether the data was written
 def insert_station_data(station_data):
     try:
-        point = Point("station_detail_list") \
-            .tag("station_id", station_data.get("id")) \
-            .tag("stationName", station_data.get("stationName")) \
-            .tag("orgCode", station_data.get("orgCode")) \
-            .tag("createDateStr",station_data.get("createDateStr")) \
-            .tag("fisPowerTimeStr",station_data.get("fisPowerTimeStr")) \
-            .tag("dataTimestamp",station_data.get("dataTimestamp")) \
-            .tag("createDateStr",station_data.get("createDateStr")) \
-            .tag("picUrl",station_data.get("picUrl")) \
-            .field("DailyPowerGen", float(station_data.get("dayEnergy", 0))) \
-            .field("monthCarbonDioxide", float(station_data.get("mountCarbonDioxide", 0))) \
-            .field("MonthlyPowerGen", float(station_data.get("monthEnergy", 0))) \
-            .field("YearlyPowerGen", float(station_data.get("yearEnergy", 0))) \
-            .field("TotalPowerGen", float(station_data.get("allEnergy", 0))) \
-            .field("FullPowerHours", float(station_data.get("fullHour", 0))) \
-            .field("installerEmail", station_data.get("installerEmail")) \
-            .field("region", station_data.get("regionStr")) \
-            .field("city", station_data.get("cityStr")) \
-            .field("installerMobile", station_data.get("installerMobile")) \
-            .field("capacity", float(station_data.get("capacity"))) \
-            .field("country", station_data.get("countryStr")) \
-            .field("county", station_data.get("countyStr")) \
-            .field("state", int(station_data.get("state"))) \
-            .field("power", float(station_data.get("power"))) \
-            .field("dayIncome",station_data.get("dayIncome")) \
-            .field("monthInCome",station_data.get("monthInCome")) \
-            .field("yearInCome",station_data.get("yearInCome")) \
-            .field("allInCome",station_data.get("allInCome")) \
-            .field("createDateStr",station_data.get("createDateStr")) \
-            .field("homeLoadEnergy",station_data.get("homeLoadEnergy")) \
-            .field("homeLoadMonthEnergy",station_data.get("homeLoadMonthEnergy")) \
-            .field("homeLoadMonthEnergy",station_data.get("homeLoadMonthEnergy")) \
-            .field("weather",station_data.get("weather")) \
-            .field("sr",station_data.get("sr")) \
-            .field("ss",station_data.get("ss")) \
-            .field("weatherType",station_data.get("weatherType")) \
-            .field("weatherUpdateDateStr",station_data.get("weatherUpdateDateStr")) \
-            .field("condTxtD",station_data.get("condTxtD")) \
-            .field("condTxtN",station_data.get("condTxtN")) \
-            
-            
+        point = STATION_DETAIL.point(station_data)
+
         # Write to InfluxDB
         write_api.write(bucket=bucket, record=point)
         print(f"✅ Data inserted for Station ID: {station_data.get('id')}")
+        return True
     except Exception as e:
         print(f"❌ Error inserting data: {e}")
+        return False
 
-async def fetch_all_station(api_key, api_secret):
-    async with ClientSession() as websession:
-        try:
+# Function to Write the Day Energy of all Stations (station_day_energy_list, 100 stations per call)
+# for each day since the previous run; a day is only marked done once it is written
+async def fetch_station_energy(api_key, api_secret, soliscloud):
+    state = EnergyState(account_path("station_energy_state.json", api_key))
+    try:
+        async for period, rows in collect(soliscloud, api_key, api_secret, "day", state):
+            write_api.write(bucket=bucket, record=STATION_DAY_ENERGY.points(rows))
+            print(f"✅ Station Energy inserted for {period}: {len(rows)} Stations")
+    except Exception as e:
+        print(f"❌ Error fetching station energy: {e}")
+        send_telegram_message(f"❌ Error fetching station energy: {e}")
+    finally:
+        state.save()
+
+async def fetch_all_station(api_key, api_secret, soliscloud=None):
+    if soliscloud is None:
+        async with ClientSession() as websession:
             soliscloud = SoliscloudAPI('https://soliscloud.com:13333', websession)
-            page_no = 1
-            total_inverters = 0
-            max_retries = 10
+            return await fetch_all_station(api_key, api_secret, soliscloud)
 
-            while True:
-                retries = 0
-                success = False
+    # Last seen station state of this account, records without a newer dataTimestamp are not written
+    snapshots = SnapshotDiff(path=account_path("station_detail_snapshot.json", api_key))
 
-                while retries < max_retries:
-                    try:
-                        await asyncio.sleep(0.5)  # Limit requests to 2 per second
+    # All stations of this account, kept in the device registry for their sunrise/sunset (sr/ss)
+    stations = []
 
-                        station_list = await soliscloud.station_detail_list(api_key, api_secret, page_no=page_no, page_size=100)
+    try:
+        page_no = 1
+        total_inverters = 0
+        max_retries = 10
 
-                        if not station_list:
-                            success = True
-                            break
+        while True:
+            retries = 0
+            success = False
 
-                        total_inverters += len(station_list)
+            while retries < max_retries:
+                try:
+                    await asyncio.sleep(0.5)  # Limit requests to 2 per second
 
-                        for record in station_list:
-                            #print("Station:",record)
-                            print("✅ Record Fetched")
-                            print(json.dumps(record, indent=2))
-                            insert_station_data(record)
+                    station_list = await soliscloud.station_detail_list(api_key, api_secret, page_no=page_no, page_size=100)
 
-                        page_no += 1
-                        retries = 0  # Reset retries after success
+                    if not station_list:
                         success = True
+                        break
+
+                    total_inverters += len(station_list)
+                    stations.extend(station_list)
+
+                    # A station's state is kept only once its record is written, so a failed write is retried next run
+                    for record in snapshots.changes(station_list):
+                        #print("Station:",record)
+                        print("✅ Record Fetched")
+                        print(json.dumps(record, indent=2))
+                        if insert_station_data(record):
+                            snapshots.commit([record])
+
+                    page_no += 1
+                    retries = 0  # Reset retries after success
+                    success = True
+
+                    if len(station_list) < 100:
+                        break
+
+                except (asyncio.TimeoutError, SoliscloudAPI.SolisCloudError) as e:
+                    retries += 1
+                    soliscloud.observe_retry(STATION_DETAIL_LIST)
+                    print(f"⚠️ Retry {retries}/{max_retries} due to: {e}")
+                    send_telegram_message(f"⚠️ Retry {retries}/{max_retries} due to: {e} : Function Fetch All Station Detail List")
+                    await asyncio.sleep(5)  # Optional delay between retries
+
+                except Exception as e:
+                    print(f"❌ Unexpected Error: {e}")
+                    send_telegram_message(f"❌ Unexpected Error: {e}")
+                    return
+
+            if not success:
+                print("❌ Max retries reached. Stopping API requests.")
+                send_telegram_message("❌ Max retries reached. Stopping API requests.")
+                break
+
+            if len(station_list) < 100:
+                break
+
+        snapshots.save()
+        if success:
+            # The inverter detail job throttles each inverter by its station's daylight window from here
+            registry = DeviceRegistry(account_path("device_registry.json", api_key))
+            registry.store(api_key, "station", stations)
+            registry.save()
+            await fetch_station_energy(api_key, api_secret, soliscloud)
+        print(f"\n🎯 Total Inverters Fetched: {total_inverters}")
+        print(f"⏭️ Unchanged Records Skipped: {snapshots.skipped}")
 
-                        if len(station_list) < 100:
-                            break
-
-                    except (asyncio.TimeoutError, SoliscloudAPI.SolisCloudError) as e:
-                        retries += 1
-                        print(f"⚠️ Retry {retries}/{max_retries} due to: {e}")
-                        send_telegram_message(f"⚠️ Retry {retries}/{max_retries} due to: {e} : Function Fetch All Station Detail List")
-                        await asyncio.sleep(5)  # Optional delay between retries
-
-                    except Exception as e:
-                        print(f"❌ Unexpected Error: {e}")
-                        send_telegram_message(f"❌ Unexpected Error: {e}")
-                        return
-
-                if not success:
-                    print("❌ Max retries reached. Stopping API requests.")
-                    send_telegram_message("❌ Max retries reached. Stopping API requests.")
-                    break
-
-                if len(station_list) < 100:
-                    break
-
-            print(f"\n🎯 Total Inverters Fetched: {total_inverters}")
-
-        except Exception as e:
-            print(f"🚨 General Error: {e}")
-            send_telegram_message(f"🚨 General Error: {e}")
+    except Exception as e:
+        print(f"🚨 General Error: {e}")
+        send_telegram_message(f"🚨 General Error: {e}")
 
 
 
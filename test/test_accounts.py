@@ -0,0 +1,73 @@
+import pytest
+from soliscloud_api.accounts import (
+    Account, Orchestrator, load_accounts, shard)
+
+CONFIG = {
+    'accounts': [
+        {'name': 'a', 'key': 'key_a', 'secret': 'secret_a'},
+        {'name': 'b', 'key': 'key_b', 'secret': 'secret_b', 'rate_limit': 5},
+        {'name': 'c', 'key': 'key_c', 'secret': 'secret_c'},
+    ]
+}
+
+
+async def job(key_id, secret, soliscloud):
+    if key_id == 'key_b':
+        raise RuntimeError('account b is broken')
+    return key_id, secret
+
+
+def test_load_accounts():
+    accounts = load_accounts(CONFIG)
+    assert [a.name for a in accounts] == ['a', 'b', 'c']
+    assert accounts[0].secret == b'secret_a'
+    assert accounts[1].rate_limit == 5
+
+    legacy = load_accounts({'key': 'k', 'secret': 's', 'nmi': 'x'})
+    assert len(legacy) == 1
+    assert legacy[0].name == 'default'
+    assert legacy[0].key_id == 'k'
+
+    with pytest.raises(ValueError):
+        load_accounts({'accounts': [CONFIG['accounts'][0]] * 2})
+
+
+def test_rate_limit():
+    account = {'key': 'k', 'secret': 's'}
+    assert load_accounts(dict(account, rate_limit=3.0))[0].rate_limit == 3
+    for rate_limit in (2.5, 0, '2', True):
+        with pytest.raises(ValueError, match='rate_limit of account default'):
+            load_accounts(dict(account, rate_limit=rate_limit))
+
+
+def test_shard():
+    assert shard([1, 2, 3, 4, 5], 2) == [[1, 3, 5], [2, 4]]
+    assert shard([1], 3) == [[1]]
+
+
+@pytest.mark.asyncio
+async def test_orchestrator():
+    orchestrator = Orchestrator(load_accounts(CONFIG), session=1)
+    results = await orchestrator.run(job)
+    assert results['a'] == ('key_a', b'secret_a')
+    assert results['c'] == ('key_c', b'secret_c')
+    assert isinstance(results['b'], RuntimeError)
+
+    # Instances are kept between runs, each with its own rate limiter
+    api_a = orchestrator.api(orchestrator.accounts[0])
+    api_b = orchestrator.api(orchestrator.accounts[1])
+    assert orchestrator.api(orchestrator.accounts[0]) is api_a
+    assert api_a._throttler is not api_b._throttler
+
+
+def test_run_sharded():
+    orchestrator = Orchestrator(load_accounts(CONFIG))
+    results = orchestrator.run_sharded('test.test_accounts:job', 2)
+    assert results['a'] == ('key_a', b'secret_a')
+    assert 'account b is broken' in results['b']
+    assert set(results) == {'a', 'b', 'c'}
+
+
+def test_account_roundtrip():
+    account = Account('x', 'k', b's', rate_limit=1)
+    assert Account.from_config(account.to_config()).rate_limit == 1
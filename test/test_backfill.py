@@ -0,0 +1,73 @@
+import pytest
+from datetime import date
+from soliscloud_api.backfill import (
+    BackfillPlanner, NegativeCache, day_range, first_power_date, month_range,
+    parse_date, period_end, station_first_power_dates)
+from .const import KEY, SECRET
+
+
+@pytest.fixture
+def planner(mocker):
+    mocker.patch.object(
+        BackfillPlanner, '_today', return_value=date(2024, 3, 2))
+    return BackfillPlanner()
+
+
+def test_parse_date():
+    assert parse_date('2024-02-03 10:11:12') == date(2024, 2, 3)
+    assert parse_date('2024-02-03') == date(2024, 2, 3)
+    assert parse_date(None) is None
+    assert parse_date('garbage') is None
+    assert first_power_date({
+        'fisPowerTimeStr': '', 'createDateStr': '2023-05-06'}) == \
+        date(2023, 5, 6)
+    assert first_power_date({}) is None
+
+
+def test_ranges():
+    assert day_range(date(2024, 2, 28), date(2024, 3, 1)) == [
+        '2024-02-28', '2024-02-29', '2024-03-01']
+    assert month_range(date(2023, 11, 15), date(2024, 2, 1)) == [
+        '2023-11', '2023-12', '2024-01', '2024-02']
+
+
+def test_planner_clamps(planner):
+    assert planner.months(1) == ['2024-01', '2024-02', '2024-03']
+    assert planner.months(1, date(2024, 2, 10)) == ['2024-02', '2024-03']
+    assert planner.months(1, date(2020, 1, 1)) == [
+        '2024-01', '2024-02', '2024-03']
+    assert planner.days(1, date(2024, 2, 29)) == [
+        '2024-02-29', '2024-03-01', '2024-03-02']
+
+
+def test_negative_cache(planner, tmp_path):
+    path = str(tmp_path / 'empty.json')
+    planner.cache = NegativeCache(path)
+    planner.empty(1, '2024-02-20')
+    # Marked two days after the period ended, checked again
+    planner.empty(1, '2024-02-29')
+    # Current periods may still receive data
+    planner.empty(1, '2024-03-02')
+    planner.empty(1, '2024-03')
+    assert planner.days(1, date(2024, 2, 20))[:2] == [
+        '2024-02-21', '2024-02-22']
+    assert '2024-02-29' in planner.days(1, date(2024, 2, 29))
+    assert planner.months(1, date(2024, 3, 1)) == ['2024-03']
+    planner.cache.save()
+    assert (1, '2024-02-20') in NegativeCache(path)
+    assert (1, '2024-02-29') not in NegativeCache(path)
+    assert (1, '2024-02-29') in NegativeCache(path, settle_days=2)
+    assert (2, '2024-02-20') not in NegativeCache(path)
+    assert period_end('2024-02') == date(2024, 2, 29)
+
+
+@pytest.mark.asyncio
+async def test_station_first_power_dates(mocker):
+    api = mocker.Mock()
+    api.station_detail_list = mocker.AsyncMock(side_effect=[
+        [{'id': 1, 'fisPowerTimeStr': '2024-02-01 08:00:00'}] * 100,
+        [{'id': 2, 'createDateStr': '2024-03-01'}, {'id': 3}],
+    ])
+    dates = await station_first_power_dates(api, KEY, SECRET)
+    assert dates == {'1': date(2024, 2, 1), '2': date(2024, 3, 1)}
+    assert api.station_detail_list.call_count == 2
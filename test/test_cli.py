@@ -0,0 +1,212 @@
+import pytest
+import json
+import sys
+from soliscloud_api import SoliscloudAPI
+from soliscloud_api import cli
+from soliscloud_api.sinks import open_sink
+from .const import KEY, SECRET
+
+
+@pytest.fixture
+def config(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = tmp_path / 'config.json'
+    path.write_text(json.dumps({'key': KEY, 'secret': SECRET.decode('utf-8')}))
+    return str(path)
+
+
+def read_jsonl(path):
+    with open(path, 'r', encoding='utf-8') as file:
+        return [json.loads(line) for line in file]
+
+
+def test_lazy_sink_imports():
+    assert 'influxdb_client' not in sys.modules
+    assert 'mysql.connector' not in sys.modules
+    with pytest.raises(ValueError):
+        open_sink('csv')
+
+
+def test_sink_options():
+    config = {'sinks': {'mysql': {'host': 'db'}}}
+    assert cli.sink_options('mysql', config) == {'host': 'db'}
+    assert cli.sink_options('jsonl', config) == {}
+
+
+def test_export(config, tmp_path, mocker):
+    mocker.patch.object(
+        SoliscloudAPI, 'inverter_detail_list',
+        side_effect=[[{'id': i} for i in range(100)], [{'id': 100}]])
+    output = str(tmp_path / 'out.jsonl')
+    assert cli.main([
+        '-c', config, 'export', 'inverter_detail_list', '-o', output]) == 0
+    assert [r['id'] for r in read_jsonl(output)] == list(range(101))
+    with pytest.raises(SystemExit):
+        cli.main(['-c', config, 'export', 'inverter_detail'])
+
+
+def test_daily(config, tmp_path, mocker):
+    mocker.patch.object(
+        SoliscloudAPI, 'inverter_detail_list',
+        return_value=[{'id': '1', 'stationName': 'Home'}])
+    month = mocker.patch.object(SoliscloudAPI, 'inverter_month', return_value=[
+        {'dateStr': '2025-03-14', 'energy': '1', 'money': '2'},
+        {'dateStr': '2025-03-15', 'energy': '3.5', 'money': '4',
+         'moneyStr': 'MYR', 'energyStr': 'kWh'}])
+    output = str(tmp_path / 'out.jsonl')
+    assert cli.main([
+        '-c', config, 'daily', '--date', '2025-03-15', '--source', 'month',
+        '--sink', 'jsonl', '-o', output]) == 0
+    assert read_jsonl(output) == [{
+        'inverter_id': '1', 'station_name': 'Home', 'dateStr': '2025-03-15',
+        'energy': 3.5, 'money': 4.0, 'moneyStr': 'MYR', 'energyStr': 'kWh'}]
+    assert month.call_args.kwargs['month'] == '2025-03'
+
+
+def test_daily_detail(config, tmp_path, mocker):
+    detail_list = mocker.patch.object(
+        SoliscloudAPI, 'inverter_detail_list', return_value=[
+            {'id': '1', 'stationName': 'Home', 'eToday': '3.5',
+             'eTodayStr': 'kWh', 'dataTimestamp': '1742025600000'},
+            {'id': '2', 'stationName': 'Home', 'eToday': '0.5',
+             'eTodayStr': 'MWh', 'dataTimestamp': '1742025600000',
+             'timeZone': '0'},
+            {'id': '3', 'eToday': '9', 'dataTimestamp': '1741939200000'}])
+    month = mocker.patch.object(SoliscloudAPI, 'inverter_month')
+    output = str(tmp_path / 'out.jsonl')
+    assert cli.main([
+        '-c', config, 'daily', '--date', '2025-03-15',
+        '--sink', 'jsonl', '-o', output]) == 0
+    assert read_jsonl(output) == [
+        {'inverter_id': '1', 'station_name': 'Home', 'dateStr': '2025-03-15',
+         'energy': 3.5, 'energyStr': 'kWh'},
+        {'inverter_id': '2', 'station_name': 'Home', 'dateStr': '2025-03-15',
+         'energy': 500.0, 'energyStr': 'kWh'}]
+    assert detail_list.call_count == 1
+    assert 'eToday' in detail_list.call_args.kwargs['fields']
+    month.assert_not_called()
+
+
+def test_daily_today(config, tmp_path, mocker):
+    from .test_daily import Clock, TIMESTAMP
+    mocker.patch('soliscloud_api.daily.datetime', Clock)
+    mocker.patch.object(
+        SoliscloudAPI, 'inverter_detail_list', return_value=[
+            {'id': '1', 'eToday': '2', 'dataTimestamp': TIMESTAMP}])
+    output = str(tmp_path / 'out.jsonl')
+    # 20:00 UTC is already the next day at the inverters
+    assert cli.main([
+        '-c', config, 'daily', '--sink', 'jsonl', '-o', output]) == 0
+    assert [r['dateStr'] for r in read_jsonl(output)] == ['2025-03-15']
+
+
+def test_failed_account(config, mocker):
+    mocker.patch.object(
+        SoliscloudAPI, 'inverter_detail_list',
+        side_effect=SoliscloudAPI.ApiError('Boom', 'B0001'))
+    assert cli.main([
+        '-c', config, 'bench', 'inverter_detail_list', '--count', '2']) == 1
+
+
+def test_bulk_requires_mysql(config):
+    with pytest.raises(SystemExit):
+        cli.main(['-c', config, 'backfill', 'day', '--sink', 'jsonl', '--bulk'])
+
+
+def test_backfill_rollup(config, tmp_path, mocker):
+    pytest.importorskip('numpy')
+    from datetime import date
+    from soliscloud_api.backfill import BackfillPlanner
+    mocker.patch.object(
+        BackfillPlanner, '_today', return_value=date(2024, 2, 1))
+    mocker.patch.object(
+        SoliscloudAPI, 'station_detail_list', return_value=[
+            {'id': '5', 'fisGenerateTimeStr': '2024-02-01 08:00:00'}])
+    mocker.patch.object(
+        SoliscloudAPI, 'inverter_detail_list',
+        return_value=[{'id': '1', 'stationId': '5', 'stationName': 'Home'}])
+    # 1.2 kW from 10:00 to 11:00 at UTC+8, as returned by inverter_day
+    start = 1706752800000
+    day = mocker.patch.object(SoliscloudAPI, 'inverter_day', return_value=[
+        {'time': str(start + i * 300000), 'timeStr': '', 'pac': '1.2',
+         'pacStr': 'kW', 'eToday': str(round(0.1 * i, 1)),
+         'eTodayStr': 'kWh', 'eTotal': '1.5', 'eTotalStr': 'MWh'}
+        for i in range(13)])
+    rows = str(tmp_path / 'day.jsonl')
+    assert cli.main([
+        '-c', config, 'backfill', 'day', '--sink', 'jsonl', '-o', rows]) == 0
+    assert day.call_args.kwargs['time'] == '2024-02-01'
+    assert day.call_args.kwargs['time_zone'] == 8
+    assert isinstance(day.call_args.kwargs['time_zone'], int)
+    assert read_jsonl(rows)[0]['pacStr'] == 'kW'
+    for source, energy in (('pac', 1.2), ('etoday', 1.2)):
+        output = str(tmp_path / f'{source}.jsonl')
+        assert cli.main([
+            '-c', config, 'rollup', rows, '--period', 'day',
+            '--source', source, '-o', output]) == 0
+        assert read_jsonl(output) == [
+            {'inverter_id': '1', 'period': '2024-02-01', 'energy': energy}]
+
+
+def test_metrics_file(config, tmp_path, mocker):
+    mocker.patch.object(
+        SoliscloudAPI, 'inverter_detail_list', return_value=[{'id': 1}])
+    metrics = tmp_path / 'soliscloud.prom'
+    assert cli.main([
+        '-c', config, '--metrics-file', str(metrics), 'export',
+        'inverter_detail_list', '-o', str(tmp_path / 'out.jsonl')]) == 0
+    assert 'soliscloud_requests_total' in metrics.read_text()
+
+
+def test_export_params(config, tmp_path, mocker):
+    assert cli.required_params('station_day_energy_list') == ['time']
+    assert cli.required_params('inverter_detail_list') == []
+    fetch = mocker.patch.object(
+        SoliscloudAPI, 'station_day_energy_list', return_value=[{'id': 1}],
+        autospec=True)
+    output = str(tmp_path / 'out.jsonl')
+    with pytest.raises(SystemExit):
+        cli.main([
+            '-c', config, 'export', 'station_day_energy_list', '-o', output])
+    with pytest.raises(SystemExit):
+        cli.main(['-c', config, 'export', 'alarm_list', '-o', output])
+    assert cli.main([
+        '-c', config, 'export', 'station_day_energy_list',
+        '--param', 'time=2024-02-01', '-o', output]) == 0
+    assert fetch.call_args.kwargs['time'] == '2024-02-01'
+    assert read_jsonl(output) == [{'id': 1}]
+
+
+def test_record_closed(config, tmp_path, mocker):
+    mocker.patch.object(
+        SoliscloudAPI, 'inverter_detail_list', side_effect=RuntimeError)
+    close = mocker.patch('soliscloud_api.transport.RecordingTransport.close')
+    cli.main([
+        '-c', config, '--record', str(tmp_path / 'trace.jsonl.gz'), 'export',
+        'inverter_detail_list', '-o', str(tmp_path / 'out.jsonl')])
+    close.assert_called_once()
+
+
+def test_snapshot_per_account(tmp_path, monkeypatch, mocker):
+    monkeypatch.chdir(tmp_path)
+    config = tmp_path / 'config.json'
+    config.write_text(json.dumps({'accounts': [
+        {'name': 'a', 'key': 'key_a', 'secret': 'x'},
+        {'name': 'b', 'key': 'key_b', 'secret': 'x'}]}))
+    # Both accounts have a device with id 1, at the same dataTimestamp
+    mocker.patch.object(
+        SoliscloudAPI, 'station_detail_list',
+        return_value=[{'id': '1', 'dataTimestamp': '1700000000000'}])
+    output = str(tmp_path / 'out.jsonl')
+    assert cli.main([
+        '-c', str(config), 'snapshot', 'station', '--sink', 'jsonl',
+        '-o', output]) == 0
+    assert len(read_jsonl(output)) == 2
+    assert (tmp_path / 'station_detail_snapshot.key_a.json').exists()
+    assert (tmp_path / 'station_detail_snapshot.key_b.json').exists()
+
+
+def test_backfill_time_zone():
+    args = cli.build_parser().parse_args(
+        ['backfill', 'day', '--time-zone', '5.5'])
+    assert args.time_zone == 5.5
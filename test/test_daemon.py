@@ -0,0 +1,173 @@
+import pytest
+import asyncio
+from datetime import datetime, timedelta
+from soliscloud_api.daemon import (
+    CronSchedule, Job, Scheduler, _serve_metrics, device_daylight,
+    device_timestamps)
+from soliscloud_api.metrics import ClientMetrics
+from soliscloud_api.polling import PollScheduler
+
+T0 = 1_700_000_000
+
+
+def test_cron_next_after():
+    start = datetime(2024, 1, 31, 23, 59, 30)
+    assert CronSchedule('* * * * *').next_after(start) == \
+        datetime(2024, 2, 1, 0, 0)
+    assert CronSchedule('*/15 * * * *').next_after(start) == \
+        datetime(2024, 2, 1, 0, 0)
+    assert CronSchedule('50 23 * * *').next_after(
+        datetime(2024, 1, 31, 23, 50)) == datetime(2024, 2, 1, 23, 50)
+    # 2024-02-04 is a Sunday, 0 and 7 both mean Sunday
+    assert CronSchedule('0 6 * * 0').next_after(start) == \
+        datetime(2024, 2, 4, 6, 0)
+    assert CronSchedule('0 6 * * 7').next_after(start) == \
+        datetime(2024, 2, 4, 6, 0)
+    assert CronSchedule('0 0 29 2 *').next_after(start) == \
+        datetime(2024, 2, 29, 0, 0)
+    # Day of month and weekday both restricted: either matches
+    assert CronSchedule('0 0 15 * 5').next_after(start) == \
+        datetime(2024, 2, 2, 0, 0)
+    assert CronSchedule('5-10/5 1,3 * * *').minutes == {5, 10}
+
+
+@pytest.mark.parametrize('expression', [
+    '* * * *', '60 * * * *', '* 24 * * *', '5-1 * * * *', '*/0 * * * *'])
+def test_cron_invalid(expression):
+    with pytest.raises(ValueError):
+        CronSchedule(expression)
+
+
+@pytest.mark.asyncio
+async def test_dispatch():
+    calls = []
+
+    async def func(*args, **kwargs):
+        calls.append((args, kwargs))
+
+    job = Job('test', '* * * * *', func, misfire_grace=30)
+    scheduler = Scheduler([job], 'key', soliscloud='api')
+    now = datetime(2024, 1, 1, 12, 0, 10)
+
+    job.next_run = datetime(2024, 1, 1, 12, 0)
+    scheduler._dispatch(job, now)
+    await asyncio.gather(*scheduler._tasks)
+    assert calls == [(('key',), {'soliscloud': 'api'})]
+    assert job.next_run == datetime(2024, 1, 1, 12, 1)
+
+    # Too late, skipped and planned for the next slot
+    job.next_run = now - timedelta(seconds=31)
+    scheduler._dispatch(job, now)
+    assert job.misfires == 1
+    assert len(calls) == 1
+
+    # Still running, no overlapping run
+    job.running = True
+    job.next_run = now
+    scheduler._dispatch(job, now)
+    assert not scheduler._tasks
+
+
+@pytest.mark.asyncio
+async def test_run_stop(mocker):
+    async def func(*args, **kwargs):
+        raise RuntimeError('isolated')
+
+    job = Job('test', '* * * * *', func)
+    scheduler = Scheduler([job])
+    mocker.patch.object(
+        Scheduler, '_plan', side_effect=lambda j, now: now)
+    task = asyncio.ensure_future(scheduler.run())
+    while job.runs == 0:
+        await asyncio.sleep(0.01)
+    scheduler.stop()
+    await task
+    assert job.runs >= 1
+
+
+@pytest.mark.asyncio
+async def test_metrics_textfile(tmp_path):
+    async def func(*args, **kwargs):
+        raise RuntimeError('isolated')
+
+    job = Job('test', '* * * * *', func)
+    metrics = ClientMetrics()
+    textfile = tmp_path / 'soliscloud.prom'
+    config = {'shard': 1, 'metrics': {'textfile': str(textfile)}}
+    assert await _serve_metrics(config, metrics, [job]) is None
+    with pytest.raises(RuntimeError):
+        await job.func()
+    assert (tmp_path / 'soliscloud.1.prom').exists()
+
+
+def test_job_config():
+    job = Job.from_config({
+        'target': 'soliscloud_api.daemon:device_timestamps',
+        'poll': {'delay': 10, 'daylight': {
+            'sunrise': '06:00', 'sunset': '19:00', 'time_zone': 8}}})
+    assert job.schedule is None and job.poller.delay == 10
+    assert job.trigger == 'adaptive polling'
+    assert job.poller.daylight.sunrise == 6 * 3600
+    with pytest.raises(ValueError):
+        Job('test', None, None)
+    with pytest.raises(ValueError):
+        Job('test', '* * * * *', None, poller=PollScheduler())
+
+
+def test_device_timestamps():
+    assert device_timestamps({
+        'a': {'1': '1700000000000'}, 'b': RuntimeError(), 'c': None,
+        'd': {'2': 1700000300000}}) == {
+            '1': '1700000000000', '2': 1700000300000}
+    assert device_timestamps(None) == {}
+    assert device_timestamps({'a': {'1': {'dataTimestamp': 5, 'sr': '06:00'}}}) \
+        == {'1': 5}
+
+
+def test_device_daylight(mocker):
+    mocker.patch.object(PollScheduler, '_now', return_value=T0)
+    mocker.patch.object(
+        Scheduler, '_now', return_value=datetime.fromtimestamp(T0))
+    result = {'account': {
+        # T0 is 22:13 UTC, night at this station
+        'a': {'dataTimestamp': (T0 - 10) * 1000, 'sr': '06:00', 'ss': '18:00',
+              'timeZone': 0},
+        'b': {'dataTimestamp': (T0 - 10) * 1000}}}
+    daylight = device_daylight(result)
+    assert daylight['a'].sunset == 18 * 3600 and daylight['a'].time_zone == 0
+    assert daylight['b'] is None
+    assert device_daylight({'account': {'c': T0 * 1000}}) == {}
+
+    job = Job('poll', None, None, poller=PollScheduler(
+        delay=5, default_interval=300, heartbeat=3600))
+    Scheduler([job])._replan(
+        job, device_timestamps(result), daylight)
+    # Throttled to the heartbeat at night, the other device polls as usual
+    assert job.poller.next_poll('a') == T0 + 3600
+    assert job.next_run == datetime.fromtimestamp(T0 - 10 + 300 + 5)
+
+
+@pytest.mark.asyncio
+async def test_polled_job(mocker):
+    now = [T0]
+    mocker.patch.object(PollScheduler, '_now', side_effect=lambda: now[0])
+    mocker.patch.object(
+        Scheduler, '_now', side_effect=lambda: datetime.fromtimestamp(now[0]))
+    uploads = []
+
+    async def func(*args, **kwargs):
+        # The dataloggers uploaded 10 seconds before this poll
+        uploads.append(now[0] - 10)
+        return {'account': {'inv': (now[0] - 10) * 1000}}
+
+    job = Job('poll', None, func, poller=PollScheduler(
+        delay=5, default_interval=300))
+    scheduler = Scheduler([job])
+    task = asyncio.ensure_future(scheduler.run())
+    while job.runs == 0:
+        await asyncio.sleep(0.01)
+    # Next poll 5 seconds after the upload expected one interval later
+    assert job.next_run == datetime.fromtimestamp(T0 - 10 + 300 + 5)
+    scheduler.stop()
+    await task
+    assert uploads == [T0 - 10]
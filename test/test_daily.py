@@ -0,0 +1,63 @@
+import pytest
+from datetime import datetime
+from soliscloud_api.daily import add_money, daily_row, local_day, today
+from soliscloud_api.units import scaled
+
+# 2025-03-14 20:00 UTC, 2025-03-15 04:00 at UTC+8
+TIMESTAMP = '1741982400000'
+
+
+class Clock(datetime):
+    """2025-03-14 20:00 UTC"""
+
+    @classmethod
+    def now(cls, tz=None):
+        return datetime.fromtimestamp(int(TIMESTAMP) / 1000, tz=tz)
+
+
+def test_today(mocker):
+    mocker.patch('soliscloud_api.daily.datetime', Clock)
+    assert today(8) == '2025-03-15'
+    assert today(0) == '2025-03-14'
+
+
+def test_local_day():
+    assert local_day({'dataTimestamp': TIMESTAMP}, 8) == '2025-03-15'
+    assert local_day({'dataTimestamp': TIMESTAMP, 'timeZone': 0}, 8) == \
+        '2025-03-14'
+    assert local_day({'dataTimestamp': TIMESTAMP, 'timeZone': 'x'}, 8) == \
+        '2025-03-15'
+    assert local_day({}, 8) is None
+
+
+def test_daily_row():
+    record = {'id': '1', 'stationName': 'Home', 'eToday': '1500',
+              'eTodayStr': 'Wh', 'dataTimestamp': TIMESTAMP}
+    assert daily_row(record) == {
+        'inverter_id': '1', 'station_name': 'Home', 'dateStr': '2025-03-15',
+        'energy': 1.5, 'energyStr': 'kWh'}
+    assert daily_row(record, '2025-03-14') is None
+    assert daily_row({**record, 'eToday': None}) is None
+
+
+@pytest.mark.asyncio
+async def test_add_money(mocker):
+    api = mocker.Mock()
+    api.inverter_month = mocker.AsyncMock(side_effect=[
+        [{'dateStr': '2025-03-14', 'money': '1.1', 'moneyStr': 'MYR'},
+         {'dateStr': '2025-03-15', 'money': '2.5', 'moneyStr': 'MYR'}],
+        None])
+    rows = [{'inverter_id': '1', 'dateStr': '2025-03-15', 'energy': 1.5},
+            {'inverter_id': '2', 'dateStr': '2025-03-15', 'energy': 0.5}]
+    assert await add_money(api, 'key', 'secret', rows) is rows
+    assert rows[0] == {'inverter_id': '1', 'dateStr': '2025-03-15',
+                       'energy': 1.5, 'money': 2.5, 'moneyStr': 'MYR'}
+    assert rows[1]['money'] is None and rows[1]['moneyStr'] is None
+    assert api.inverter_month.call_args.kwargs == {
+        'currency': 'MYR', 'month': '2025-03', 'inverter_id': '2'}
+
+
+def test_scaled():
+    assert scaled({'pac': '2', 'pacStr': 'kW'}, 'pac') == 2000.0
+    assert scaled({'e': '2', 'eStr': 'MWh'}, 'e', 'kWh') == 2000.0
+    assert scaled({'e': 'x'}, 'e') is None
@@ -0,0 +1,103 @@
+import pytest
+import json
+from datetime import date
+from soliscloud_api import SoliscloudAPI
+from soliscloud_api import cli
+from soliscloud_api.energy import (
+    EnergyState, collect, period_range, station_energy, station_rows)
+from soliscloud_api.helpers import Helpers
+from .const import KEY, SECRET
+
+
+def paged(count):
+    """Fake paged list call returning count records in total."""
+    calls = []
+
+    async def fetch(key, secret, *, page_no, page_size, **kwargs):
+        calls.append((page_no, kwargs))
+        start = (page_no - 1) * page_size
+        return [{'id': str(i), 'energy': '1', 'energyStr': 'MWh'}
+                for i in range(start, min(start + page_size, count))]
+    return fetch, calls
+
+
+@pytest.mark.asyncio
+async def test_gather_pages():
+    fetch, calls = paged(350)
+    records = await Helpers.gather_pages(fetch, KEY, SECRET, concurrency=3)
+    assert [r['id'] for r in records] == [str(i) for i in range(350)]
+    assert sorted(c[0] for c in calls) == [1, 2, 3, 4]
+    fetch, calls = paged(40)
+    assert len(await Helpers.gather_pages(fetch, KEY, SECRET)) == 40
+    assert len(calls) == 1
+
+
+def test_period_range():
+    assert period_range('day', date(2025, 2, 27), date(2025, 3, 1)) == [
+        '2025-02-27', '2025-02-28', '2025-03-01']
+    assert period_range('month', date(2024, 12, 5), date(2025, 1, 1)) == [
+        '2024-12', '2025-01']
+    assert period_range('year', date(2024, 6, 1), date(2025, 1, 1)) == [
+        '2024', '2025']
+
+
+def test_station_rows():
+    assert station_rows('2025-03', [
+        {'id': 1, 'stationName': 'Home', 'energy': '2', 'energyStr': 'MWh',
+         'money': '3', 'moneyStr': 'MYR'},
+        {'id': 2, 'energy': None}]) == [{
+            'station_id': 1, 'station_name': 'Home', 'period': '2025-03',
+            'energy': 2000.0, 'money': 3.0, 'moneyStr': 'MYR'}]
+
+
+def test_state(tmp_path):
+    path = str(tmp_path / 'state.json')
+    state = EnergyState(path)
+    today = date(2025, 3, 15)
+    assert state.periods('a', 'day', today) == ['2025-03-15']
+    assert state.periods('a', 'month', today, since=date(2025, 1, 20)) == [
+        '2025-01', '2025-02', '2025-03']
+    state.done('a', 'day', '2025-03-13')
+    state.done('a', 'day', '2025-03-12')
+    state.save()
+    state = EnergyState(path)
+    assert state.periods('a', 'day', today) == [
+        '2025-03-13', '2025-03-14', '2025-03-15']
+    assert state.periods('b', 'day', today) == ['2025-03-15']
+
+
+@pytest.mark.asyncio
+async def test_collect(mocker):
+    api = SoliscloudAPI('https://soliscloud.test:13333', None)
+    fetch = mocker.patch.object(
+        SoliscloudAPI, 'station_month_energy_list', return_value=[
+            {'id': '1', 'energy': '5', 'energyStr': 'kWh'}])
+    state = EnergyState()
+    state.done(KEY, 'month', '2025-02')
+    collected = [p async for p, _ in collect(
+        api, KEY, SECRET, 'month', state, today=date(2025, 3, 15))]
+    assert collected == ['2025-02', '2025-03']
+    assert [c.kwargs['month'] for c in fetch.call_args_list] == \
+        ['2025-02', '2025-03']
+    assert state.periods(KEY, 'month', date(2025, 3, 15)) == ['2025-03']
+    with pytest.raises(ValueError):
+        await station_energy(api, KEY, SECRET, 'week', '2025-03')
+
+
+def test_cli_stations(tmp_path, monkeypatch, mocker):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'config.json').write_text(
+        json.dumps({'key': KEY, 'secret': SECRET.decode('utf-8')}))
+    fetch = mocker.patch.object(
+        SoliscloudAPI, 'station_day_energy_list', return_value=[
+            {'id': '1', 'stationName': 'Home', 'energy': '12.5',
+             'energyStr': 'kWh'}])
+    output = tmp_path / 'out.jsonl'
+    assert cli.main([
+        'stations', 'day', '--period', '2025-03-15', '--sink', 'jsonl',
+        '-o', str(output)]) == 0
+    assert json.loads(output.read_text()) == {
+        'station_id': '1', 'station_name': 'Home', 'period': '2025-03-15',
+        'energy': 12.5, 'money': None, 'moneyStr': None}
+    assert fetch.call_args.kwargs == {
+        'page_no': 1, 'page_size': 100, 'time': '2025-03-15'}
@@ -0,0 +1,82 @@
+import pytest
+import asyncio
+from soliscloud_api import cli
+from soliscloud_api.sinks import AsyncSink
+from soliscloud_api.sinks.fanout import FanOutError, FanOutSink
+
+
+class MemorySink(AsyncSink):
+    def __init__(self, delay=0, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.writes = []
+        self.closed = False
+
+    async def write(self, table, rows):
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise IOError("sink down")
+        self.writes.append((table, list(rows)))
+
+    async def close(self):
+        self.closed = True
+
+
+def rows(start, count):
+    return [{'id': i} for i in range(start, start + count)]
+
+
+@pytest.mark.asyncio
+async def test_fan_out():
+    a, b = MemorySink(), MemorySink()
+    async with FanOutSink({'a': a, 'b': b}, batch_size={'a': 3}) as sink:
+        await sink.write('t', rows(0, 2))
+        await sink.write('t', rows(2, 2))
+        await sink.write('u', rows(4, 1))
+    assert a.closed and b.closed
+    for memory in (a, b):
+        assert [r['id'] for _, batch in memory.writes for r in batch] == \
+            list(range(5))
+    assert max(len(batch) for _, batch in a.writes) <= 3
+    assert sink.written == {'a': 5, 'b': 5}
+
+
+@pytest.mark.asyncio
+async def test_slow_sink_does_not_block():
+    fast, slow = MemorySink(), MemorySink(delay=0.2)
+    sink = FanOutSink({'fast': fast, 'slow': slow})
+    for i in range(5):
+        await sink.write('t', rows(i, 1))
+    await asyncio.sleep(0.05)
+    assert len(fast.writes) >= 1 and not slow.writes
+    await sink.close()
+    assert sum(len(batch) for _, batch in slow.writes) == 5
+    assert len(slow.writes) < 5
+
+
+@pytest.mark.asyncio
+async def test_failed_sink_isolated():
+    good, bad = MemorySink(), MemorySink(fail=True)
+    sink = FanOutSink({'good': good, 'bad': bad}, maxsize=1)
+    for i in range(10):
+        await sink.write('t', rows(i, 1))
+    with pytest.raises(FanOutError) as error:
+        await sink.close()
+    assert list(error.value.errors) == ['bad']
+    assert sink.written == {'good': 10, 'bad': 0}
+    assert bad.closed
+    with pytest.raises(ValueError):
+        FanOutSink({})
+
+
+def test_cli_sinks(mocker):
+    opened = mocker.patch.object(
+        cli, '_open', side_effect=lambda name, args, config: MemorySink())
+    args = cli.build_parser().parse_args(
+        ['daily', '--sink', 'mysql', '--sink', 'influx', '--sink', 'mysql'])
+    sink = cli.sink_for(args, {})
+    assert isinstance(sink, FanOutSink)
+    assert list(sink.sinks) == ['mysql', 'influx']
+    args = cli.build_parser().parse_args(['daily'])
+    assert isinstance(cli.sink_for(args, {}), MemorySink)
+    assert opened.call_args[0][0] == 'mysql'
@@ -0,0 +1,31 @@
+import pytest
+
+pytest.importorskip('influxdb_client')
+
+from soliscloud_api.sinks import influx  # noqa: E402
+
+
+@pytest.fixture
+def sink(mocker):
+    mocker.patch.object(influx, 'InfluxDBClient')
+    return influx.InfluxSink('http://influx.test', 'token', 'org', 'bucket')
+
+
+def test_schema_rows_as_line_protocol(sink):
+    rows = [{'id': '1', 'pac': 1.5, 'dataTimestamp': '1700000000000'}]
+    sink.write('inverter_detail_list', rows)
+    write = sink._write_api.write
+    assert write.call_args.kwargs['record'] == \
+        sink.encoder('inverter_detail_list')(rows)
+    assert write.call_args.kwargs['write_precision'] == \
+        influx.WritePrecision.S
+    # Rows without fields encode to nothing and are not written
+    sink.write('inverter_detail_list', [{'id': '2'}])
+    assert write.call_count == 1
+
+
+def test_rows_without_schema(sink):
+    assert sink.encoder('custom') is None
+    sink.write('custom', [{'id': '1', 'value': 2}])
+    points = sink._write_api.write.call_args.kwargs['record']
+    assert points[0].to_line_protocol().startswith('custom,id=1 value=2i ')
@@ -0,0 +1,66 @@
+import pytest
+from datetime import datetime, timezone
+from soliscloud_api.lineprotocol import (
+    compile_encoder, escape_key, escape_string, format_float, format_value)
+from soliscloud_api.schema import INVERTER_DAILY, INVERTER_DETAIL, Schema
+
+SCHEMA = Schema(
+    'inverter detail', tags={'station': 'stationName', 'inverter_id': 'id'},
+    fields={'pac': 'pac', 'state': ('state', int), 'name': ('name', str),
+            'ok': ('ok', bool)},
+    time=('dataTimestamp', 'ms'))
+
+
+def test_escape():
+    assert escape_key('My Home, A=B') == 'My\\ Home\\,\\ A\\=B'
+    assert escape_string('say "hi"\\') == '"say \\"hi\\"\\\\"'
+    assert format_value(True) == 'true'
+    assert format_value(3) == '3i'
+    assert format_value(1.5) == '1.5'
+    with pytest.raises(ValueError):
+        format_float('nan')
+
+
+def test_encode():
+    encode = compile_encoder(SCHEMA)
+    data = encode([
+        {'id': 7, 'stationName': 'My Home', 'pac': '1.5', 'state': '2',
+         'name': 'a "b"', 'ok': 1, 'dataTimestamp': '1700000000999'},
+        {'id': 8, 'pac': '', 'state': 'bad', 'name': None},
+        {'id': 9, 'stationName': '', 'pac': 2,
+         'dataTimestamp': 'bad'}],
+        datetime(2024, 1, 1))
+    assert data == (
+        b'inverter\\ detail,inverter_id=7,station=My\\ Home '
+        b'pac=1.5,state=2i,name="a \\"b\\"",ok=true 1700000000\n'
+        b'inverter\\ detail,inverter_id=9 pac=2.0 1704067200\n')
+
+
+def test_encode_default_time():
+    encode = compile_encoder(Schema('m', tags={}, fields={'pac': 'pac'}))
+    assert encode([{'pac': 1}]) == b'm pac=1.0\n'
+    assert encode([{'pac': 1}], 1700000000.5) == b'm pac=1.0 1700000000\n'
+    assert encode([{'pac': 1}], datetime(
+        2024, 1, 1, tzinfo=timezone.utc)) == b'm pac=1.0 1704067200\n'
+    assert encode([]) == b''
+
+
+def test_encode_matches_schema():
+    record = {'inverter_id': '1', 'station_name': 'Home',
+              'dateStr': '2025-03-15', 'energy': '3.5', 'energyStr': 'kWh'}
+    tags, fields, time = INVERTER_DAILY.map(record)
+    data = compile_encoder(INVERTER_DAILY)([record])
+    assert data == (
+        f"inverter_daily,inverter_id={tags['inverter_id']},"
+        f"station_name={tags['station_name']} "
+        f"energy={fields['energy']!r},energyStr=\"{fields['energyStr']}\" "
+        f"{int(time.timestamp())}\n").encode()
+
+
+def test_encode_inverter_detail_types():
+    data = compile_encoder(INVERTER_DETAIL)([{
+        'id': '1', 'inverterMeterModel': 2, 'pac': 1, 'iLeakLimt': 30,
+        'uAc1': 230.5, 'dataTimestamp': '1700000000000'}])
+    assert data == (
+        b'inverter_detail_list,inverterMeterModel=2,inverter_id=1 '
+        b'pac=1.0,uAc1=230.5,iLeakLimt=30i 1700000000\n')
@@ -0,0 +1,78 @@
+import pytest
+import asyncio
+from soliscloud_api import SoliscloudAPI, INVERTER_DETAIL_LIST
+from soliscloud_api.metrics import ClientMetrics, Registry
+from .const import KEY, SECRET, VALID_RESPONSE_PAGED_RECORDS
+from .test_private_methods import MockedResponse
+
+
+@pytest.fixture
+def metrics():
+    return ClientMetrics()
+
+
+@pytest.fixture
+def api_instance(metrics):
+    return SoliscloudAPI(
+        'https://soliscloud_test.com:13333/', 1, metrics=metrics)
+
+
+def test_render():
+    registry = Registry()
+    counter = registry.counter('c_total', 'A counter', ('a',))
+    counter.inc(a='x"y')
+    counter.inc(2, a='x"y')
+    histogram = registry.histogram('h', 'A histogram', buckets=(1, 2))
+    histogram.observe(1.5)
+    text = registry.render()
+    assert '# TYPE c_total counter' in text
+    assert 'c_total{a="x\\"y"} 3' in text
+    assert 'h_bucket{le="1"} 0' in text
+    assert 'h_bucket{le="2"} 1' in text
+    assert 'h_bucket{le="+Inf"} 1' in text
+    assert 'h_count 1' in text
+    with pytest.raises(ValueError):
+        counter.inc(b='1')
+
+
+def test_write_textfile(tmp_path):
+    registry = Registry()
+    registry.gauge('g', 'A gauge').set(4)
+    path = tmp_path / 'metrics.prom'
+    registry.write_textfile(str(path))
+    assert 'g 4' in path.read_text()
+
+
+@pytest.mark.asyncio
+async def test_client_metrics(api_instance, metrics, mocker):
+    mocker.patch(
+        'soliscloud_api.SoliscloudAPI._do_post_aiohttp',
+        return_value=MockedResponse(VALID_RESPONSE_PAGED_RECORDS, 200))
+    await api_instance.inverter_detail_list(KEY, SECRET)
+    endpoint = INVERTER_DETAIL_LIST
+    assert metrics.requests.value(endpoint=endpoint, outcome='ok') == 1
+    assert metrics.latency.count(endpoint=endpoint) == 1
+    assert metrics.wait.count(endpoint=endpoint) == 1
+    assert metrics.records.value(endpoint=endpoint) == 2
+
+    mocker.patch(
+        'soliscloud_api.SoliscloudAPI._do_post_aiohttp',
+        return_value=MockedResponse(VALID_RESPONSE_PAGED_RECORDS, 502))
+    with pytest.raises(SoliscloudAPI.HttpError):
+        await api_instance.inverter_detail_list(KEY, SECRET)
+    assert metrics.requests.value(
+        endpoint=endpoint, outcome='HttpError') == 1
+
+    mocker.patch(
+        'soliscloud_api.SoliscloudAPI._do_post_aiohttp',
+        side_effect=asyncio.TimeoutError)
+    with pytest.raises(SoliscloudAPI.TimeoutError):
+        await api_instance.inverter_detail_list(KEY, SECRET)
+    assert metrics.requests.value(endpoint=endpoint, outcome='timeout') == 1
+
+
+def test_observe_retry(api_instance, metrics):
+    api_instance.observe_retry(INVERTER_DETAIL_LIST)
+    assert metrics.retries.value(endpoint=INVERTER_DETAIL_LIST) == 1
+    SoliscloudAPI('https://soliscloud_test.com:13333', 1).observe_retry(
+        INVERTER_DETAIL_LIST)
@@ -0,0 +1,98 @@
+import pytest
+import asyncio
+from soliscloud_api.helpers import Helpers
+from soliscloud_api.metrics import Registry
+from soliscloud_api.pipeline import Pipeline, fan_out
+from .const import KEY, SECRET
+
+
+@pytest.mark.asyncio
+async def test_iter_pages(mocker):
+    fetch = mocker.AsyncMock(side_effect=[[1, 2], [3]])
+    records = [r async for r in Helpers.iter_pages(
+        fetch, KEY, SECRET, page_size=2, station_id=5)]
+    assert records == [1, 2, 3]
+    fetch.assert_called_with(KEY, SECRET, page_no=2, page_size=2, station_id=5)
+
+
+@pytest.mark.asyncio
+async def test_fan_out():
+    running = []
+    peak = []
+
+    async def fetch(item):
+        running.append(item)
+        peak.append(len(running))
+        await asyncio.sleep(0.01 * (3 - item))
+        running.remove(item)
+        return None if item == 0 else item * 10
+
+    results = [r async for r in fan_out(fetch, range(3), concurrency=2)]
+    assert sorted(results) == [10, 20]
+    assert max(peak) == 2
+
+
+@pytest.mark.asyncio
+async def test_pipeline():
+    registry = Registry()
+    written = []
+
+    async def double(item):
+        await asyncio.sleep(0)
+        return None if item % 5 == 0 else item * 2
+
+    def write(batch):
+        assert len(batch) <= 4
+        written.extend(batch)
+
+    await Pipeline(range(20), name='test', registry=registry) \
+        .map(double, concurrency=3, maxsize=2) \
+        .sink(write, batch_size=4) \
+        .run()
+    assert sorted(written) == [i * 2 for i in range(20) if i % 5]
+    assert 'soliscloud_pipeline_items_total{pipeline="test",stage="double"} 20' \
+        in registry.render()
+    assert 'soliscloud_pipeline_items_total{pipeline="test",stage="write"} 16' \
+        in registry.render()
+
+
+@pytest.mark.asyncio
+async def test_pipeline_backpressure():
+    fed = []
+
+    async def source():
+        for i in range(10):
+            fed.append(i)
+            yield i
+
+    release = asyncio.Event()
+
+    async def sink(item):
+        await release.wait()
+
+    task = asyncio.ensure_future(
+        Pipeline(source()).sink(sink, maxsize=2).run())
+    await asyncio.sleep(0.01)
+    # One item in the sink, two queued, one waiting to be queued
+    assert len(fed) == 4
+    release.set()
+    await task
+    assert len(fed) == 10
+
+
+@pytest.mark.asyncio
+async def test_pipeline_error():
+    def fail(item):
+        if item == 10:
+            raise RuntimeError(item)
+        return item
+
+    written = []
+    with pytest.raises(RuntimeError):
+        await Pipeline(range(1000)).map(fail, concurrency=2) \
+            .sink(written.append).run()
+    # The failure stops the pipeline, the failed item never reaches the sink
+    assert 10 not in written
+    assert len(written) < 999
+    with pytest.raises(ValueError):
+        await Pipeline(range(3)).run()
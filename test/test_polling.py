@@ -0,0 +1,122 @@
+import pytest
+import asyncio
+from soliscloud_api.polling import (
+    DAY, Cadence, DaylightWindow, PollScheduler, to_seconds)
+
+T0 = 1_700_000_000
+
+
+def test_to_seconds():
+    assert to_seconds('1700000000000') == T0
+    assert to_seconds(T0) == T0
+
+
+def test_cadence():
+    cadence = Cadence(default_interval=600)
+    assert cadence.interval == 600
+    assert cadence.next_upload(T0) == T0
+    for t in (0, 300, 600, 1200, 1500):  # upload at 900 was missed
+        assert cadence.observe(T0 + 7 + t)
+    assert not cadence.observe(T0 + 7 + 1500)
+    assert cadence.interval == 300
+    assert cadence.next_upload(T0 + 1600) == T0 + 7 + 1800
+    assert cadence.next_upload(T0 + 2000) == T0 + 7 + 2100
+
+
+def test_scheduler_plans_after_upload():
+    scheduler = PollScheduler(delay=20, retry=30, default_interval=300)
+    scheduler.add('epoch', when=0)
+    assert scheduler.next_poll('epoch') == 0
+    scheduler.remove('epoch')
+    scheduler.add('inv', when=T0)
+    assert scheduler.due(T0) == ['inv']
+    for t in (0, 300, 600):
+        planned = scheduler.observe('inv', (T0 + 42 + t) * 1000, now=T0 + t + 50)
+    # Next upload expected at T0 + 942, polled 20 seconds later
+    assert planned == T0 + 962
+    assert scheduler.due(T0 + 961) == []
+    assert scheduler.sleep_time(T0 + 900) == 62
+
+    # Upload is late: retry soon instead of waiting a full interval
+    planned = scheduler.observe('inv', (T0 + 642) * 1000, now=T0 + 962)
+    assert planned == T0 + 992
+    # Gave up on this slot, wait for the next expected upload
+    planned = scheduler.observe('inv', (T0 + 642) * 1000, now=T0 + 1100)
+    assert planned == T0 + 1262
+
+
+@pytest.mark.asyncio
+async def test_run(mocker):
+    scheduler = PollScheduler(delay=0, default_interval=300)
+    now = [T0]
+    mocker.patch.object(PollScheduler, '_now', side_effect=lambda: now[0])
+    stop = asyncio.Event()
+    polled = []
+
+    async def poll(device_id):
+        polled.append(device_id)
+        if device_id == 'broken':
+            raise RuntimeError
+        stop.set()
+        return {'dataTimestamp': str(T0 * 1000)}
+
+    scheduler.add('broken')
+    scheduler.add('inv')
+    await scheduler.run(poll, stop)
+    assert polled == ['broken', 'inv']
+    assert scheduler.next_poll('inv') == T0 + 300
+    assert scheduler.next_poll('broken') == T0 + 30
+
+
+# 2023-11-14 00:00:00 UTC
+MIDNIGHT = 1_699_920_000
+
+
+def test_daylight_window():
+    window = DaylightWindow.from_station(
+        {'sr': '07:00', 'ss': '19:00', 'timeZone': 8}, margin=1800)
+    # 07:00 at UTC+8 is 23:00 UTC the day before
+    assert not window.is_daylight(MIDNIGHT - 2 * 3600)
+    assert window.is_daylight(MIDNIGHT - 3600)
+    assert window.is_daylight(MIDNIGHT + 11 * 3600 + 1799)
+    assert not window.is_daylight(MIDNIGHT + 11 * 3600 + 1800)
+    assert window.next_dawn(MIDNIGHT - 2 * 3600) == MIDNIGHT - 5400
+    assert window.next_dawn(MIDNIGHT) == MIDNIGHT + DAY - 5400
+    assert DaylightWindow.from_station({'sr': None}) is None
+    with pytest.raises(ValueError):
+        DaylightWindow('7', '19:00')
+
+
+def test_scheduler_night_heartbeat():
+    scheduler = PollScheduler(delay=0, default_interval=300, heartbeat=3600)
+    scheduler.set_daylight('inv', DaylightWindow('07:00', '19:00', 0, 1800))
+    # Daytime, full rate
+    noon = MIDNIGHT + 12 * 3600
+    scheduler.observe('inv', noon, now=noon)
+    assert scheduler.observe('inv', noon + 300, now=noon + 300) == noon + 600
+    # Night, no new uploads: heartbeat
+    now = MIDNIGHT + 21 * 3600
+    assert scheduler.observe('inv', noon + 300, now=now) == now + 3600
+    # Dawn comes before the next heartbeat
+    now = MIDNIGHT + DAY + 6 * 3600
+    assert scheduler.observe('inv', noon + 300, now=now) == now + 1800
+    scheduler.set_daylight('inv', None)
+    assert scheduler.observe('inv', noon + 300, now=now) == now + 300
+
+
+def test_offset_phases():
+    # Three inverters uploading every 300 s, 100 s apart, polled as one list
+    scheduler = PollScheduler(delay=5, retry=30, default_interval=300)
+    phases = {'a': 0, 'b': 100, 'c': 200}
+
+    def latest(device, now):
+        return (T0 + phases[device]
+                + (now - T0 - phases[device]) // 300 * 300) * 1000
+
+    now = T0 + 250
+    for _ in range(60):
+        now = scheduler.observe_all({d: latest(d, now) for d in phases}, now)
+    for device in phases:
+        assert scheduler.cadence(device).interval == 300
+    # Each poll lands 5 seconds after one of the inverters uploads
+    assert (now - T0 - 5) % 100 == 0
@@ -0,0 +1,62 @@
+import pytest
+from soliscloud_api import SoliscloudAPI
+from soliscloud_api.helpers import Helpers
+from soliscloud_api.projection import Projection, projection
+from .const import KEY, SECRET
+from .test_private_methods import MockedResponse
+from .test_streaming import StreamedResponse
+
+RECORDS = [
+    {'id': '1', 'sn': 'A', 'pac': 1.5, 'stationName': 'Home'},
+    {'id': '2', 'sn': 'B', 'stationName': 'Barn'},
+]
+
+PAGED = {
+    'success': True, 'code': '0', 'msg': 'success',
+    'data': {'page': {'records': RECORDS}}}
+
+
+def test_projection():
+    project = Projection(('id', 'pac'))
+    assert project(RECORDS[0]) == {'id': '1', 'pac': 1.5}
+    assert project(RECORDS[1]) == {'id': '2', 'pac': None}
+    assert Projection(['sn'], as_tuple=True).many(RECORDS) == [('A',), ('B',)]
+    assert project(None) is None
+    assert projection(('id', 'pac')) is projection(['id', 'pac'])
+    assert projection() is None
+    with pytest.raises(TypeError):
+        projection('id')
+    with pytest.raises(ValueError):
+        projection(as_tuple=True)
+
+
+@pytest.fixture
+def api():
+    return SoliscloudAPI('https://soliscloud_test.com:13333/', 1)
+
+
+@pytest.mark.asyncio
+async def test_detail_list_fields(api, mocker):
+    post = mocker.patch(
+        'soliscloud_api.SoliscloudAPI._do_post_aiohttp',
+        return_value=MockedResponse(PAGED, 200))
+    assert await api.inverter_detail_list(
+        KEY, SECRET, fields=('id', 'stationName')) == [
+        {'id': '1', 'stationName': 'Home'}, {'id': '2', 'stationName': 'Barn'}]
+    assert await api.station_detail_list(
+        KEY, SECRET, fields=('id',), as_tuple=True) == [('1',), ('2',)]
+    records = [r async for r in Helpers.iter_pages(
+        api.inverter_detail_list, KEY, SECRET, fields=('sn',))]
+    assert records == [{'sn': 'A'}, {'sn': 'B'}]
+
+    post.return_value = MockedResponse(
+        {'success': True, 'code': '0', 'msg': 'success', 'data': RECORDS[0]},
+        200)
+    assert await api.inverter_detail(
+        KEY, SECRET, inverter_id='1', fields=('stationName', 'pac'),
+        as_tuple=True) == ('Home', 1.5)
+
+    post.return_value = StreamedResponse(PAGED, 200)
+    records = [r async for r in api.inverter_detail_list_stream(
+        KEY, SECRET, fields=('pac',), as_tuple=True)]
+    assert records == [(1.5,), (None,)]
@@ -0,0 +1,108 @@
+import pytest
+from soliscloud_api import SoliscloudAPI
+from soliscloud_api.registry import DeviceRegistry
+from .const import KEY, SECRET
+
+INVERTERS = [
+    {'id': '1', 'sn': 'SN1', 'stationId': '10', 'stationName': 'Home',
+     'pac': 1.5},
+    {'id': '2', 'sn': 'SN2', 'stationId': '10', 'stationName': 'Home'},
+    {'id': '3', 'sn': 'SN3', 'stationId': '20', 'stationName': 'Barn'},
+]
+STATIONS = [
+    {'id': '10', 'stationName': 'Home', 'fisPowerTimeStr': '2024-05-01'},
+    {'id': '20', 'stationName': 'Barn'},
+]
+
+
+def test_lookups():
+    registry = DeviceRegistry()
+    assert registry.update('inverter', INVERTERS) == {
+        'added': 3, 'changed': 0, 'removed': 0}
+    registry.update('station', STATIONS)
+    assert registry.get('inverter', 1) == {
+        'id': '1', 'sn': 'SN1', 'stationId': '10', 'stationName': 'Home'}
+    assert registry.by_sn('inverter', 'SN3')['id'] == '3'
+    assert registry.by_sn('inverter', 'nope') is None
+    assert [d['id'] for d in registry.by_station('inverter', 10)] == ['1', '2']
+    assert registry.station_of('inverter', '3')['stationName'] == 'Barn'
+    assert registry.station_of('inverter', '9') is None
+    assert registry.ids('inverter') == ('1', '2', '3')
+    assert len(registry) == 5
+    changed = [dict(INVERTERS[0], stationId='20'), INVERTERS[2]]
+    assert registry.update('inverter', changed) == {
+        'added': 0, 'changed': 1, 'removed': 1}
+    assert [d['id'] for d in registry.by_station('inverter', 20)] == ['1', '3']
+
+
+@pytest.mark.asyncio
+async def test_refresh_snapshot(tmp_path, mocker):
+    api = SoliscloudAPI('https://soliscloud.test:13333', None)
+    inverters = mocker.patch.object(
+        SoliscloudAPI, 'inverter_detail_list', return_value=INVERTERS)
+    stations = mocker.patch.object(
+        SoliscloudAPI, 'station_detail_list', return_value=STATIONS)
+    collectors = mocker.patch.object(SoliscloudAPI, 'collector_list')
+    path = str(tmp_path / 'registry.json')
+    registry = DeviceRegistry(path)
+    changes = await registry.refresh(
+        api, KEY, SECRET, kinds=('inverter', 'station'))
+    assert changes['inverter']['added'] == 3
+    assert 'sn' in inverters.call_args.kwargs['fields']
+    registry.save()
+    collectors.assert_not_called()
+
+    registry = DeviceRegistry(path)
+    assert await registry.refresh(
+        api, KEY, SECRET, kinds=('inverter', 'station')) == {}
+    assert inverters.call_count == stations.call_count == 1
+    assert registry.station_of('inverter', '1')['fisPowerTimeStr'] == \
+        '2024-05-01'
+    assert await registry.refresh(
+        api, KEY, SECRET, kinds=('station',), force=True) == {
+            'station': {'added': 0, 'changed': 0, 'removed': 0}}
+    assert stations.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_refresh_other_account(tmp_path, mocker):
+    api = SoliscloudAPI('https://soliscloud.test:13333', None)
+    inverters = mocker.patch.object(
+        SoliscloudAPI, 'inverter_detail_list',
+        side_effect=[INVERTERS, INVERTERS[2:]])
+    path = str(tmp_path / 'registry.json')
+    registry = DeviceRegistry(path)
+    await registry.refresh(api, 'key_a', SECRET, kinds=('inverter',))
+    registry.save()
+
+    # A snapshot of account a is not fresh for account b
+    registry = DeviceRegistry(path)
+    assert registry.account == 'key_a'
+    await registry.refresh(api, 'key_b', SECRET, kinds=('inverter',))
+    assert inverters.call_count == 2
+    assert registry.ids('inverter') == ('3',)
+
+
+@pytest.mark.asyncio
+async def test_store(mocker):
+    api = SoliscloudAPI('https://soliscloud.test:13333', None)
+    stations = mocker.patch.object(SoliscloudAPI, 'station_detail_list')
+    registry = DeviceRegistry()
+    registry.update('inverter', INVERTERS)
+    # Stations read by the station job, sunrise/sunset are kept
+    changes = registry.store(KEY, 'station', [
+        dict(STATIONS[0], sr='06:12', ss='19:48', dayEnergy=3.2)])
+    assert changes == {'added': 1, 'changed': 0, 'removed': 0}
+    assert registry.account == KEY
+    assert registry.ids('inverter') == ()
+    assert registry.get('station', 10)['sr'] == '06:12'
+    assert 'dayEnergy' not in registry.get('station', 10)
+    assert await registry.refresh(api, KEY, SECRET, kinds=('station',)) == {}
+    stations.assert_not_called()
+
+
+def test_account_path():
+    from soliscloud_api.accounts import account_path
+    assert account_path('device_registry.json', 1234) == \
+        'device_registry.1234.json'
+    assert account_path('spool/inverters', 'a/b') == 'spool/inverters.a_b'
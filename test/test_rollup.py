@@ -0,0 +1,99 @@
+import pytest
+from datetime import datetime, timezone
+
+np = pytest.importorskip("numpy")
+
+from soliscloud_api.rollup import Rollup, api_totals, value  # noqa: E402
+
+
+def ms(text):
+    return str(int(datetime.fromisoformat(text).replace(
+        tzinfo=timezone.utc).timestamp() * 1000))
+
+
+def curve(day, pac, etoday=None, step=300, count=13):
+    start = int(ms(day + 'T10:00:00'))
+    return [
+        {'time': str(start + i * step * 1000), 'pac': pac, 'pacStr': 'kW',
+         **({} if etoday is None else {'eToday': etoday * (i + 1) / count})}
+        for i in range(count)]
+
+
+@pytest.fixture
+def rollup():
+    rollup = Rollup(time_zone=0)
+    # 1.2 kW for one hour, no eToday: integrated
+    rollup.add('1', curve('2024-01-31', 1.2), station_id='S1')
+    rollup.add('1', curve('2024-02-01', 0.6), station_id='S1')
+    rollup.add('2', curve('2024-02-01', 1.0, etoday=5.0), station_id='S1')
+    rollup.add('3', curve('2024-02-02', 1.0, etoday=4.0), station_id='S2')
+    return rollup
+
+
+def test_value():
+    assert value({'e': '2', 'eStr': 'MWh'}, 'e', 'kWh') == 2000
+    assert value({'p': '500', 'pStr': 'W'}, 'p', 'W') == 500
+    assert np.isnan(value({}, 'e'))
+
+
+def test_daily(rollup):
+    assert len(rollup) == 52
+    totals = rollup.totals('day')
+    assert totals[('1', '2024-01-31')] == pytest.approx(1.2)
+    assert totals[('1', '2024-02-01')] == pytest.approx(0.6)
+    assert totals[('2', '2024-02-01')] == pytest.approx(5.0)
+    # Integrated pac instead of eToday
+    assert rollup.totals('day', source='pac')[('2', '2024-02-01')] == \
+        pytest.approx(1.0)
+    assert ('1', '2024-01-31') not in rollup.totals('day', source='etoday')
+
+
+def test_gaps_not_integrated():
+    rollup = Rollup()
+    rollup.add('1', curve('2024-01-01', 1.0, step=3600, count=3))
+    assert rollup.totals() == {('1', '2024-01-01'): 0.0}
+    rollup = Rollup(max_gap=3600)
+    rollup.add('1', curve('2024-01-01', 1.0, step=3600, count=3))
+    assert rollup.totals() == {('1', '2024-01-01'): pytest.approx(2.0)}
+
+
+def test_month_year_station(rollup):
+    assert rollup.totals('month') == {
+        ('1', '2024-01'): pytest.approx(1.2),
+        ('1', '2024-02'): pytest.approx(0.6),
+        ('2', '2024-02'): pytest.approx(5.0),
+        ('3', '2024-02'): pytest.approx(4.0)}
+    assert rollup.totals('year', by='station') == {
+        ('S1', '2024'): pytest.approx(6.8), ('S2', '2024'): pytest.approx(4.0)}
+    with pytest.raises(ValueError):
+        rollup.totals('week')
+    assert Rollup().totals('month') == {}
+
+
+def test_reconcile(rollup):
+    api = api_totals('2', [
+        {'dateStr': '2024-02', 'energy': '5.05', 'energyStr': 'kWh'},
+        {'dateStr': '2024-03', 'energy': '0.001', 'energyStr': 'MWh'},
+        {'dateStr': '2024-04'}])
+    assert api == {('2', '2024-02'): 5.05, ('2', '2024-03'): 1.0}
+    assert rollup.reconcile(api) == {('2', '2024-03'): (None, 1.0)}
+    assert rollup.reconcile(api, tolerance=0.001) == {
+        ('2', '2024-02'): (pytest.approx(5.0), 5.05),
+        ('2', '2024-03'): (None, 1.0)}
+
+
+def test_cli_rollup(tmp_path):
+    import json
+    from soliscloud_api import cli
+    config = tmp_path / 'config.json'
+    config.write_text('{}')
+    curves = tmp_path / 'day.jsonl'
+    curves.write_text(''.join(
+        json.dumps({'inverter_id': i, 'station_name': 'Home', **r}) + '\n'
+        for i in ('1', '2') for r in curve('2024-02-01', 0.6)))
+    output = tmp_path / 'out.jsonl'
+    assert cli.main([
+        '-c', str(config), 'rollup', str(curves), '--by', 'station',
+        '--time-zone', '0', '-o', str(output)]) == 0
+    assert json.loads(output.read_text()) == {
+        'station_name': 'Home', 'period': '2024-02', 'energy': 1.2}
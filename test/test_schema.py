@@ -0,0 +1,76 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from soliscloud_api.schema import (
+    INVERTER_DAILY, INVERTER_DETAIL, SCHEMAS, STATION_DAY_ENERGY,
+    STATION_DETAIL, Schema)
+
+
+def test_unbounded_tags_rejected():
+    for key in ('timeStr', 'dataTimestamp', 'dateStr', 'picUrl', 'recorded_time'):
+        with pytest.raises(ValueError):
+            Schema('m', tags={key: key}, fields={})
+    with pytest.raises(ValueError):
+        Schema('m', tags={'day': 'dateStr'}, fields={})
+    with pytest.raises(ValueError):
+        Schema('m', tags={}, fields={}, time=('time', 'ns'))
+
+
+def test_map():
+    schema = Schema(
+        'm', tags={'inverter_id': 'id'},
+        fields={'pac': 'pac', 'state': ('state', int), 'name': ('name', str)},
+        time=('dataTimestamp', 'ms'))
+    tags, fields, time = schema.map({
+        'id': 7, 'pac': '1.5', 'state': 'bad', 'name': '',
+        'dataTimestamp': '1700000000000', 'timeStr': 'ignored'})
+    assert tags == {'inverter_id': '7'}
+    assert fields == {'pac': 1.5}
+    assert time == datetime.fromtimestamp(1700000000, tz=timezone.utc)
+    default = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    assert schema.map({'pac': 1}, default) == ({}, {'pac': 1.0}, default)
+
+
+def test_date_time_zone():
+    _, fields, time = INVERTER_DAILY.map({
+        'inverter_id': '1', 'dateStr': '2025-03-15', 'energy': 3.5,
+        'energyStr': 'kWh'})
+    assert fields == {'energy': 3.5, 'energyStr': 'kWh'}
+    assert time == datetime(2025, 3, 15, tzinfo=timezone(timedelta(hours=8)))
+
+
+def test_max_tag_values():
+    schema = Schema('m', tags={'id': 'id'}, fields={'v': 'v'},
+                    max_tag_values=2)
+    schema.map({'id': 1, 'v': 1})
+    schema.map({'id': 2, 'v': 1})
+    schema.map({'id': 1, 'v': 1})
+    with pytest.raises(ValueError):
+        schema.map({'id': 3, 'v': 1})
+
+
+def test_predefined_schemas():
+    assert SCHEMAS['inverter_detail_list'] is INVERTER_DETAIL
+    tags, fields, _ = INVERTER_DETAIL.map({
+        'id': '1', 'stationId': '2', 'sn': 'SN', 'dataTimestampStr': 'x',
+        'inverterMeterModel': 2, 'sno': 'S', 'collectorId': 3,
+        'pac': 1, 'iLeakLimt': 30, 'uAc1': 230.5, 'fac': '50.01'})
+    # Baseline tags and field types of the scripts
+    assert tags == {
+        'inverter_id': '1', 'stationId': '2', 'sn': 'SN', 'sno': 'S',
+        'collectorId': '3', 'inverterMeterModel': '2'}
+    assert fields == {'pac': 1.0, 'iLeakLimt': 30, 'uAc1': 230.5, 'fac': 50.01}
+    assert isinstance(fields['iLeakLimt'], int)
+    _, fields, _ = STATION_DETAIL.map({
+        'id': '10', 'dayEnergy': 3, 'dayIncome': 12, 'allInCome': 1.5,
+        'homeLoadEnergy': '4.2', 'homeLoadMonthEnergy': 80})
+    # Written raw by the script before schemas, ints stay integer fields
+    assert fields == {'DailyPowerGen': 3.0, 'dayIncome': 12, 'allInCome': 1.5,
+                      'homeLoadEnergy': 4.2, 'homeLoadMonthEnergy': 80}
+    assert isinstance(fields['dayIncome'], int)
+    assert SCHEMAS['station_day_energy'] is STATION_DAY_ENERGY
+    tags, fields, time = STATION_DAY_ENERGY.map({
+        'station_id': '10', 'station_name': 'Home', 'period': '2025-03-15',
+        'energy': 12.5, 'money': None, 'moneyStr': 'MYR'})
+    assert tags == {'station_id': '10', 'station_name': 'Home'}
+    assert fields == {'energy': 12.5, 'moneyStr': 'MYR'}
+    assert time == datetime(2025, 3, 14, 16, tzinfo=timezone.utc)
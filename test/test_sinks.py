@@ -0,0 +1,54 @@
+import pytest
+import threading
+from soliscloud_api.sinks import (
+    Sink, ThreadedSink, open_async_sink, quote_identifier, upsert_query)
+
+
+class RecordingSink(Sink):
+    def __init__(self):
+        self.writes = []
+        self.threads = set()
+        self.closed = False
+
+    def write(self, table, rows):
+        self.threads.add(threading.current_thread().name)
+        self.writes.append((table, rows))
+
+    def close(self):
+        self.closed = True
+
+
+def test_quote_identifier():
+    assert quote_identifier('inverter_daily') == '`inverter_daily`'
+    assert quote_identifier('energy', '"') == '"energy"'
+    for name in ('a b', 'x;drop', '1st', ''):
+        with pytest.raises(ValueError):
+            quote_identifier(name)
+
+
+def test_upsert_query():
+    assert upsert_query('t', ['id', 'e']) == (
+        "INSERT INTO `t` (`id`, `e`) VALUES (%s, %s) "
+        "ON DUPLICATE KEY UPDATE `id` = VALUES(`id`), `e` = VALUES(`e`)")
+
+
+@pytest.mark.asyncio
+async def test_threaded_sink():
+    sink = RecordingSink()
+    async with ThreadedSink(sink) as threaded:
+        for i in range(5):
+            await threaded.write('t', [{'i': i}])
+    assert [rows[0]['i'] for _, rows in sink.writes] == list(range(5))
+    assert threading.current_thread().name not in sink.threads
+    assert sink.closed
+
+
+@pytest.mark.asyncio
+async def test_open_async_sink(tmp_path):
+    path = tmp_path / 'out.jsonl'
+    async with open_async_sink('jsonl', path=str(path)) as sink:
+        assert isinstance(sink, ThreadedSink)
+        await sink.write('t', [{'a': 1}])
+    assert path.read_text() == '{"a":1}\n'
+    with pytest.raises(ValueError):
+        open_async_sink('csv')
@@ -0,0 +1,50 @@
+from soliscloud_api.snapshot import SnapshotDiff
+
+RECORD = {'id': '1', 'dataTimestamp': '1700000000000', 'pac': 1.0, 'sn': 'A'}
+
+
+def test_skip_stale():
+    diff = SnapshotDiff()
+    assert diff.filter([RECORD]) == [RECORD]
+    assert diff.filter([dict(RECORD, pac=2.0)]) == []
+    assert diff.skipped == 1
+    newer = dict(RECORD, dataTimestamp='1700000300000')
+    assert diff.filter([newer]) == [newer]
+    assert diff.last('1') == newer
+    # Records without timestamp are always passed
+    assert diff.filter([{'id': '2'}, {'id': '2'}]) == [{'id': '2'}] * 2
+
+
+def test_changed_only():
+    diff = SnapshotDiff(changed_only=True, keep=('sn',))
+    assert diff.update(RECORD) == RECORD
+    changed = diff.update(dict(
+        RECORD, dataTimestamp='1700000300000', pac=3.0))
+    assert changed == {
+        'id': '1', 'dataTimestamp': '1700000300000', 'pac': 3.0, 'sn': 'A'}
+    changed = diff.update(dict(RECORD, dataTimestamp='1700000600000', pac=3.0))
+    assert changed == {'id': '1', 'dataTimestamp': '1700000600000', 'sn': 'A'}
+
+
+def test_changes_commit():
+    diff = SnapshotDiff(changed_only=True)
+    diff.filter([RECORD])
+    newer = dict(RECORD, dataTimestamp='1700000300000', pac=2.0)
+    changes = {'id': '1', 'dataTimestamp': '1700000300000', 'pac': 2.0}
+    assert diff.changes([RECORD, newer]) == [changes]
+    assert diff.skipped == 1
+    # Not committed (the write failed): the record is emitted again
+    assert diff.changes([newer]) == [changes]
+    diff.commit([RECORD, newer])
+    assert diff.last('1') == newer
+    assert diff.changes([newer]) == []
+
+
+def test_persist(tmp_path):
+    path = str(tmp_path / 'snapshot.json')
+    diff = SnapshotDiff(path=path)
+    diff.filter([RECORD])
+    diff.save()
+    restored = SnapshotDiff(path=path)
+    assert len(restored) == 1
+    assert restored.filter([RECORD]) == []
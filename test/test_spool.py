@@ -0,0 +1,61 @@
+import pytest
+from soliscloud_api.spool import Spool
+
+
+@pytest.fixture
+def spool(tmp_path):
+    return Spool(str(tmp_path / 'spool'), sync_records=2)
+
+
+@pytest.mark.asyncio
+async def test_append_replay(spool):
+    assert not spool
+    for i in range(5):
+        spool.append({'id': i})
+    assert spool
+    batches = []
+    assert await spool.replay(batches.append, batch_size=2) == 5
+    assert batches == [[{'id': 0}, {'id': 1}], [{'id': 2}, {'id': 3}], [{'id': 4}]]
+    assert not spool
+    assert spool.segments() == []
+
+
+@pytest.mark.asyncio
+async def test_replay_resumes_after_failure(spool):
+    for i in range(4):
+        spool.append({'id': i})
+    batches = []
+
+    def deliver(batch):
+        if batch[0]['id'] == 2:
+            raise ConnectionError
+        batches.append(batch)
+
+    with pytest.raises(ConnectionError):
+        await spool.replay(deliver, batch_size=2)
+    assert batches == [[{'id': 0}, {'id': 1}]]
+    assert spool
+
+    # A new spool on the same directory continues after the delivered batch
+    spool = Spool(spool.directory)
+    spool.append({'id': 4})
+    batches = []
+
+    async def deliver_async(batch):
+        batches.append(batch)
+
+    assert await spool.replay(deliver_async) == 3
+    assert batches == [[{'id': 2}, {'id': 3}], [{'id': 4}]]
+    assert not spool
+
+
+@pytest.mark.asyncio
+async def test_rotation(tmp_path):
+    spool = Spool(str(tmp_path), segment_bytes=10)
+    for i in range(3):
+        spool.append({'id': i, 'pad': 'x'})
+    assert len(spool.segments()) == 3
+    records = []
+    assert await spool.replay(records.extend) == 3
+    assert [r['id'] for r in records] == [0, 1, 2]
+    assert spool.segments() == []
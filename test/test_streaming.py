@@ -0,0 +1,171 @@
+import pytest
+import json
+import random
+from soliscloud_api import SoliscloudAPI, INVERTER_DETAIL_LIST
+from soliscloud_api.helpers import Helpers
+from soliscloud_api.streaming import RecordStream
+from .const import KEY, SECRET, VALID_RESPONSE_PAGED_RECORDS
+from .test_private_methods import MockedResponse
+
+BODY = {
+    'success': True, 'code': '0', 'msg': 'success',
+    'data': {
+        'page': {'current': 1, 'total': 3, 'records': [
+            {'id': '1', 'name': 'a "quoted" {x} [y]', 'records': [1, 2]},
+            {'id': '2', 'path': 'C:\\dir\\', 'nested': {'records': []}},
+            {'id': '3', 'name': '\u00e9'}]},
+        'stationStatusVo': {'all': 3}}}
+
+
+class Content():
+
+    def __init__(self, body: bytes, size: int):
+        self._chunks = [body[i:i + size] for i in range(0, len(body), size)]
+
+    async def read(self, n):
+        return self._chunks.pop(0) if self._chunks else b''
+
+
+class StreamedResponse(MockedResponse):
+
+    def __init__(self, body, status, size=7):
+        super().__init__(body, status)
+        self.content = Content(json.dumps(body).encode('utf-8'), size)
+
+
+def test_record_stream():
+    raw = json.dumps(BODY).encode('utf-8')
+    random.seed(1)
+    for _ in range(50):
+        stream = RecordStream()
+        records = []
+        pos = 0
+        while pos < len(raw):
+            size = random.randint(1, 16)
+            records += stream.feed(raw[pos:pos + size])
+            pos += size
+        assert records == BODY['data']['page']['records']
+        assert stream.count == 3
+        envelope = stream.finish()
+        assert envelope['data']['page'] == {
+            'current': 1, 'total': 3, 'records': []}
+        assert envelope['data']['stationStatusVo'] == {'all': 3}
+
+
+def test_record_stream_fields(mocker):
+    raw = json.dumps(BODY).encode('utf-8')
+    loads = mocker.spy(json, 'loads')
+    random.seed(2)
+    for _ in range(20):
+        stream = RecordStream(fields=('id', 'name', 'nested'))
+        records = []
+        pos = 0
+        while pos < len(raw):
+            size = random.randint(1, 16)
+            records += stream.feed(raw[pos:pos + size])
+            pos += size
+        assert records == [
+            {'id': '1', 'name': 'a "quoted" {x} [y]'},
+            {'id': '2', 'nested': {'records': []}},
+            {'id': '3', 'name': '\u00e9'}]
+    # Skipped values, such as the path and the records lists, are not parsed
+    assert not any(b'C:' in call.args[0] or b'[1, 2]' in call.args[0]
+                   for call in loads.call_args_list)
+
+
+def test_record_stream_memory():
+    stream = RecordStream()
+    stream.feed(b'{"code":"0","data":{"records":[{"id":1},{"id":')
+    # Only the incomplete record is kept
+    assert bytes(stream._buf) == b'{"id":'
+
+
+@pytest.mark.asyncio
+async def test_inverter_detail_list_stream(mocker):
+    post = mocker.patch(
+        'soliscloud_api.SoliscloudAPI._do_post_aiohttp',
+        return_value=StreamedResponse(BODY, 200))
+    api = SoliscloudAPI('https://soliscloud_test.com:13333/', 1)
+    records = [r async for r in api.inverter_detail_list_stream(
+        KEY, SECRET, page_no=1, page_size=100)]
+    assert records == BODY['data']['page']['records']
+    post.return_value = StreamedResponse(BODY, 200)
+    records = [r async for r in api.inverter_detail_list_stream(
+        KEY, SECRET, fields=('id', 'path'), as_tuple=True)]
+    assert records == [('1', None), ('2', 'C:\\dir\\'), ('3', None)]
+
+
+@pytest.mark.asyncio
+async def test_stream_fallback_and_errors(mocker):
+    post = mocker.patch(
+        'soliscloud_api.SoliscloudAPI._do_post_aiohttp',
+        return_value=MockedResponse(VALID_RESPONSE_PAGED_RECORDS, 200))
+    api = SoliscloudAPI('https://soliscloud_test.com:13333/', 1)
+    records = [r async for r in api.station_detail_list_stream(KEY, SECRET)]
+    assert records == [{'item': 1}, {'item': 2}]
+
+    post.return_value = StreamedResponse(
+        {'code': 'B0001', 'msg': 'Error', 'data': None}, 200)
+    with pytest.raises(SoliscloudAPI.ApiError):
+        [r async for r in api.station_detail_list_stream(KEY, SECRET)]
+    post.return_value = StreamedResponse({'code': '0', 'data': {}}, 200)
+    with pytest.raises(SoliscloudAPI.ApiError):
+        [r async for r in api.station_detail_list_stream(KEY, SECRET)]
+    post.return_value = StreamedResponse(BODY, 500)
+    with pytest.raises(SoliscloudAPI.HttpError):
+        [r async for r in api.station_detail_list_stream(KEY, SECRET)]
+    with pytest.raises(SoliscloudAPI.SolisCloudError):
+        [r async for r in api.station_detail_list_stream(
+            KEY, SECRET, page_size=101)]
+
+
+@pytest.mark.asyncio
+async def test_stream_pages(mocker):
+    pages = {1: [{'id': 1}, {'id': 2}], 2: [{'id': 3}]}
+
+    async def stream(key, secret, page_no, page_size):
+        for record in pages[page_no]:
+            yield record
+
+    records = [r async for r in Helpers.stream_pages(
+        stream, KEY, SECRET, page_size=2)]
+    assert records == [{'id': 1}, {'id': 2}, {'id': 3}]
+
+
+def test_record_stream_head():
+    stream = RecordStream()
+    stream.feed(b'{"success":true,"code":"B0')
+    assert stream.head == {}
+    stream.feed(b'001","msg":"a \\"b\\"","data":{"code":"x","records":[')
+    assert stream.head == {'code': 'B0001', 'msg': 'a "b"'}
+
+
+@pytest.mark.asyncio
+async def test_stream_code_checked_first(mocker):
+    from soliscloud_api.metrics import ClientMetrics
+    from soliscloud_api.tracing import Tracer
+    post = mocker.patch(
+        'soliscloud_api.SoliscloudAPI._do_post_aiohttp',
+        return_value=StreamedResponse(
+            {'code': 'B0001', 'msg': 'Error', 'data': BODY['data']}, 200))
+    metrics = ClientMetrics()
+    tracer = Tracer()
+    api = SoliscloudAPI(
+        'https://soliscloud_test.com:13333', 1, metrics=metrics,
+        tracer=tracer)
+    records = []
+    with pytest.raises(SoliscloudAPI.ApiError):
+        async for record in api.inverter_detail_list_stream(KEY, SECRET):
+            records.append(record)
+    assert records == []
+    assert metrics.requests.value(
+        endpoint=INVERTER_DETAIL_LIST, outcome='ApiError') == 1
+    assert 'call' in [span.name for span in tracer.finished]
+
+    # Code after the records: they are held back until it arrives
+    post.return_value = StreamedResponse(
+        {'data': BODY['data'], 'code': '0'}, 200)
+    records = [r async for r in api.inverter_detail_list_stream(KEY, SECRET)]
+    assert records == BODY['data']['page']['records']
+    assert metrics.requests.value(
+        endpoint=INVERTER_DETAIL_LIST, outcome='ok') == 1
@@ -0,0 +1,135 @@
+import pytest
+import asyncio
+from soliscloud_api import SoliscloudAPI, INVERTER_DAY, INVERTER_DETAIL_LIST
+from soliscloud_api.timeouts import Timeout, Timeouts
+from .const import KEY, SECRET, VALID_RESPONSE_PAGED_RECORDS
+from .test_private_methods import MockedResponse
+from .test_streaming import BODY, StreamedResponse
+
+
+def test_configured():
+    timeouts = Timeouts(
+        Timeout(10, connect=3), {INVERTER_DAY: Timeout(30, read=5)})
+    assert timeouts.get(INVERTER_DETAIL_LIST) == Timeout(10, connect=3)
+    assert timeouts.get(INVERTER_DAY) == Timeout(30, read=5)
+    assert timeouts.get(INVERTER_DAY).chunk == 5
+    client = timeouts.get(INVERTER_DAY).client_timeout()
+    assert (client.total, client.sock_read) == (None, 5)
+    with pytest.raises(ValueError):
+        Timeout(0)
+    with pytest.raises(ValueError):
+        Timeouts(window=5, min_samples=10)
+
+
+def test_adaptive():
+    timeouts = Timeouts(
+        Timeout(10, read=8), adaptive=True, window=100, min_samples=10)
+    for _ in range(9):
+        timeouts.observe(INVERTER_DAY, 0.5)
+    assert timeouts.latency(INVERTER_DAY) is None
+    assert timeouts.get(INVERTER_DAY) == Timeout(10, read=8)
+    timeouts.observe(INVERTER_DAY, 1.0)
+    assert timeouts.latency(INVERTER_DAY) == 1.0
+    assert timeouts.get(INVERTER_DAY) == Timeout(3.0, read=3.0)
+    for _ in range(100):
+        timeouts.observe(INVERTER_DAY, 0.1)
+    assert timeouts.get(INVERTER_DAY).total == 1.0
+    for _ in range(100):
+        timeouts.observe(INVERTER_DAY, 20)
+    assert timeouts.get(INVERTER_DAY).total == 10
+    assert timeouts.get(INVERTER_DETAIL_LIST).total == 10
+
+
+def test_from_config():
+    timeouts = Timeouts.from_config({
+        'total': 20, 'connect': 3, 'adaptive': True, 'factor': 2,
+        'endpoints': {'inverterDay': {'total': 40}}})
+    assert timeouts.default == Timeout(20, connect=3)
+    assert timeouts.configured(INVERTER_DAY) == Timeout(40, connect=3)
+    assert timeouts.adaptive and timeouts.factor == 2
+
+
+@pytest.mark.asyncio
+async def test_request_timeouts(mocker):
+    timeouts = Timeouts(
+        Timeout(10, connect=2, read=4),
+        {INVERTER_DAY: Timeout(0.05)}, adaptive=True, min_samples=1)
+    api = SoliscloudAPI(
+        'https://soliscloud_test.com:13333', 1, timeouts=timeouts)
+    post = mocker.patch(
+        'soliscloud_api.SoliscloudAPI._do_post_aiohttp',
+        return_value=MockedResponse(VALID_RESPONSE_PAGED_RECORDS, 200))
+    await api.inverter_detail_list(KEY, SECRET)
+    client = post.call_args.kwargs['timeout']
+    assert (client.sock_connect, client.sock_read) == (2, 4)
+    assert timeouts.latency(INVERTER_DETAIL_LIST) is not None
+
+    async def slow(*args, **kwargs):
+        await asyncio.sleep(1)
+    mocker.patch(
+        'soliscloud_api.SoliscloudAPI._do_post_aiohttp', side_effect=slow)
+    with pytest.raises(SoliscloudAPI.TimeoutError):
+        await api.inverter_day(
+            KEY, SECRET, currency='EUR', time='2025-03-15', time_zone=1,
+            inverter_id=1)
+
+
+def test_adaptive_latency_step():
+    timeouts = Timeouts(Timeout(30), adaptive=True, window=100, min_samples=10)
+    for _ in range(100):
+        timeouts.observe(INVERTER_DAY, 0.3)
+    assert timeouts.get(INVERTER_DAY).total == 1.0
+    # Latency rises to 5 s: a few requests time out, then all succeed
+    failures = []
+    for _ in range(50):
+        total = timeouts.get(INVERTER_DAY).total
+        if total < 5:
+            failures.append(total)
+            timeouts.timed_out(INVERTER_DAY, total)
+        else:
+            timeouts.observe(INVERTER_DAY, 5)
+    assert failures == [1.0, 2.0]
+    assert timeouts.get(INVERTER_DAY).total == 15
+
+
+@pytest.mark.asyncio
+async def test_request_timed_out(mocker):
+    timeouts = Timeouts(Timeout(10), adaptive=True, min_samples=1)
+    timeouts.observe(INVERTER_DAY, 0.01)
+    api = SoliscloudAPI(
+        'https://soliscloud_test.com:13333', 1, timeouts=timeouts)
+    mocker.patch(
+        'soliscloud_api.SoliscloudAPI._do_post_aiohttp',
+        side_effect=asyncio.TimeoutError)
+    with pytest.raises(SoliscloudAPI.TimeoutError):
+        await api.inverter_day(
+            KEY, SECRET, currency='EUR', time='2025-03-15', time_zone=1,
+            inverter_id=1)
+    assert timeouts.get(INVERTER_DAY).total == 6.0
+
+
+@pytest.mark.asyncio
+async def test_observed_latency(mocker):
+    timeouts = Timeouts(Timeout(10))
+    observe = mocker.spy(timeouts, 'observe')
+    api = SoliscloudAPI(
+        'https://soliscloud_test.com:13333', 1, timeouts=timeouts)
+    post = mocker.patch('soliscloud_api.SoliscloudAPI._do_post_aiohttp')
+    # Failed requests are not observed, plain or streamed
+    post.return_value = MockedResponse(VALID_RESPONSE_PAGED_RECORDS, 500)
+    with pytest.raises(SoliscloudAPI.HttpError):
+        await api.inverter_detail_list(KEY, SECRET)
+    post.return_value = StreamedResponse(BODY, 500)
+    with pytest.raises(SoliscloudAPI.HttpError):
+        [r async for r in api.inverter_detail_list_stream(KEY, SECRET)]
+    observe.assert_not_called()
+
+    # A stream is observed once its body has been read, without the time
+    # the caller spends on the records
+    post.return_value = StreamedResponse(BODY, 200)
+    async for record in api.inverter_detail_list_stream(KEY, SECRET):
+        observe.assert_not_called()
+        await asyncio.sleep(0.1)
+    observe.assert_called_once()
+    assert observe.call_args.args[0] == INVERTER_DETAIL_LIST
+    assert observe.call_args.args[1] < 0.1
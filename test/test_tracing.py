@@ -0,0 +1,98 @@
+import pytest
+import json
+from soliscloud_api import SoliscloudAPI, INVERTER_DETAIL_LIST
+from soliscloud_api.tracing import Tracer, JsonFileExporter
+from .const import KEY, SECRET, VALID_RESPONSE_PAGED_RECORDS
+from .test_private_methods import MockedResponse
+from .test_streaming import BODY, StreamedResponse
+
+
+@pytest.fixture
+def tracer():
+    return Tracer()
+
+
+@pytest.fixture
+def api_instance(tracer):
+    return SoliscloudAPI(
+        'https://soliscloud_test.com:13333/', 1, tracer=tracer)
+
+
+def test_nesting(tracer):
+    with tracer.span('job') as job:
+        with tracer.span('device', inverter_id=1) as device:
+            assert Tracer.current() is device
+        assert Tracer.current() is job
+    assert Tracer.current() is None
+    assert device.parent_id == job.span_id
+    assert device.trace_id == job.trace_id
+    assert job.parent_id is None
+    assert [s.name for s in tracer.finished] == ['device', 'job']
+    assert device.duration >= 0
+
+
+def test_error(tracer):
+    with pytest.raises(ValueError):
+        with tracer.span('sink'):
+            raise ValueError('down')
+    assert tracer.finished[0].to_otlp()['status'] == {
+        'code': 2, 'message': 'ValueError: down'}
+
+
+@pytest.mark.asyncio
+async def test_call_spans(api_instance, tracer, mocker):
+    mocker.patch(
+        'soliscloud_api.SoliscloudAPI._do_post_aiohttp',
+        return_value=MockedResponse(VALID_RESPONSE_PAGED_RECORDS, 200))
+    with tracer.span('job') as job:
+        await api_instance.inverter_detail_list(KEY, SECRET)
+    spans = {s.name: s for s in tracer.finished}
+    assert set(spans) == {
+        'job', 'call', 'sign', 'queue_wait', 'network', 'parse'}
+    assert spans['call'].parent_id == job.span_id
+    assert spans['call'].attributes == {'endpoint': INVERTER_DETAIL_LIST}
+    for name in ('sign', 'queue_wait', 'network', 'parse'):
+        assert spans[name].parent_id == spans['call'].span_id
+
+
+def test_json_export(tmp_path):
+    path = tmp_path / 'trace.jsonl'
+    tracer = Tracer(JsonFileExporter(str(path)))
+    with tracer.span('job', records=2):
+        pass
+    tracer.flush()
+    assert not tracer.finished and tracer.dropped == 0
+    payload = json.loads(path.read_text())
+    span = payload['resourceSpans'][0]['scopeSpans'][0]['spans'][0]
+    assert span['name'] == 'job'
+    assert span['attributes'] == [
+        {'key': 'records', 'value': {'intValue': '2'}}]
+
+
+def test_bounded():
+    tracer = Tracer(max_spans=2)
+    for name in ('a', 'b', 'c'):
+        with tracer.span(name):
+            pass
+    assert [s.name for s in tracer.finished] == ['b', 'c']
+    assert tracer.dropped == 1
+
+
+@pytest.mark.asyncio
+async def test_stream_spans(api_instance, tracer, mocker):
+    mocker.patch(
+        'soliscloud_api.SoliscloudAPI._do_post_aiohttp',
+        return_value=StreamedResponse(BODY, 200))
+    with tracer.span('job') as job:
+        records = api_instance.inverter_detail_list_stream(KEY, SECRET)
+        async for record in records:
+            # The call span is not current while the caller has a record
+            assert Tracer.current() is job
+            break
+    assert Tracer.current() is None
+    # Closed outside the job's context
+    await records.aclose()
+    spans = {s.name: s for s in tracer.finished}
+    assert spans['call'].parent_id == job.span_id
+    assert spans['network'].parent_id == spans['call'].span_id
+    assert spans['call'].error is None
@@ -0,0 +1,109 @@
+import pytest
+import time
+from throttler import Throttler
+from soliscloud_api import SoliscloudAPI, INVERTER_DETAIL_LIST
+from soliscloud_api.metrics import ClientMetrics
+from soliscloud_api.transport import RecordingTransport, ReplayTransport
+from .const import KEY, SECRET, VALID_RESPONSE_PAGED_RECORDS
+from .test_private_methods import MockedResponse
+
+
+@pytest.fixture
+def trace_file(tmp_path):
+    return str(tmp_path / 'trace.jsonl.gz')
+
+
+async def record(trace_file, mocker, response):
+    mocker.patch(
+        'soliscloud_api.SoliscloudAPI._do_post_aiohttp',
+        return_value=MockedResponse(response, 200))
+    transport = RecordingTransport(trace_file)
+    instance = SoliscloudAPI('https://soliscloud_test.com:13333', 1, transport)
+    result = await instance.inverter_detail_list(KEY, SECRET)
+    transport.close()
+    return result
+
+
+@pytest.mark.asyncio
+async def test_record_replay(trace_file, mocker):
+    recorded = await record(trace_file, mocker, VALID_RESPONSE_PAGED_RECORDS)
+    assert recorded == VALID_RESPONSE_PAGED_RECORDS['data']['page']['records']
+
+    # Replay must not hit the network, nor require a session
+    post = mocker.patch('soliscloud_api.SoliscloudAPI._do_post_aiohttp')
+    transport = ReplayTransport(trace_file)
+    assert len(transport) == 1
+    instance = SoliscloudAPI('https://other.com', None, transport)
+    result = await instance.inverter_detail_list(KEY, SECRET)
+    assert result == recorded
+    post.assert_not_called()
+    assert len(transport) == 0
+
+
+@pytest.mark.asyncio
+async def test_record_not_closed(trace_file, mocker):
+    mocker.patch(
+        'soliscloud_api.SoliscloudAPI._do_post_aiohttp',
+        return_value=MockedResponse(VALID_RESPONSE_PAGED_RECORDS, 200))
+    # The process dies after two exchanges, without close()
+    transport = RecordingTransport(trace_file)
+    instance = SoliscloudAPI('https://soliscloud_test.com:13333', 1, transport)
+    await instance.inverter_detail_list(KEY, SECRET)
+    await instance.inverter_detail_list(KEY, SECRET)
+    assert len(ReplayTransport(trace_file)) == 2
+
+    # Recording again keeps the cut-short trace apart
+    mocker.patch('soliscloud_api.transport.time.time', return_value=1234)
+    await record(trace_file, mocker, VALID_RESPONSE_PAGED_RECORDS)
+    assert len(ReplayTransport(trace_file)) == 1
+    assert len(ReplayTransport(f"{trace_file}.1234.partial")) == 2
+
+
+@pytest.mark.asyncio
+async def test_replay_missing(trace_file, mocker):
+    await record(trace_file, mocker, VALID_RESPONSE_PAGED_RECORDS)
+    instance = SoliscloudAPI(
+        'https://other.com', None, ReplayTransport(trace_file))
+    with pytest.raises(SoliscloudAPI.SolisCloudError):
+        await instance.inverter_detail_list(KEY, SECRET, page_no=2)
+
+
+@pytest.mark.asyncio
+async def test_replay_speed(trace_file, mocker):
+    await record(trace_file, mocker, VALID_RESPONSE_PAGED_RECORDS)
+    transport = ReplayTransport(trace_file, speed=2)
+    for queue in transport._entries.values():
+        queue[0]['latency'] = 0.4
+    instance = SoliscloudAPI('https://other.com', None, transport)
+    start = time.monotonic()
+    await instance.inverter_detail_list(KEY, SECRET)
+    assert time.monotonic() - start >= 0.2
+    with pytest.raises(ValueError):
+        ReplayTransport(trace_file, speed=0)
+
+
+@pytest.mark.asyncio
+async def test_replay_not_rate_limited(trace_file, mocker):
+    mocker.patch(
+        'soliscloud_api.SoliscloudAPI._do_post_aiohttp',
+        return_value=MockedResponse(VALID_RESPONSE_PAGED_RECORDS, 200))
+    transport = RecordingTransport(trace_file)
+    instance = SoliscloudAPI('https://soliscloud_test.com:13333', 1, transport,
+                             throttler=Throttler(100, 1.0))
+    for page_no in range(1, 11):
+        await instance.inverter_detail_list(KEY, SECRET, page_no=page_no)
+    transport.close()
+
+    # Ten requests take 4.5 s at 2 requests/s, replay runs at 10x speed
+    transport = ReplayTransport(trace_file, speed=10)
+    for queue in transport._entries.values():
+        queue[0]['latency'] = 0.5
+    metrics = ClientMetrics()
+    instance = SoliscloudAPI('https://other.com', None, transport,
+                             metrics=metrics)
+    start = time.monotonic()
+    for page_no in range(1, 11):
+        await instance.inverter_detail_list(KEY, SECRET, page_no=page_no)
+    assert 0.5 <= time.monotonic() - start < 1.5
+    assert len(transport) == 0
+    assert metrics.payload.value(endpoint=INVERTER_DETAIL_LIST) > 0